@@ -1,7 +1,14 @@
 from subprocess import DEVNULL, run
 import warnings
 
-from bcpandas.main import SqlCreds, to_sql
+from bcpandas.main import (
+    SqlCreds,
+    TableOptions,
+    copy_table,
+    export_parquet,
+    read_sql,
+    to_sql,
+)
 from bcpandas.utils import bcp
 
 __version__ = "2.7.2"
@@ -14,4 +21,4 @@ except (FileNotFoundError, PermissionError):
 
 del run, DEVNULL, warnings
 
-__all__ = ["SqlCreds", "to_sql", "bcp"]
+__all__ = ["SqlCreds", "TableOptions", "to_sql", "read_sql", "export_parquet", "copy_table", "bcp"]
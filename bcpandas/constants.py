@@ -35,11 +35,111 @@ DIRECTIONS = (IN, OUT, QUERYOUT)
 SQL_TYPES = (TABLE, VIEW, QUERY)
 IF_EXISTS_OPTIONS = ("append", "replace", "fail")
 
+# Network packet size, in bytes, see the `-a` switch in https://docs.microsoft.com/en-us/sql/tools/bcp-utility
+PACKET_SIZE_DEFAULT = 4096
+PACKET_SIZE_MAX = 65535
+PACKET_SIZE_AUTO = "auto"
+# in "auto" mode, size packets so that each one holds roughly this many rows
+_PACKET_SIZE_TARGET_ROWS = 256
+
+# Retries of failed BCP commands, delays are in seconds
+RETRY_BACKOFF_MAX = 60.0
+# SQL Server error numbers that are worth retrying, i.e. will likely succeed if tried again a bit later
+# see https://learn.microsoft.com/en-us/azure/azure-sql/database/troubleshoot-common-errors-issues
+TRANSIENT_ERROR_CODES = (
+    233,  # connection closed by the server
+    1205,  # deadlock victim
+    4060,  # cannot open database
+    4221,  # login to read-secondary failed due to long wait on HADR_DATABASE_WAIT_FOR_TRANSITION_TO_VERSIONING
+    10053,  # transport-level error
+    10054,  # connection forcibly closed by the remote host
+    10060,  # network-related error
+    10928,  # resource limit reached
+    10929,  # resource limit reached
+    40197,  # service error processing the request
+    40501,  # service is busy (throttling)
+    40613,  # database not currently available
+    49918,  # not enough resources to process the request
+    49919,  # too many create or update operations in progress
+    49920,  # too many operations in progress
+)
+# ODBC errors without a SQL Server error number that are worth retrying
+TRANSIENT_ERROR_MESSAGES = (
+    "login timeout expired",
+    "query timeout expired",
+    "communication link failure",
+    "tcp provider",
+    "deadlock",
+)
+
+# Output handling when running BCP, see `utils.run_cmd`
+_OUTPUT_MAX_LINES = 1000  # only the last lines of output are kept
+_OUTPUT_READ_SIZE = 64 * 1024  # bytes
+_PROGRESS_LOG_INTERVAL = 5.0  # seconds between progress lines that are printed and logged
+_PROGRESS_LINE_PATTERNS = ("rows sent to SQL Server", "rows successfully bulk-copied")
+
+# modes of inferring the SQL types of the columns of a new table, see the `infer_types` param of `to_sql`
+INFER_TYPES_TIGHT = "tight"
+INFER_TYPES_OPTIONS = (INFER_TYPES_TIGHT,)
+# ranges of the SQL Server numeric and datetime types that aren't covered by `SQL_INT_RANGES`, as (min, max),
+# used to validate the data before loading it, see the `validate` param of `to_sql`
+SQL_NUMERIC_RANGES = {
+    "bit": (0, 1),
+    "money": (-922_337_203_685_477.5808, 922_337_203_685_477.5807),
+    "smallmoney": (-214_748.3648, 214_748.3647),
+    "real": (-3.40e38, 3.40e38),
+    "float": (-1.79e308, 1.79e308),
+}
+SQL_DATETIME_RANGES = {
+    "datetime": ("1753-01-01", "9999-12-31 23:59:59.997"),
+    "smalldatetime": ("1900-01-01", "2079-06-06 23:59:00"),
+}
+SQL_STRING_TYPES = ("char", "varchar", "nchar", "nvarchar")
+# SQL Server types that datetimes are formatted for up front when writing them, see `utils.format_datetimes`
+SQL_WRITE_DATETIME_TYPES = ("date", "datetime", "datetime2", "datetimeoffset", "smalldatetime")
+# SQL Server types that decimals and floats are formatted for up front with a fixed scale,
+# see `utils.format_decimals`
+SQL_WRITE_DECIMAL_TYPES = ("decimal", "numeric", "money", "smallmoney")
+# SQL Server types that bytes are written as hex for, see `utils.format_binary`
+SQL_WRITE_BINARY_TYPES = ("binary", "varbinary", "image")
+
+# physical design of new tables, see `bcpandas.main.TableOptions`
+TABLE_ROWSTORE_COMPRESSIONS = ("NONE", "ROW", "PAGE")
+TABLE_COLUMNSTORE_COMPRESSIONS = ("COLUMNSTORE", "COLUMNSTORE_ARCHIVE")
+TABLE_DURABILITY_OPTIONS = ("SCHEMA_ONLY", "SCHEMA_AND_DATA")
+# longest VARCHAR(n), NVARCHAR(n) and VARBINARY(n), longer values need (max)
+VARCHAR_MAX_LENGTH = 8000
+NVARCHAR_MAX_LENGTH = 4000
+VARBINARY_MAX_LENGTH = 8000
+# the narrowest SQL Server integer type for a range of values, as (type name, min, max)
+SQL_INT_RANGES = (
+    ("tinyint", 0, 2**8 - 1),
+    ("smallint", -(2**15), 2**15 - 1),
+    ("int", -(2**31), 2**31 - 1),
+    ("bigint", -(2**63), 2**63 - 1),
+)
+
+# default number of rows per chunk for resumable loads, i.e. when using a checkpoint file
+CHECKPOINT_CHUNK_SIZE = 100_000
+
+# default number of rows per row group when exporting to Parquet, also the number of rows held in memory
+PARQUET_ROW_GROUP_SIZE = 500_000
+
+# cache of `read_sql` results, see the `cache_dir` param of `read_sql`
+READ_CACHE_MAX_BYTES = 1024**3  # default size budget of the cache directory
+READ_CACHE_SUFFIX = ".arrow"  # Arrow IPC files
+# schema metadata key of the state of the SQL table a cached result was read from
+_READ_CACHE_STATE_KEY = b"bcpandas.table_state"
+
 
 # Text settings
 _DELIMITER_OPTIONS = (",", "|", "\t")
 _QUOTECHAR_OPTIONS = ('"', "'", "`", "~")
 NEWLINE = os.linesep
+# terminators of `to_sql(control_terminators=True)`, the ASCII unit and record separators, which
+# practically never appear in real data so the data is written without quoting
+CONTROL_DELIMITER = "\x1f"
+CONTROL_ROW_TERMINATOR = "\x1e"
 
 # settings for both BCP and pandas.read_csv for reading from SQL
 # delimiter should be characters that NEVER appear in the source data in SQL, have to guess a good one
@@ -48,8 +148,55 @@ NEWLINE = os.linesep
 # and https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.read_csv.html
 read_data_settings = {"delimiter": "\\t", "newline": NEWLINE}
 
+# pandas dtypes used to parse the columns read from SQL, by SQL Server type, as (NOT NULL, NULL).
+# Types not listed are read as strings. Nullable integers use the pandas extension types, so
+# that a NULL doesn't turn the whole column into floats.
+# see https://learn.microsoft.com/en-us/sql/relational-databases/system-stored-procedures/sp-describe-first-result-set-transact-sql
+SQL_READ_DTYPES = {
+    "bit": ("bool", "boolean"),
+    "tinyint": ("uint8", "UInt8"),
+    "smallint": ("int16", "Int16"),
+    "int": ("int32", "Int32"),
+    "bigint": ("int64", "Int64"),
+    "real": ("float32", "float32"),
+    "float": ("float64", "float64"),
+    "decimal": ("float64", "float64"),
+    "numeric": ("float64", "float64"),
+    "money": ("float64", "float64"),
+    "smallmoney": ("float64", "float64"),
+}
+# SQL Server types that are parsed as datetimes
+SQL_READ_DATETIME_TYPES = ("date", "datetime", "datetime2", "smalldatetime")
+# SQL Server types that may be read as categoricals, see the `category_threshold` param of `read_sql`
+SQL_READ_CATEGORY_TYPES = ("char", "varchar", "nchar", "nvarchar")
+
+# formats of the data file `read_sql` exports to, see the `data_format` param of `read_sql`
+CHAR_FORMAT = "char"
+NATIVE_FORMAT = "native"
+DATA_FORMATS = (CHAR_FORMAT, NATIVE_FORMAT)
+# fixed-width fields in the native format, by SQL Server type, as (host file data type, numpy dtype)
+# other numeric types are exported as `float`, dates and datetimes as microseconds since the epoch
+# in a `bigint`, and everything else as `nvarchar(max)`
+# see https://learn.microsoft.com/en-us/sql/relational-databases/import-export/specify-file-storage-type-by-using-bcp-sql-server
+NATIVE_FIELD_TYPES = {
+    "bit": ("SQLBIT", "u1"),
+    "tinyint": ("SQLTINYINT", "u1"),
+    "smallint": ("SQLSMALLINT", "<i2"),
+    "int": ("SQLINT", "<i4"),
+    "bigint": ("SQLBIGINT", "<i8"),
+    "real": ("SQLFLT4", "<f4"),
+    "float": ("SQLFLT8", "<f8"),
+}
+
+# types of the character data in the data file `to_sql` writes, see the `char_type` param of `to_sql`
+# 'wide' is UTF-16LE, which BCP loads without converting it through a code page
+WIDE_CHAR_TYPE = "wide"
+CHAR_TYPES = ("char", WIDE_CHAR_TYPE)
+WIDE_CHAR_ENCODING = "utf-16-le"
+
 # BCP Format File terms
 SQLCHAR = "SQLCHAR"
+SQLNCHAR = "SQLNCHAR"
 sql_collation = "SQL_Latin1_General_CP1_CI_AS"
 
 
@@ -63,15 +210,38 @@ https://docs.microsoft.com/en-us/sql/relational-databases/import-export/specify-
 """
 
 
+def data_contains(df: pd.DataFrame, chars: str) -> bool:
+    """
+    Whether any string value in the DataFrame contains any of the characters.
+
+    The strings of each column are joined into one string that is searched, which is a single pass
+    in C instead of a Python call per cell.
+    """
+    for _, col in df.items():
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            values = col.cat.categories
+        elif col.dtype == object or pd.api.types.is_string_dtype(col.dtype):
+            values = col.dropna()
+        else:
+            continue
+        try:
+            text = "".join(values)
+        except TypeError:  # mixed types, non-strings are not searched
+            text = "".join(x for x in values if isinstance(x, str))
+        if any(char in text for char in chars):
+            return True
+    return False
+
+
 def get_delimiter(df: pd.DataFrame) -> str:
     for delim in _DELIMITER_OPTIONS:
-        if not df.map(lambda x: delim in x if isinstance(x, str) else False).any().any():
+        if not data_contains(df, delim):
             return delim
     raise BCPandasValueError(error_msg.format(typ="delimiter", opts=_DELIMITER_OPTIONS))
 
 
 def get_quotechar(df: pd.DataFrame) -> str:
     for qc in _QUOTECHAR_OPTIONS:
-        if not df.map(lambda x: qc in x if isinstance(x, str) else False).any().any():
+        if not data_contains(df, qc):
             return qc
     raise BCPandasValueError(error_msg.format(typ="quote", opts=_QUOTECHAR_OPTIONS))
@@ -4,14 +4,39 @@ Created on Sat Aug  3 23:07:15 2019
 @author: ydima
 """
 
+import codecs
 import csv
+import io
+import json
 import logging
 import os
+import threading
+from concurrent.futures import (
+    FIRST_EXCEPTION,
+    Future,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from functools import lru_cache, partial
 from pathlib import Path
 from textwrap import dedent
-from typing import Dict, List, Optional, Union
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Generator,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+    cast,
+)
 from urllib.parse import quote_plus
-from re import sub
+from re import escape, sub
 
 import pandas as pd
 from pandas.io.sql import SQLDatabase, SQLTable
@@ -19,30 +44,133 @@ import pyodbc
 import sqlalchemy as sa
 
 from bcpandas.constants import (
+    CHAR_TYPES,
+    CHECKPOINT_CHUNK_SIZE,
+    CONTROL_DELIMITER,
+    CONTROL_ROW_TERMINATOR,
+    DATA_FORMATS,
     IF_EXISTS_OPTIONS,
     IN,
+    INFER_TYPES_OPTIONS,
+    INFER_TYPES_TIGHT,
+    IS_WIN32,
+    NATIVE_FORMAT,
     NEWLINE,
+    OUT,
+    PACKET_SIZE_AUTO,
+    PARQUET_ROW_GROUP_SIZE,
+    QUERY,
+    QUERYOUT,
+    READ_CACHE_MAX_BYTES,
+    SQL_READ_CATEGORY_TYPES,
+    SQL_TYPES,
     TABLE,
+    TABLE_COLUMNSTORE_COMPRESSIONS,
+    TABLE_DURABILITY_OPTIONS,
+    TABLE_ROWSTORE_COMPRESSIONS,
+    VIEW,
+    WIDE_CHAR_ENCODING,
+    WIDE_CHAR_TYPE,
+    BCPandasException,
     BCPandasValueError,
+    data_contains,
     get_delimiter,
     get_quotechar,
+    read_data_settings,
     sql_collation,
 )
-from bcpandas.utils import bcp, build_format_file, get_temp_file
+from bcpandas.utils import (
+    DelimiterCounter,
+    _import_pyarrow,
+    _quote_name,
+    _unescape,
+    bcp,
+    build_format_file,
+    build_native_format_file,
+    format_binary,
+    format_datetimes,
+    format_decimals,
+    format_json,
+    get_arrow_schema,
+    get_cache_key,
+    get_native_fields,
+    get_packet_size,
+    get_read_dtypes,
+    get_temp_file,
+    get_tight_sql_types,
+    get_type_violations,
+    needs_formatting,
+    read_cached_result,
+    read_error_file,
+    read_native_file,
+    write_cached_result,
+)
 
 logger = logging.getLogger(__name__)
 
+# engines shared by all the SqlCreds in the process, see `_get_engine`
+_ENGINES: Dict[Tuple[int, str, Tuple[Tuple[str, Any], ...]], sa.engine.Engine] = {}
+_ENGINES_LOCK = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _get_driver_version() -> int:
+    """
+    Gets the latest version of the Microsoft ODBC Driver for SQL Server that is installed. Looked up
+    once per process, as `pyodbc.drivers` is slow.
+    """
+    all_drivers: List[str] = pyodbc.drivers()
+    driver_candidates: List[str] = [
+        d.split("Driver ")[-1].split(" ")[0] for d in all_drivers if "SQL Server" in d
+    ]
+    return max(int(v) for v in driver_candidates if v.isnumeric())
+
+
+def _normalize_odbc_string(odbc_string: str) -> str:
+    """
+    Normalizes an ODBC connection string, so that the same connection gives the same string regardless of
+    the order and case of the keywords. Values are left as is, as i.e. passwords are case sensitive.
+    """
+    pairs = (pair.split("=", 1) for pair in odbc_string.split(";") if "=" in pair)
+    return ";".join(sorted(f"{k.strip().lower()}={v.strip()}" for k, v in pairs))
+
+
+def _get_engine(odbc_string: str, **engine_kwargs) -> sa.engine.Engine:
+    """
+    Gets the SQLAlchemy engine of an ODBC connection string, creating it the first time, so that all
+    the SqlCreds of the same connection and pool settings share its connection pool.
+
+    Engines are per process, as the connections of a pool can't be shared with forked processes.
+    """
+    key = (
+        os.getpid(),
+        _normalize_odbc_string(odbc_string),
+        tuple(sorted(engine_kwargs.items())),
+    )
+    with _ENGINES_LOCK:
+        engine = _ENGINES.get(key)
+        if engine is None:
+            conn_string = f"mssql+pyodbc:///?odbc_connect={quote_plus(odbc_string)}"
+            engine = sa.engine.create_engine(conn_string, **engine_kwargs)
+            _ENGINES[key] = engine
+            engine_msg = sub("PWD%3D.*%3B", "PWD%3D[REDACTED]%3B", str(engine))
+            logger.info(f"Created engine for sqlalchemy:\t{engine_msg}")
+    return engine
+
 
 class SqlCreds:
     """
-    Credential object for all SQL operations. Will automatically also create a SQLAlchemy
-    engine that uses `pyodbc` as the DBAPI, and store it in the `self.engine` attribute.
+    Credential object for all SQL operations. Will also create a SQLAlchemy engine that uses `pyodbc`
+    as the DBAPI, the first time the `self.engine` attribute is used.
 
     If `username` and `password` are not provided, `with_krb_auth` will be `True`.
     If `entra_id_token` are provided uses Microsoft Entra ID Authentication.
 
     Only supports SQL based logins and Microsoft Entra ID, not Active Directory.
 
+    The engines are shared by all the SqlCreds in the process with the same connection details and pool
+    settings, so that creating SqlCreds again, i.e. per task, reuses the open connections of the pool.
+
     Parameters
     ----------
     server : str
@@ -57,6 +185,15 @@ class SqlCreds:
         such as Encrypted='yes'
     entra_id_token: str, optional
         Microsoft Entra ID Authentication token
+    pool_size : int, default 5
+        The number of connections to keep open in the pool of the engine, see
+        `sqlalchemy.create_engine`.
+    pool_pre_ping : bool, default False
+        Whether to test connections for liveness when taken from the pool, i.e. if the server may close
+        idle connections. See `sqlalchemy.create_engine`.
+    pool_recycle : int, default -1
+        If positive, connections are replaced once they are this many seconds old. See
+        `sqlalchemy.create_engine`.
 
     Returns
     -------
@@ -73,6 +210,9 @@ class SqlCreds:
         port: int = 1433,
         odbc_kwargs: Optional[Dict[str, Union[str, int]]] = None,
         entra_id_token: Optional[str] = None,
+        pool_size: int = 5,
+        pool_pre_ping: bool = False,
+        pool_recycle: int = -1,
     ):
         self.server = server
         self.database = database
@@ -80,11 +220,7 @@ class SqlCreds:
         self.odbc_kwargs = odbc_kwargs
 
         if driver_version is None:
-            all_drivers: List[str] = pyodbc.drivers()
-            driver_candidates: List[str] = [
-                d.split("Driver ")[-1].split(" ")[0] for d in all_drivers if "SQL Server" in d
-            ]
-            new_driver_version: int = max(int(v) for v in driver_candidates if v.isnumeric())
+            new_driver_version = _get_driver_version()
             self.driver = f"{{ODBC Driver {new_driver_version} for SQL Server}}"
             self.driver_version = new_driver_version  # simplifies copy construction
         else:
@@ -112,18 +248,35 @@ class SqlCreds:
             db_url += "Trusted_Connection=yes;"
 
         self.entra_id_token = entra_id_token
+        self.pool_size = pool_size
+        self.pool_pre_ping = pool_pre_ping
+        self.pool_recycle = pool_recycle
 
         self_msg = sub(r"password=\'.*\'", "password=[REDACTED]", str(self))
         logger.info(f"Created creds:\t{self_msg}")
 
-        # construct the engine for sqlalchemy
+        # the engine for sqlalchemy is only created, or taken from the ones already created, when used
         if odbc_kwargs:
             db_url += ";".join(f"{k}={v}" for k, v in odbc_kwargs.items())
-        conn_string = f"mssql+pyodbc:///?odbc_connect={quote_plus(db_url)}"
-        self.engine = sa.engine.create_engine(conn_string)
-        engine_msg = sub("PWD%3D.*%3B", "PWD%3D[REDACTED]%3B", str(self.engine))
+        self._odbc_string = db_url
+        self._engine: Optional[sa.engine.Engine] = None
+        url_msg = sub("PWD%3D.*%3B", "PWD%3D[REDACTED]%3B", quote_plus(db_url))
+        logger.info(f"Connection string for sqlalchemy:\t{url_msg}")
+
+    @property
+    def engine(self) -> sa.engine.Engine:
+        if self._engine is None:
+            self._engine = _get_engine(
+                self._odbc_string,
+                pool_size=self.pool_size,
+                pool_pre_ping=self.pool_pre_ping,
+                pool_recycle=self.pool_recycle,
+            )
+        return self._engine
 
-        logger.info(f"Created engine for sqlalchemy:\t{engine_msg}")
+    @engine.setter
+    def engine(self, engine: sa.engine.Engine) -> None:
+        self._engine = engine
 
     @classmethod
     def from_engine(cls, engine: sa.engine.base.Engine) -> "SqlCreds":
@@ -180,7 +333,11 @@ class SqlCreds:
     def __repr__(self):
         # adopted from https://github.com/erdewit/ib_insync/blob/master/ib_insync/objects.py#L51
         clsName = self.__class__.__qualname__
-        kwargs = ", ".join(f"{k}={v!r}" for k, v in self.__dict__.items() if k != "password")
+        kwargs = ", ".join(
+            f"{k}={v!r}"
+            for k, v in self.__dict__.items()
+            if k != "password" and not k.startswith("_")
+        )
         if hasattr(self, "password"):
             kwargs += ", password=[REDACTED]"
         return f"{clsName}({kwargs})"
@@ -188,6 +345,147 @@ class SqlCreds:
     __str__ = __repr__
 
 
+class ToSqlResult(NamedTuple):
+    """
+    The result of `bcpandas.to_sql`.
+
+    Attributes
+    ----------
+    rows_copied : int
+        The number of rows that were loaded into the SQL table.
+    rejected_rows : pandas.DataFrame
+        The rows of the original DataFrame that BCP rejected, keeping their original index.
+        Only populated when `max_errors` or `error_file` is used, otherwise always empty.
+    errors : pandas.Series
+        The BCP error message(s) for each rejected row, with the same index as `rejected_rows`.
+    """
+
+    rows_copied: int
+    rejected_rows: pd.DataFrame
+    errors: pd.Series
+
+
+class TableOptions(NamedTuple):
+    """
+    The physical design of a table created by `bcpandas.to_sql`, see its `table_options` param.
+
+    Attributes
+    ----------
+    columnstore : bool, default False
+        Whether to create a clustered columnstore index, i.e. for tables that are mostly scanned.
+    index_columns : list of str, optional
+        The key columns of a clustered (rowstore) index. For a memory-optimized table, of the nonclustered
+        index that it needs instead, which is required then.
+    data_compression : {'NONE', 'ROW', 'PAGE', 'COLUMNSTORE', 'COLUMNSTORE_ARCHIVE'}, optional
+        The compression of the table, or of its clustered index. The columnstore ones only with
+        `columnstore`.
+    filegroup : str, optional
+        The filegroup to create the table on.
+    partition_scheme : str, optional
+        The partition scheme to create the table on, partitioned by `partition_column`.
+    partition_column : str, optional
+        The column to partition the table by, if `partition_scheme` is specified.
+    memory_optimized : {'SCHEMA_ONLY', 'SCHEMA_AND_DATA'}, optional
+        If specified, creates a memory-optimized table with this durability, i.e. 'SCHEMA_ONLY' for
+        staging tables, whose rows are lost on restart. The database needs a memory-optimized filegroup.
+    """
+
+    columnstore: bool = False
+    index_columns: Optional[List[str]] = None
+    data_compression: Optional[str] = None
+    filegroup: Optional[str] = None
+    partition_scheme: Optional[str] = None
+    partition_column: Optional[str] = None
+    memory_optimized: Optional[str] = None
+
+
+def _validate_table_options(options: TableOptions) -> None:
+    if options.columnstore and options.index_columns:
+        raise BCPandasValueError(
+            "A table can't have both a clustered columnstore and rowstore index"
+        )
+    compressions = (
+        TABLE_COLUMNSTORE_COMPRESSIONS if options.columnstore else TABLE_ROWSTORE_COMPRESSIONS
+    )
+    if options.data_compression is not None and options.data_compression not in compressions:
+        raise BCPandasValueError(
+            f"Param data_compression must be one of {compressions}, you passed "
+            f"{options.data_compression}"
+        )
+    if options.filegroup is not None and options.partition_scheme is not None:
+        raise BCPandasValueError("A table can be on either a filegroup or a partition scheme")
+    if (options.partition_scheme is None) != (options.partition_column is None):
+        raise BCPandasValueError(
+            "Params partition_scheme and partition_column must be specified together"
+        )
+    if options.memory_optimized is not None:
+        if options.memory_optimized not in TABLE_DURABILITY_OPTIONS:
+            raise BCPandasValueError(
+                f"Param memory_optimized must be one of {TABLE_DURABILITY_OPTIONS}, you passed "
+                f"{options.memory_optimized}"
+            )
+        if not options.index_columns:
+            raise BCPandasValueError("A memory-optimized table needs index_columns for its index")
+        if (
+            options.columnstore
+            or options.data_compression
+            or options.filegroup
+            or options.partition_scheme
+        ):
+            raise BCPandasValueError(
+                "Memory-optimized tables can't have a columnstore index, compression, a filegroup "
+                "or a partition scheme"
+            )
+
+
+def _get_create_table_ddl(
+    create_table: str, schema: str, table_name: str, options: TableOptions
+) -> List[str]:
+    """
+    Gets the DDL statements to create a table with the given physical design, from the plain
+    `CREATE TABLE` statement of its columns.
+    """
+    table = f"{_quote_name(schema)}.{_quote_name(table_name)}"
+    create_table = create_table.rstrip()
+    if options.memory_optimized is not None:
+        index_cols = ", ".join(_quote_name(c) for c in cast(List[str], options.index_columns))
+        return [
+            f"{create_table[:-1].rstrip()},\n\t"
+            f"INDEX {_quote_name(f'ix_{table_name}')} NONCLUSTERED ({index_cols})\n) "
+            f"WITH (MEMORY_OPTIMIZED = ON, DURABILITY = {options.memory_optimized})"
+        ]
+
+    if options.partition_scheme is not None:
+        on = (
+            f" ON {_quote_name(options.partition_scheme)}"
+            f"({_quote_name(cast(str, options.partition_column))})"
+        )
+    elif options.filegroup is not None:
+        on = f" ON {_quote_name(options.filegroup)}"
+    else:
+        on = ""
+    with_compression = (
+        ""
+        if options.data_compression is None
+        else f" WITH (DATA_COMPRESSION = {options.data_compression})"
+    )
+    if options.columnstore:
+        return [
+            f"{create_table}{on}",
+            f"CREATE CLUSTERED COLUMNSTORE INDEX {_quote_name(f'cci_{table_name}')} ON {table}"
+            f"{with_compression}{on}",
+        ]
+    if options.index_columns:
+        index_cols = ", ".join(_quote_name(c) for c in options.index_columns)
+        return [
+            f"{create_table}{on}",
+            f"CREATE CLUSTERED INDEX {_quote_name(f'cix_{table_name}')} ON {table} ({index_cols})"
+            f"{with_compression}{on}",
+        ]
+    # unlike CREATE INDEX, CREATE TABLE takes the ON clause before the WITH clause
+    return [f"{create_table}{on}{with_compression}"]
+
+
 def _sql_item_exists(sql_type: str, schema: str, table_name: str, creds: SqlCreds) -> bool:
     _qry = dedent(
         """
@@ -208,10 +506,21 @@ def _create_table(
     df: pd.DataFrame,
     if_exists: str,
     dtype: Optional[dict] = None,
+    table_options: Optional[TableOptions] = None,
 ):
-    """use pandas' own code to create the table and schema"""
+    """
+    use pandas' own code to create the table and schema, or only to get the column definitions if
+    `table_options` are specified, see `_get_create_table_ddl`
+    """
+    if table_options is not None and table_options.memory_optimized is not None:
+        # SQL Server doesn't allow DDL on memory-optimized tables inside a user transaction
+        connection: ContextManager[sa.engine.Connection] = (
+            creds.engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        )
+    else:
+        connection = creds.engine.begin()
 
-    with creds.engine.begin() as conn:
+    with connection as conn:
         sql_db = SQLDatabase(conn, schema=schema)
         table = SQLTable(
             table_name,
@@ -223,7 +532,16 @@ def _create_table(
             schema=schema,
             dtype=dtype,
         )
-        table.create()
+        if table_options is None:
+            table.create()
+            return
+        if table.exists():
+            # only gets here with if_exists='replace'
+            sql_db.drop_table(table_name, schema=schema)
+        create_table = str(sa.schema.CreateTable(table.table).compile(dialect=conn.dialect))
+        for statement in _get_create_table_ddl(create_table, schema, table_name, table_options):
+            logger.debug(f"Creating table: {statement}")
+            conn.execute(sa.text(statement))
 
 
 def _handle_cols_for_append(
@@ -273,10 +591,24 @@ def _prepare_table(
     schema: str,
     if_exists: str,
     dtype: Optional[dict],
+    infer_types: Optional[str] = None,
+    table_options: Optional[TableOptions] = None,
 ) -> None:
     """
     Prepares the destination SQL table, handling the `if_exists` param.
     """
+    if infer_types == INFER_TYPES_TIGHT and not (if_exists == "append" and sql_item_exists):
+        # the types given explicitly take precedence
+        dtype = {**get_tight_sql_types(df), **(dtype or {})}
+    # pandas creates a text column for bytes, which are written as hex, so make it VARBINARY(max)
+    binary_types = {
+        col_name: sa.LargeBinary()
+        for col_name, col in df.items()
+        if pd.api.types.is_object_dtype(col.dtype)
+        and pd.api.types.infer_dtype(col, skipna=True) == "bytes"
+    }
+    if binary_types:
+        dtype = {**binary_types, **(dtype or {})}
     if if_exists == "fail":
         if sql_item_exists:
             raise BCPandasValueError(
@@ -291,6 +623,7 @@ def _prepare_table(
                 df=df,
                 if_exists=if_exists,
                 dtype=dtype,
+                table_options=table_options,
             )
     elif if_exists == "replace":
         _create_table(
@@ -300,6 +633,7 @@ def _prepare_table(
             df=df,
             if_exists=if_exists,
             dtype=dtype,
+            table_options=table_options,
         )
     elif if_exists == "append":
         if not sql_item_exists:
@@ -310,6 +644,7 @@ def _prepare_table(
                 df=df,
                 if_exists=if_exists,
                 dtype=dtype,
+                table_options=table_options,
             )
 
 
@@ -318,10 +653,45 @@ def _validate_args(
     sql_type: str,
     if_exists: str,
     batch_size: Optional[int],
+    packet_size: Optional[Union[int, str]] = None,
+    checkpoint_file: Optional[Path] = None,
+    chunk_size: Optional[int] = None,
+    infer_types: Optional[str] = None,
+    table_options: Optional[TableOptions] = None,
+    char_type: str = "char",
+    delimiter: Optional[str] = None,
+    encoding: Optional[str] = None,
+    quotechar: Optional[str] = None,
+    control_terminators: bool = False,
 ) -> None:
     assert sql_type == TABLE, "only supporting table, not view, for now"
     assert if_exists in IF_EXISTS_OPTIONS
 
+    if infer_types is not None and infer_types not in INFER_TYPES_OPTIONS:
+        raise BCPandasValueError(
+            f"Param infer_types must be one of {INFER_TYPES_OPTIONS}, you passed {infer_types}"
+        )
+    if table_options is not None:
+        _validate_table_options(table_options)
+    if char_type not in CHAR_TYPES:
+        raise BCPandasValueError(
+            f"Param char_type must be one of {CHAR_TYPES}, you passed {char_type}"
+        )
+    if char_type == WIDE_CHAR_TYPE:
+        if encoding is not None and codecs.lookup(encoding).name != WIDE_CHAR_ENCODING:
+            raise BCPandasValueError(
+                f"Param encoding can't be used with char_type='{WIDE_CHAR_TYPE}', the data file is "
+                f"always {WIDE_CHAR_ENCODING}, you passed {encoding}"
+            )
+        if delimiter is not None and not delimiter.isascii():
+            raise BCPandasValueError(
+                f"Param delimiter must be ASCII with char_type='{WIDE_CHAR_TYPE}', you passed {delimiter!r}"
+            )
+    if control_terminators and (delimiter is not None or quotechar is not None):
+        raise BCPandasValueError(
+            "Params delimiter and quotechar can't be used with control_terminators"
+        )
+
     if df.columns.has_duplicates:
         raise BCPandasValueError(
             "Columns with duplicate names detected, SQL requires that column names be unique. "
@@ -336,6 +706,186 @@ def _validate_args(
                 "Param batch_size can't be larger than the number of rows in the DataFrame"
             )
 
+    if isinstance(packet_size, str) and packet_size != PACKET_SIZE_AUTO:
+        raise BCPandasValueError(
+            f"Param packet_size must be an int or '{PACKET_SIZE_AUTO}', you passed {packet_size}"
+        )
+
+    if chunk_size is not None:
+        if checkpoint_file is None:
+            raise BCPandasValueError("Param chunk_size can only be used with checkpoint_file")
+        if chunk_size <= 0:
+            raise BCPandasValueError("Param chunk_size must be a positive number")
+    if checkpoint_file is not None and batch_size is not None:
+        raise BCPandasValueError(
+            "Param batch_size can't be used with checkpoint_file, each chunk is loaded in a single batch"
+        )
+
+
+def _get_columns(table_name: str, creds: SqlCreds, schema: str) -> pd.DataFrame:
+    """
+    Gets the columns of the SQL table with their types, as the fields that
+    `bcpandas.utils.get_type_violations` and `bcpandas.utils.format_datetimes` take.
+    """
+    return pd.read_sql_query(
+        sql=sa.text(
+            dedent(
+                """
+                SELECT COLUMN_NAME AS name, DATA_TYPE AS data_type,
+                    CHARACTER_MAXIMUM_LENGTH AS max_length, NUMERIC_PRECISION AS precision,
+                    NUMERIC_SCALE AS scale, DATETIME_PRECISION AS datetime_precision,
+                    IS_NULLABLE AS is_nullable,
+                    CASE WHEN COLUMN_DEFAULT IS NOT NULL
+                        OR COLUMNPROPERTY(OBJECT_ID(:table), COLUMN_NAME, 'IsIdentity') = 1
+                        OR COLUMNPROPERTY(OBJECT_ID(:table), COLUMN_NAME, 'IsComputed') = 1
+                        THEN 1 ELSE 0 END AS has_default
+                FROM INFORMATION_SCHEMA.COLUMNS
+                WHERE TABLE_SCHEMA = :schema AND TABLE_NAME = :table_name
+                ORDER BY ORDINAL_POSITION
+                """
+            )
+        ),
+        con=creds.engine,
+        params={
+            "table": f"{_quote_name(schema)}.{_quote_name(table_name)}",
+            "schema": schema,
+            "table_name": table_name,
+        },
+    )
+
+
+def _validate_data(df: pd.DataFrame, table_name: str, creds: SqlCreds, schema: str) -> None:
+    """
+    Checks that the data fits the columns of the SQL table, if it exists, see the `validate` param of
+    `to_sql`. Raises a BCPandasValueError with the violations if it doesn't.
+    """
+    violations = get_type_violations(df, _get_columns(table_name, creds, schema))
+    if not violations.empty:
+        raise BCPandasValueError(
+            f"The data doesn't fit the columns of {schema}.{table_name}, nothing was loaded:\n"
+            f"{violations.to_string(index=False)}",
+            details=[
+                f"{row.column}: {row.count} value(s) {row.violation}, i.e. {row.example!r}"
+                for row in violations.itertuples(index=False)
+            ],
+        )
+
+
+def _read_checkpoint(checkpoint_file: Path, load_info: dict) -> dict:
+    """
+    Reads the checkpoint journal of a resumable load, or starts a new one if it doesn't exist yet.
+    """
+    if not Path(checkpoint_file).exists():
+        return {**load_info, "committed_chunks": [], "rows_copied": 0, "rejected": []}
+    with open(checkpoint_file) as file:
+        journal = json.load(file)
+    if any(journal.get(k) != v for k, v in load_info.items()):
+        raise BCPandasValueError(
+            f"The checkpoint file {checkpoint_file} belongs to a different load, either the "
+            "DataFrame, the destination table or the chunk size changed. Delete it to start over."
+        )
+    return journal
+
+
+def _write_checkpoint(checkpoint_file: Path, journal: dict) -> None:
+    # write to a temp file first, so that a crash never leaves a half-written journal behind
+    tmp_path = Path(f"{checkpoint_file}.tmp")
+    with open(tmp_path, "w") as file:
+        json.dump(journal, file)
+    os.replace(tmp_path, checkpoint_file)
+
+
+def _to_sql_resumable(
+    df: pd.DataFrame,
+    table_name: str,
+    creds: SqlCreds,
+    sql_type: str,
+    schema: str,
+    index: bool,
+    if_exists: str,
+    dtype: Optional[dict],
+    infer_types: Optional[str],
+    table_options: Optional[TableOptions],
+    process_dest_table: bool,
+    checkpoint_file: Path,
+    chunk_size: int,
+    error_file: Optional[Path],
+    **kwargs,
+) -> ToSqlResult:
+    """
+    Loads the DataFrame in numbered chunks, each in its own BCP call and so its own transaction,
+    recording every committed chunk in the checkpoint journal. If the journal already exists, the
+    chunks recorded in it are skipped, so re-running a failed load only loads what is missing.
+    """
+    # work on positions from here on, so that chunks and rejected rows map back to the original frame
+    data = (df.reset_index() if index else df).reset_index(drop=True)
+    # encoded once for all the chunks, and dicts and lists can't be hashed for the fingerprint
+    data = format_json(data)
+    load_info = {
+        "table": f"{schema}.{table_name}",
+        "columns": [str(c) for c in data.columns],
+        "num_rows": data.shape[0],
+        "chunk_size": chunk_size,
+        "fingerprint": str(pd.util.hash_pandas_object(data, index=False).sum()),
+    }
+    journal = _read_checkpoint(checkpoint_file, load_info)
+
+    if journal["committed_chunks"]:
+        logger.info(
+            f"Resuming load into {schema}.{table_name}, skipping "
+            f"{len(journal['committed_chunks'])} chunk(s) that were already committed"
+        )
+    elif process_dest_table:
+        _prepare_table(
+            df=data,
+            table_name=table_name,
+            creds=creds,
+            sql_item_exists=_sql_item_exists(
+                sql_type=sql_type, schema=schema, table_name=table_name, creds=creds
+            ),
+            sql_type=sql_type,
+            schema=schema,
+            if_exists=if_exists,
+            dtype=dtype,
+            infer_types=infer_types,
+            table_options=table_options,
+        )
+    # queried once for all the chunks, and only if they need formatting for the types of the columns
+    columns = _get_columns(table_name, creds, schema) if needs_formatting(data) else None
+
+    for chunk_num, start in enumerate(range(0, data.shape[0], chunk_size)):
+        if chunk_num in journal["committed_chunks"]:
+            continue
+        logger.debug(f"Loading chunk {chunk_num} of {schema}.{table_name}")
+        result = to_sql(
+            df=data.iloc[start : start + chunk_size],
+            table_name=table_name,
+            creds=creds,
+            sql_type=sql_type,
+            schema=schema,
+            index=False,  # already set as new col earlier if index=True
+            if_exists="append",
+            process_dest_table=False,
+            error_file=None if error_file is None else Path(f"{error_file}.{chunk_num}"),
+            _columns=columns,
+            **kwargs,
+        )
+        assert result is not None  # chunks are never empty
+        journal["committed_chunks"].append(chunk_num)
+        journal["rows_copied"] += result.rows_copied
+        journal["rejected"] += [[int(pos), msg] for pos, msg in result.errors.items()]
+        _write_checkpoint(checkpoint_file, journal)
+
+    os.remove(checkpoint_file)
+    rejected_rows = df.iloc[[pos for pos, _ in journal["rejected"]]]
+    return ToSqlResult(
+        rows_copied=journal["rows_copied"],
+        rejected_rows=rejected_rows,
+        errors=pd.Series(
+            [msg for _, msg in journal["rejected"]], index=rejected_rows.index, dtype="object"
+        ),
+    )
+
 
 def to_sql(
     df: pd.DataFrame,
@@ -358,7 +908,21 @@ def to_sql(
     work_directory: Optional[Path] = None,
     collation: str = sql_collation,
     identity_insert: bool = False,
-):
+    packet_size: Optional[Union[int, str]] = None,
+    max_errors: Optional[int] = None,
+    error_file: Optional[Path] = None,
+    checkpoint_file: Optional[Path] = None,
+    chunk_size: Optional[int] = None,
+    retries: int = 0,
+    retry_backoff: float = 1.0,
+    infer_types: Optional[str] = None,
+    table_options: Optional[TableOptions] = None,
+    validate: bool = False,
+    char_type: str = "char",
+    control_terminators: bool = False,
+    # internal, the columns of the table if they were queried already, see `_get_columns`
+    _columns: Optional[pd.DataFrame] = None,
+) -> Optional[ToSqlResult]:
     """
     Writes the pandas DataFrame to a SQL table or view.
 
@@ -420,23 +984,177 @@ def to_sql(
         system-default for temporary files.
     identity_insert: bool, default False
         Specifies that identity value or values in the imported data file are to be used for the identity column.
+    packet_size: int or 'auto', default None
+        Network packet size in bytes, between 4096 and 65535. If 'auto', will pick a packet size based on the
+        average row width of the data. By default, BCP uses 4096. If the server refuses the requested size,
+        will fall back to the default.
+    max_errors: int, default None
+        Maximum number of rows BCP may reject before the load is canceled. By default, BCP sets this to 10.
+        If set, the rows that BCP rejected will be returned in the result instead of failing the entire load.
+    error_file: pathlib.Path, default None
+        Optional path for the BCP error file, which will be kept after the load. If `max_errors` is set and
+        this is not provided, a temporary error file will be used.
+    checkpoint_file: pathlib.Path, default None
+        Optional path of a checkpoint journal, to make the load resumable. The DataFrame is loaded in numbered
+        chunks of `chunk_size` rows, each one committed on its own, and every committed chunk is recorded in
+        the journal. If the load fails, calling `to_sql` again with the same DataFrame and checkpoint file will
+        skip the chunks that were already committed. The journal is deleted once the load completes.
+        Can't be used together with `batch_size`.
+    chunk_size: int, default None
+        Number of rows per chunk when using `checkpoint_file`. Defaults to 100,000.
+    retries: int, default 0
+        How many times to retry BCP if it fails with a transient error, such as a login timeout, throttling
+        or a deadlock. Only retried if no rows were committed yet, see `bcpandas.utils.bcp` for details.
+        When using `checkpoint_file`, each chunk is retried on its own.
+    retry_backoff: float, default 1.0
+        Seconds to wait before the first retry, doubled (with random jitter) before each further retry.
+    infer_types: {'tight'}, default None
+        If 'tight', creates the table with the narrowest SQL types that fit the data, instead of the ones
+        pandas picks from the dtypes: i.e. VARCHAR(n) instead of VARCHAR(max), TINYINT instead of BIGINT,
+        or DATETIME2(0) for datetimes without fractions of a second. See `bcpandas.utils.get_tight_sql_types`.
+        The types in `dtype` take precedence. Only used when the table is created.
+    table_options: bcpandas.TableOptions, default None
+        The physical design of the table, i.e. a clustered columnstore or rowstore index, compression, a
+        filegroup or partition scheme, or memory-optimized. Only used when the table is created, in the same
+        transaction. See `bcpandas.main.TableOptions`.
+    validate: bool, default False
+        If True and appending to an existing table, checks that the data fits the types of its columns before
+        loading anything, and raises a BCPandasValueError with the violations per column if it doesn't:
+        NULLs in NOT NULL columns, numbers out of range or with too many digits, strings that are too long,
+        invalid dates and more. See `bcpandas.utils.get_type_violations`.
+    char_type: {'char', 'wide'}, default 'char'
+        The type of the character data in the BCP data file. 'char' is encoded with `encoding` and converted
+        by BCP through the code page of `collation`, which can't represent every character for NVARCHAR
+        columns. 'wide' is encoded as UTF-16LE, once and in C while writing the file, with SQLNCHAR fields in
+        the format file, so BCP loads it into NVARCHAR columns as it is. The file is twice as large for ASCII.
+    control_terminators: bool, default False
+        If True, separates the fields with the ASCII unit separator (\\x1f) and the rows with the ASCII
+        record separator (\\x1e), and writes the data without quoting. Instead of scanning the data for a
+        delimiter and a quotechar that don't appear in it, the data is only checked once for those two
+        characters, and raises a BCPandasValueError if it contains them. Can't be used together with
+        `delimiter` or `quotechar`.
+
+    Returns
+    -------
+    `bcpandas.main.ToSqlResult` with the number of rows copied and the rejected rows, or None if the
+    DataFrame is empty.
 
     Notes
     -----
     If `delimiter` and/or `quotechar` are specified, you must ensure that those characters
     are not present in the actual data.
+
+    With `infer_types='tight'`, the types only fit the data that is loaded now, so appending longer strings
+    or larger numbers later will fail.
+
+    Datetime columns are written with the fractional digits of a second truncated to the scale of their
+    SQL column, and timezone-aware ones in their local time, see `bcpandas.utils.format_datetimes`.
+    Floats and `decimal.Decimal` values that go into `decimal`, `numeric` or `money` columns are written
+    without an exponent, see `bcpandas.utils.format_decimals`.
+    Bytes that go into `binary` or `varbinary` columns are written as hex, see `bcpandas.utils.format_binary`,
+    and new tables get `varbinary(max)` columns for them.
+    Columns of dicts and lists are written as JSON, see `bcpandas.utils.format_json`.
     """
     # validation
     if df.shape[0] == 0 or df.shape[1] == 0:
-        return
+        return None
 
-    _validate_args(df=df, sql_type=sql_type, if_exists=if_exists, batch_size=batch_size)
+    _validate_args(
+        df=df,
+        sql_type=sql_type,
+        if_exists=if_exists,
+        batch_size=batch_size,
+        packet_size=packet_size,
+        checkpoint_file=checkpoint_file,
+        chunk_size=chunk_size,
+        infer_types=infer_types,
+        table_options=table_options,
+        char_type=char_type,
+        delimiter=delimiter,
+        encoding=encoding,
+        quotechar=quotechar,
+        control_terminators=control_terminators,
+    )
+
+    if validate and if_exists == "append":
+        _validate_data(
+            df.reset_index() if index else df, table_name=table_name, creds=creds, schema=schema
+        )
+
+    if checkpoint_file is not None:
+        return _to_sql_resumable(
+            df=df,
+            table_name=table_name,
+            creds=creds,
+            sql_type=sql_type,
+            schema=schema,
+            index=index,
+            if_exists=if_exists,
+            dtype=dtype,
+            infer_types=infer_types,
+            table_options=table_options,
+            process_dest_table=process_dest_table,
+            checkpoint_file=checkpoint_file,
+            chunk_size=chunk_size or CHECKPOINT_CHUNK_SIZE,
+            error_file=error_file,
+            use_tablock=use_tablock,
+            debug=debug,
+            bcp_path=bcp_path,
+            print_output=print_output,
+            delimiter=delimiter,
+            quotechar=quotechar,
+            encoding=encoding,
+            work_directory=work_directory,
+            collation=collation,
+            identity_insert=identity_insert,
+            packet_size=packet_size,
+            max_errors=max_errors,
+            retries=retries,
+            retry_backoff=retry_backoff,
+            char_type=char_type,
+            control_terminators=control_terminators,
+        )
 
+    # keep the original frame, to return the rejected rows with their original index
+    orig_df = df
     if index:
         df = df.reset_index()
 
-    delim = get_delimiter(df) if delimiter is None else delimiter
-    _quotechar = get_quotechar(df) if quotechar is None else quotechar
+    # encoded before picking the delimiter and quotechar, so those are checked against the JSON
+    df = format_json(df)
+    if control_terminators:
+        if data_contains(df, CONTROL_DELIMITER + CONTROL_ROW_TERMINATOR):
+            raise BCPandasValueError(
+                "Data contains the ASCII unit or record separator (\\x1f or \\x1e), "
+                "can't use control_terminators"
+            )
+        delim, _quotechar, row_terminator = CONTROL_DELIMITER, None, CONTROL_ROW_TERMINATOR
+    else:
+        delim = get_delimiter(df) if delimiter is None else delimiter
+        _quotechar = get_quotechar(df) if quotechar is None else quotechar
+        row_terminator = NEWLINE
+
+    sql_item_exists = _sql_item_exists(
+        sql_type=sql_type, schema=schema, table_name=table_name, creds=creds
+    )
+    if process_dest_table:
+        _prepare_table(
+            df=df,
+            table_name=table_name,
+            creds=creds,
+            sql_item_exists=sql_item_exists,
+            sql_type=sql_type,
+            schema=schema,
+            if_exists=if_exists,
+            dtype=dtype,
+            infer_types=infer_types,
+            table_options=table_options,
+        )
+
+    # the table exists now, so datetimes, decimals and bytes can be formatted for the types of their columns
+    if needs_formatting(df):
+        columns = _get_columns(table_name, creds, schema) if _columns is None else _columns
+        df = format_binary(format_decimals(format_datetimes(df, columns), columns), columns)
 
     # save to temp path
     csv_file_path = get_temp_file(work_directory)
@@ -446,22 +1164,23 @@ def to_sql(
         sep=delim,
         header=False,
         index=False,  # already set as new col earlier if index=True
-        quoting=csv.QUOTE_MINIMAL,  # pandas default
+        # pandas default, or no quoting at all as the control characters aren't in the data
+        quoting=csv.QUOTE_NONE if control_terminators else csv.QUOTE_MINIMAL,
         quotechar=_quotechar,
-        lineterminator=NEWLINE,
+        lineterminator=row_terminator,
         doublequote=True,
         escapechar=None,  # not needed, as using doublequote
-        encoding=encoding,
+        encoding=WIDE_CHAR_ENCODING if char_type == WIDE_CHAR_TYPE else encoding,
     )
     logger.debug(f"Saved dataframe to temp CSV file at {csv_file_path}")
 
+    if isinstance(packet_size, str):  # only 'auto' gets past validation
+        packet_size = get_packet_size(os.path.getsize(csv_file_path) / df.shape[0])
+        logger.debug(f"Using network packet size of {packet_size} bytes")
+
     # build format file
     fmt_file_path = get_temp_file(work_directory)
 
-    sql_item_exists = _sql_item_exists(
-        sql_type=sql_type, schema=schema, table_name=table_name, creds=creds
-    )
-
     cols_dict = _handle_cols_for_append(
         df=df,
         table_name=table_name,
@@ -472,27 +1191,27 @@ def to_sql(
     )
 
     fmt_file_txt = build_format_file(
-        df=df, delimiter=delim, db_cols_order=cols_dict, collation=collation
+        df=df,
+        delimiter=delim,
+        db_cols_order=cols_dict,
+        collation=collation,
+        char_type=char_type,
+        row_terminator=row_terminator,
     )
     with open(fmt_file_path, "w") as ff:
         ff.write(fmt_file_txt)
     logger.debug(f"Created BCP format file at {fmt_file_path}")
 
-    try:
-        if process_dest_table:
-            _prepare_table(
-                df=df,
-                table_name=table_name,
-                creds=creds,
-                sql_item_exists=sql_item_exists,
-                sql_type=sql_type,
-                schema=schema,
-                if_exists=if_exists,
-                dtype=dtype,
-            )
+    if error_file is not None:
+        err_file_path: Optional[Path] = Path(error_file)
+    elif max_errors is not None:
+        err_file_path = get_temp_file(work_directory)
+    else:
+        err_file_path = None
 
+    try:
         # BCP the data in
-        bcp(
+        rows_copied = bcp(
             sql_item=table_name,
             direction=IN,
             flat_file=csv_file_path,
@@ -505,14 +1224,1125 @@ def to_sql(
             use_tablock=use_tablock,
             bcp_path=bcp_path,
             identity_insert=identity_insert,
+            packet_size=packet_size,
+            max_errors=max_errors,
+            error_file_path=err_file_path,
+            retries=retries,
+            retry_backoff=retry_backoff,
         )
+        # BCP reports row numbers of the data file, which has no header, so row N is position N-1
+        row_errors = read_error_file(err_file_path) if err_file_path is not None else {}
     finally:
         if not debug:
             logger.debug("Deleting temp CSV and format files")
             os.remove(csv_file_path)
             os.remove(fmt_file_path)
+            if error_file is None and err_file_path is not None and err_file_path.exists():
+                os.remove(err_file_path)
         else:
             logger.debug(
                 f"`to_sql` DEBUG mode, not deleting the files. CSV file is at "
                 f"{csv_file_path}, format file is at {fmt_file_path}"
             )
+
+    positions = sorted(row_errors.keys())
+    rejected_rows = orig_df.iloc[[p - 1 for p in positions]]
+    if rows_copied is None:
+        rows_copied = df.shape[0] - rejected_rows.shape[0]
+    if rejected_rows.shape[0] > 0:
+        logger.warning(f"BCP rejected {rejected_rows.shape[0]} row(s) while loading {table_name}")
+    return ToSqlResult(
+        rows_copied=rows_copied,
+        rejected_rows=rejected_rows,
+        errors=pd.Series(
+            [row_errors[p] for p in positions], index=rejected_rows.index, dtype="object"
+        ),
+    )
+
+
+def _remove_read_file(file_path: Path, debug: bool) -> None:
+    if not debug:
+        logger.debug("Deleting temp CSV file")
+        if file_path.exists():
+            os.remove(file_path)
+    else:
+        logger.debug(f"`read_sql` DEBUG mode, not deleting the file. CSV file is at {file_path}.")
+
+
+def _parse_export(handle, chunksize: Optional[int], **csv_kwargs) -> Iterator[pd.DataFrame]:
+    if chunksize is None:
+        yield pd.read_csv(handle, **csv_kwargs)
+    else:
+        with pd.read_csv(handle, chunksize=chunksize, **csv_kwargs) as reader:
+            yield from reader
+
+
+def _check_num_parsed(num_parsed: int, num_rows: Optional[int]) -> None:
+    """
+    Validates the number of rows parsed from the export against the number of rows BCP reported if known,
+    as rows can get lost or split while parsing even if the delimiters add up.
+    """
+    if num_rows is not None and num_parsed != num_rows:
+        raise BCPandasValueError(
+            f"Parsed {num_parsed} rows from the exported data, but BCP exported {num_rows} rows"
+        )
+
+
+def _iter_export(
+    file_path: Path,
+    debug: bool,
+    chunksize: Optional[int],
+    delimiter: Optional[str],
+    num_rows: Optional[int],
+    **csv_kwargs,
+) -> Iterator[pd.DataFrame]:
+    """
+    Parses the exported data file, in one go or chunk by chunk. If `delimiter` is given, validates
+    the data while it is parsed, see `bcpandas.utils.DelimiterCounter`. Either way, validates the number
+    of rows parsed against `num_rows`. Deletes the file once done or if the iterator is closed early.
+    """
+    try:
+        with open(file_path, "rb") as file:
+            counter = (
+                None
+                if delimiter is None
+                else DelimiterCounter(file, delimiter=delimiter, num_cols=len(csv_kwargs["names"]))
+            )
+            handle = file if counter is None else io.BufferedReader(counter)
+            num_parsed = 0
+            for chunk in _parse_export(handle, chunksize, **csv_kwargs):
+                num_parsed += chunk.shape[0]
+                yield chunk
+            if counter is not None:
+                counter.check(num_rows)
+            _check_num_parsed(num_parsed, num_rows)
+    finally:
+        _remove_read_file(file_path, debug)
+
+
+def _iter_stream(
+    export: Callable[[Path], Optional[int]],
+    file_path: Path,
+    chunksize: Optional[int],
+    delimiter: Optional[str],
+    **csv_kwargs,
+) -> Iterator[pd.DataFrame]:
+    """
+    Like `_iter_export`, but BCP writes to a named pipe (FIFO) which is parsed at the same time, so that
+    the export and the parsing overlap. `export` runs BCP with the given data file, in a separate thread.
+
+    If BCP fails, raises its error once all the data it wrote was parsed, or instead of the parse error
+    if the data it wrote is incomplete.
+    """
+    os.mkfifo(file_path)
+    result: Dict[str, Any] = {}
+    num_parsed = 0
+    try:
+        # open the pipe for reading before BCP opens it for writing, with a writer of our own
+        # so that reads block until BCP writes instead of returning EOF, which is closed once BCP is done
+        read_fd = os.open(file_path, os.O_RDONLY | os.O_NONBLOCK)
+        own_write_fd = os.open(file_path, os.O_WRONLY)
+        os.set_blocking(read_fd, True)
+
+        def _run_export() -> None:
+            try:
+                result["rows"] = export(file_path)
+            except BaseException as e:
+                result["error"] = e
+            finally:
+                os.close(own_write_fd)
+
+        thread = threading.Thread(target=_run_export, daemon=True)
+        thread.start()
+        try:
+            # closing the pipe early, i.e. if the iterator is closed, makes BCP fail and exit
+            with open(read_fd, "rb") as file:
+                counter = (
+                    None
+                    if delimiter is None
+                    else DelimiterCounter(
+                        file, delimiter=delimiter, num_cols=len(csv_kwargs["names"])
+                    )
+                )
+                handle = file if counter is None else io.BufferedReader(counter)
+                for chunk in _parse_export(handle, chunksize, **csv_kwargs):
+                    num_parsed += chunk.shape[0]
+                    yield chunk
+        except Exception as e:
+            thread.join()
+            if "error" in result:
+                raise result["error"] from e
+            raise
+        finally:
+            thread.join()
+        if "error" in result:
+            raise result["error"]
+        if counter is not None:
+            counter.check(result["rows"])
+        _check_num_parsed(num_parsed, result["rows"])
+    finally:
+        os.remove(file_path)
+
+
+def _read_arrow(
+    file_path: Path,
+    debug: bool,
+    delimiter: str,
+    check_delim: bool,
+    num_rows: Optional[int],
+    columns: pd.DataFrame,
+    dtype: Optional[Dict[str, Any]],
+):
+    """
+    Parses the exported data file into a `pyarrow.Table`, with the multithreaded `pyarrow.csv` reader.
+    Validates the data while it is parsed like `_iter_export`, and deletes the file once done.
+    """
+    pa = _import_pyarrow()
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+
+    dtype = dtype or {}
+    schema = get_arrow_schema(columns, timestamp_unit="us")
+    # datetimes are read as strings first, as pyarrow can't parse more fractional digits than the unit has
+    column_types = {
+        field.name: pa.string() if pa.types.is_timestamp(field.type) else field.type
+        for field in schema
+    }
+    column_types.update(dtype)
+    try:
+        if os.path.getsize(file_path) == 0:
+            return pa.schema(
+                [(name, dtype.get(name, schema.field(name).type)) for name in schema.names]
+            ).empty_table()
+        with open(file_path, "rb") as file:
+            counter = (
+                DelimiterCounter(file, delimiter=delimiter, num_cols=len(schema))
+                if check_delim
+                else None
+            )
+            table = pacsv.read_csv(
+                file if counter is None else io.BufferedReader(counter),
+                read_options=pacsv.ReadOptions(column_names=schema.names),
+                # a NULL row of a single column result is an empty line
+                parse_options=pacsv.ParseOptions(
+                    delimiter=delimiter, quote_char=False, ignore_empty_lines=False
+                ),
+                convert_options=pacsv.ConvertOptions(
+                    column_types=column_types, null_values=[""], strings_can_be_null=True
+                ),
+            )
+            if counter is not None:
+                counter.check(num_rows)
+            _check_num_parsed(table.num_rows, num_rows)
+    finally:
+        _remove_read_file(file_path, debug)
+
+    for i, field in enumerate(schema):
+        if pa.types.is_timestamp(field.type) and field.name not in dtype:
+            # i.e. '2020-01-01 12:00:00.1234567', trimmed to microseconds
+            trimmed = pc.utf8_slice_codeunits(
+                table.column(i), 0, len("2020-01-01 12:00:00.123456")
+            )
+            table = table.set_column(i, field, pc.cast(trimmed, field.type))
+    return table
+
+
+def _get_result_columns(
+    table_name: str, creds: SqlCreds, sql_type: str, schema: str
+) -> pd.DataFrame:
+    """
+    Gets the names and SQL types of the columns of a SQL table, view, or query from its metadata,
+    without running the query. Returns a DataFrame with one row per column, see
+    https://learn.microsoft.com/en-us/sql/relational-databases/system-stored-procedures/sp-describe-first-result-set-transact-sql
+    """
+    tsql = f"SELECT * FROM {schema}.{table_name}" if sql_type in (TABLE, VIEW) else table_name
+    columns = pd.read_sql_query(
+        sql=sa.text("EXEC sp_describe_first_result_set @tsql = :tsql"),
+        con=creds.engine,
+        params={"tsql": tsql},
+    )
+    columns = columns.loc[~columns["is_hidden"].astype(bool)].reset_index(drop=True)
+    # unnamed columns in queries, i.e. `SELECT 1`
+    columns["name"] = columns["name"].fillna("")
+    return columns
+
+
+def _get_table_state(table_name: str, creds: SqlCreds, schema: str) -> Optional[str]:
+    """
+    Gets cheap markers of the state of a SQL table, that change when it is altered or rows are inserted
+    or deleted, or with change tracking enabled on it, on any change. See the `cache_dir` param of
+    `read_sql`.
+
+    Returns
+    -------
+    The markers as a JSON string, or None if the table doesn't exist
+    """
+    state = pd.read_sql_query(
+        sql=sa.text(
+            dedent(
+                """
+                SELECT t.modify_date,
+                    (SELECT SUM(p.rows) FROM sys.partitions AS p
+                     WHERE p.object_id = t.object_id AND p.index_id IN (0, 1)) AS row_count,
+                    CASE WHEN ct.object_id IS NOT NULL
+                        THEN CHANGE_TRACKING_CURRENT_VERSION() END AS change_tracking_version
+                FROM sys.tables AS t
+                LEFT JOIN sys.change_tracking_tables AS ct ON ct.object_id = t.object_id
+                WHERE t.object_id = OBJECT_ID(:name)
+                """
+            )
+        ),
+        con=creds.engine,
+        params={"name": f"{_quote_name(schema)}.{_quote_name(table_name)}"},
+    )
+    if state.empty:
+        return None
+    return state.iloc[0].to_json(date_format="iso", date_unit="ns")
+
+
+def _read_native(
+    table_name: str,
+    creds: SqlCreds,
+    columns: pd.DataFrame,
+    sql_type: str,
+    schema: str,
+    batch_size: Optional[int],
+    debug: bool,
+    bcp_path: Optional[str],
+    print_output: bool,
+    work_directory: Optional[Path],
+) -> pd.DataFrame:
+    """
+    Exports a SQL table, view, or query in the native format and decodes it, see `read_sql`.
+    """
+    if (columns["name"] == "").any() or columns["name"].duplicated().any():
+        raise BCPandasValueError(
+            "All the columns must have unique names to read them in the native data format"
+        )
+    fields = get_native_fields(columns)
+    _from_clause = (
+        f"{schema}.{table_name}" if sql_type in (TABLE, VIEW) else f"({table_name}) AS qry"
+    )
+    query = f"SELECT {', '.join(field.expr for field in fields)} FROM {_from_clause}"
+
+    file_path = get_temp_file(work_directory)
+    format_file_path = get_temp_file(work_directory)
+    try:
+        with open(format_file_path, "w") as ff:
+            ff.write(build_native_format_file(fields))
+        rows_exported = bcp(
+            sql_item=query,
+            direction=QUERYOUT,
+            flat_file=file_path,
+            creds=creds,
+            print_output=print_output,
+            sql_type=QUERY,
+            batch_size=batch_size,
+            format_file_path=format_file_path,
+            bcp_path=bcp_path,
+        )
+        logger.debug(f"Saved the native format data file at {file_path}")
+        df = read_native_file(file_path, fields)
+    finally:
+        _remove_read_file(file_path, debug)
+        _remove_read_file(format_file_path, debug)
+    if rows_exported is not None and df.shape[0] != rows_exported:
+        raise BCPandasException(
+            f"Decoded {df.shape[0]} rows from the native format data file, but BCP exported {rows_exported}"
+        )
+    # the fields are grouped by width, back to the order of the columns
+    return df[columns["name"].tolist()]
+
+
+def _get_partition_predicates(
+    table_name: str,
+    creds: SqlCreds,
+    sql_type: str,
+    schema: str,
+    columns: pd.DataFrame,
+    partition_column: str,
+    num_partitions: int,
+) -> List[str]:
+    """
+    Splits the range of values of an integer column into (at most) `num_partitions` disjoint ranges of
+    equal width, and returns a WHERE predicate for each. NULLs are included in the first range.
+    """
+    types = columns.set_index("name")["system_type_name"].str.lower()
+    if partition_column not in types.index:
+        raise BCPandasValueError(f"The partition column {partition_column} is not in the result")
+    if types[partition_column] not in ("tinyint", "smallint", "int", "bigint"):
+        raise BCPandasValueError(
+            f"The partition column must be an integer column, {partition_column} is a "
+            f"{types[partition_column]}"
+        )
+    col = _quote_name(partition_column)
+    _from_clause = (
+        f"{schema}.{table_name}" if sql_type in (TABLE, VIEW) else f"({table_name}) AS qry"
+    )
+    bounds = pd.read_sql_query(
+        sql=f"SELECT MIN({col}) AS lo, MAX({col}) AS hi FROM {_from_clause}", con=creds.engine
+    )
+    lo, hi = bounds.iloc[0]
+    if pd.isna(lo):
+        # no rows, or all NULLs
+        return ["1 = 1"]
+    lo, hi = int(lo), int(hi)
+    # fewer partitions if there are fewer distinct values
+    edges = sorted({lo + (hi - lo + 1) * i // num_partitions for i in range(num_partitions + 1)})
+    predicates = [f"({col} >= {start} AND {col} < {end})" for start, end in zip(edges, edges[1:])]
+    predicates[0] = f"({col} IS NULL OR {predicates[0]})"
+    return predicates
+
+
+def _iter_partitions(futures: List[Future], chunksize: int) -> Iterator[pd.DataFrame]:
+    """
+    Yields the partitions in chunks, in the order they are done.
+    """
+    try:
+        for future in as_completed(futures):
+            df = future.result()
+            for start in range(0, df.shape[0], chunksize):
+                yield df.iloc[start : start + chunksize]
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def _to_categories(
+    df: pd.DataFrame,
+    columns: pd.DataFrame,
+    category_threshold: Optional[float],
+    dtype: Optional[Dict[str, Any]],
+) -> pd.DataFrame:
+    """
+    Converts the low-cardinality string columns to categoricals, see the `category_threshold` param
+    of `read_sql`.
+    """
+    if category_threshold is not None:
+        base_types = columns["system_type_name"].str.split("(").str[0].str.lower()
+        for col in columns.loc[base_types.isin(SQL_READ_CATEGORY_TYPES), "name"]:
+            if col not in (dtype or {}) and df[col].nunique() <= category_threshold * len(df):
+                df[col] = df[col].astype("category")
+    return df
+
+
+def read_sql(
+    table_name: str,
+    creds: SqlCreds,
+    sql_type: str = "table",
+    schema: str = "dbo",
+    batch_size: Optional[int] = None,
+    debug: bool = False,
+    delimiter: Optional[str] = None,
+    check_delim: bool = True,
+    bcp_path: Optional[str] = None,
+    chunksize: Optional[int] = None,
+    print_output: bool = True,
+    work_directory: Optional[Path] = None,
+    dtype: Optional[Dict[str, Any]] = None,
+    category_threshold: Optional[float] = None,
+    data_format: str = "char",
+    partition_column: Optional[str] = None,
+    num_partitions: int = 4,
+    dtype_backend: Optional[str] = None,
+    as_arrow_table: bool = False,
+    stream: bool = False,
+    cache_dir: Optional[Union[str, Path]] = None,
+    cache_max_bytes: int = READ_CACHE_MAX_BYTES,
+) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
+    """
+    Reads a SQL table, view, or query into a pandas DataFrame, or an iterator of DataFrames.
+
+    Parameters
+    ----------
+    table_name : str
+        Name of SQL table or view, without the schema, or a query string
+    creds : bcpandas.SqlCreds
+        The credentials used in the SQL database.
+    sql_type : {'table', 'view', 'query'}, default 'table'
+        The type of SQL object that the parameter `table_name` is.
+    schema : str, default 'dbo'
+        The SQL schema of the table or view. If a query, will be ignored.
+    batch_size : int, optional
+        Rows will be read in batches of this size at a time. By default,
+        all rows will be read at once.
+    debug : bool, default False
+        If True, will not delete the temporary CSV file, and will output its location.
+    delimiter : str, optional
+        One or more characters to use as a column delimiter in the temporary CSV file.
+        If not supplied, the default used is specified in `constants.py` in the `read_data_settings` variable.
+        **IMPORTANT** - the delimiter must not appear in the actual data in SQL or else it will fail.
+    check_delim : bool, default True
+        Whether to check for the presence of the delimiter (or newlines) in the data while it is parsed.
+        See note below.
+    bcp_path : str, default None
+        The full path to the BCP utility, useful if it is not in the PATH environment variable
+    chunksize : int, default None
+        If specified, returns an iterator of DataFrames with `chunksize` rows each, that parses the exported
+        data incrementally, so that memory use doesn't grow with the size of the result.
+    print_output: bool, default True
+        Whether to print output to STDOUT in real time. Regardless, the output will be logged.
+    work_directory: pathlib.Path, default None
+        Optional directory where temporary files are written to. If not provided, defaults to the
+        system-default for temporary files.
+    dtype : dict, optional
+        Dtypes to parse some of the columns with, by column name, overriding the ones derived from
+        their SQL types. See note below.
+    category_threshold : float, optional
+        If specified, returns string columns as `category` if their number of distinct values is at most
+        this fraction of the number of rows, i.e. 0.5. Ignored if `chunksize` is specified, as the
+        categories of the chunks would differ.
+    data_format : {'char', 'native'}, default 'char'
+        The format of the data file BCP exports to. 'char' is delimited text that is parsed with
+        `pandas.read_csv`. 'native' is binary, numbers, dates and datetimes are decoded directly into
+        numpy arrays, which is much faster for mostly numeric results. See note below.
+    partition_column : str, optional
+        If specified, the name of an integer column to split the result by. Its range of values is split
+        into `num_partitions` ranges of equal width, which are exported by concurrent BCP processes and
+        parsed in parallel. See note below.
+    num_partitions : int, default 4
+        The number of partitions to read concurrently, if `partition_column` is specified.
+    dtype_backend : {'pyarrow'}, optional
+        If 'pyarrow', parses the data with the multithreaded `pyarrow.csv` reader and returns a DataFrame
+        with `pandas.ArrowDtype` columns, which use a fraction of the memory of object columns for strings.
+        Requires `pyarrow`. See note below.
+    as_arrow_table : bool, default False
+        If True, parses the data like `dtype_backend='pyarrow'`, but returns the `pyarrow.Table`.
+    stream : bool, default False
+        If True, BCP exports to a named pipe instead of a temporary file, which is parsed while BCP writes
+        to it, so that the export and the parsing overlap. With `chunksize`, the chunks are returned as the
+        data arrives. Not supported on Windows, nor with pyarrow or the native data format. See note below.
+    cache_dir : str or pathlib.Path, optional
+        If specified, caches the result in this directory, as an Arrow IPC file, and returns it from there
+        as long as the SQL table is unchanged. Only for tables, and not with `chunksize`. Requires
+        `pyarrow`. See note below.
+    cache_max_bytes : int, default 1 GiB
+        The size budget of `cache_dir`, the least recently used results are deleted to stay under it.
+
+    Returns
+    -------
+    `pandas.DataFrame`, or an iterator of `pandas.DataFrame` if `chunksize` is specified,
+    or a `pyarrow.Table` if `as_arrow_table` is True
+
+    Notes
+    -----
+    The names and SQL types of the columns are read from the metadata of the SQL table/view/query, so it
+    doesn't get run twice. The data is parsed with the matching dtypes instead of inferring them, see
+    `SQL_READ_DTYPES` in `constants.py`: integers as the narrowest (nullable if the column allows NULLs)
+    integer types, `bit` as booleans, dates and datetimes as `datetime64[ns]`, and everything else as
+    strings. Dates outside of the range supported by pandas, i.e. 9999-12-31, are left as strings.
+
+    Also, while the temporary CSV file is parsed, the delimiters and newlines in it are counted to check
+    for their presence in the data, which would corrupt the result. This check is cheap, but if you are sure
+    the delimiter isn't in the data, you can skip it by passing `check_delim=False`.
+    Either way, the number of rows parsed is validated against the number of rows BCP exported.
+    If `chunksize` is specified, the exact counts can only be validated once the last chunk was read,
+    so the error may be raised after some chunks were already returned.
+
+    With `data_format='native'`, the delimiter isn't used so it can't corrupt the result, but:
+      - `chunksize` isn't supported.
+      - Queries are selected from as a subquery, so can't i.e. have an ORDER BY without TOP, or a CTE.
+      - Dates and datetimes are read as `datetime64[us]`, so `datetime2` values are rounded to microseconds.
+      - Strings are parsed row by row in Python, so for mostly text results the 'char' format is faster.
+
+    With `partition_column`, the partitions are read with separate queries, so they are not a consistent
+    snapshot if the data changes in the meantime. The ranges have equal widths, so for skewed values some
+    partitions will be much larger than the others. If `chunksize` is specified, the partitions are
+    returned in chunks in the order they are done, so all partitions that are done but not yet returned
+    are held in memory at once.
+
+    With `dtype_backend='pyarrow'` or `as_arrow_table`, `chunksize`, the native data format and delimiters
+    longer than 1 character aren't supported, the values of `dtype` must be pyarrow types, and dates and
+    datetimes are read as `timestamp[us]`, truncated to microseconds.
+
+    With `stream`, if BCP fails midway the error is raised after the chunks that were already parsed,
+    and the export can't be retried. Also `debug` has no effect, as there is no file to keep.
+
+    With `cache_dir`, a cached result is keyed on the server, database, table and the params that change
+    the result, and is only used if the table is in the same state as when it was read. The state is made
+    of the modification date of the table, which changes with its schema, and its row count, so that
+    updates that leave the row count unchanged are NOT detected, unless change tracking is enabled on the
+    table. If the data can change that way, don't use the cache for it.
+    """
+    # check params
+    assert sql_type in SQL_TYPES
+    if batch_size == 0:
+        raise BCPandasValueError("Param batch_size can't be 0")
+    if chunksize is not None and chunksize <= 0:
+        raise BCPandasValueError("Param chunksize must be a positive number")
+    if data_format not in DATA_FORMATS:
+        raise BCPandasValueError(
+            f"Param data_format must be one of {DATA_FORMATS}, you passed {data_format}"
+        )
+    if data_format == NATIVE_FORMAT and chunksize is not None and partition_column is None:
+        raise BCPandasValueError("Param chunksize is not supported with the native data format")
+    if num_partitions < 1:
+        raise BCPandasValueError("Param num_partitions must be a positive number")
+    if dtype_backend not in (None, "pyarrow"):
+        raise BCPandasValueError(
+            f"Param dtype_backend must be 'pyarrow', you passed {dtype_backend}"
+        )
+    use_arrow = dtype_backend == "pyarrow" or as_arrow_table
+    if stream and (IS_WIN32 or use_arrow or data_format == NATIVE_FORMAT):
+        raise BCPandasValueError(
+            "Param stream is not supported on Windows, nor with pyarrow or the native data format"
+        )
+    if use_arrow and (chunksize is not None or data_format == NATIVE_FORMAT):
+        raise BCPandasValueError(
+            "Params chunksize and data_format='native' are not supported with pyarrow"
+        )
+
+    if cache_dir is not None:
+        if sql_type != TABLE or chunksize is not None:
+            raise BCPandasValueError(
+                "Param cache_dir is only supported for tables, without chunksize"
+            )
+        state = _get_table_state(table_name, creds, schema=schema)
+        if state is None:
+            raise BCPandasValueError(f"The table {schema}.{table_name} doesn't exist")
+        cache_key = get_cache_key(
+            server=creds.server,
+            port=creds.port,
+            database=creds.database,
+            table=f"{schema}.{table_name}",
+            dtype=dtype,
+            category_threshold=category_threshold,
+            data_format=data_format,
+            dtype_backend=dtype_backend,
+            as_arrow_table=as_arrow_table,
+        )
+        table = read_cached_result(cache_dir, cache_key, state)
+        if table is not None:
+            logger.info(f"Read {schema}.{table_name} from the cache in {cache_dir}")
+            return table if as_arrow_table else table.to_pandas()
+        result = read_sql(
+            table_name,
+            creds,
+            sql_type=sql_type,
+            schema=schema,
+            batch_size=batch_size,
+            debug=debug,
+            delimiter=delimiter,
+            check_delim=check_delim,
+            bcp_path=bcp_path,
+            print_output=print_output,
+            work_directory=work_directory,
+            dtype=dtype,
+            category_threshold=category_threshold,
+            data_format=data_format,
+            partition_column=partition_column,
+            num_partitions=num_partitions,
+            dtype_backend=dtype_backend,
+            as_arrow_table=as_arrow_table,
+            stream=stream,
+        )
+        if not as_arrow_table:
+            table = _import_pyarrow().Table.from_pandas(result, preserve_index=False)
+        write_cached_result(
+            cache_dir, cache_key, state, result if as_arrow_table else table, cache_max_bytes
+        )
+        return result
+
+    # get the names and types of the columns, without running the query
+    logger.debug("Starting to read the column names and types")
+    columns = _get_result_columns(table_name, creds, sql_type=sql_type, schema=schema)
+    cols = columns["name"].tolist()
+    read_dtypes, parse_dates = get_read_dtypes(columns)
+    if dtype is not None:
+        read_dtypes.update(dtype)
+        parse_dates = [col for col in parse_dates if col not in dtype]
+    logger.debug("Successfully read the column names and types")
+
+    if partition_column is not None:
+        predicates = _get_partition_predicates(
+            table_name,
+            creds,
+            sql_type=sql_type,
+            schema=schema,
+            columns=columns,
+            partition_column=partition_column,
+            num_partitions=num_partitions,
+        )
+        logger.info(f"Reading {len(predicates)} partitions concurrently")
+        _from_clause = (
+            f"{schema}.{table_name}" if sql_type in (TABLE, VIEW) else f"({table_name}) AS qry"
+        )
+        pool = ThreadPoolExecutor(max_workers=len(predicates))
+        futures = [
+            pool.submit(
+                read_sql,
+                f"SELECT * FROM {_from_clause} WHERE {predicate}",
+                creds,
+                sql_type=QUERY,
+                batch_size=batch_size,
+                debug=debug,
+                delimiter=delimiter,
+                check_delim=check_delim,
+                bcp_path=bcp_path,
+                print_output=print_output,
+                work_directory=work_directory,
+                dtype=dtype,
+                data_format=data_format,
+                dtype_backend=dtype_backend,
+                as_arrow_table=as_arrow_table,
+            )
+            for predicate in predicates
+        ]
+        # the threads keep running until all partitions are read
+        pool.shutdown(wait=False)
+        if chunksize is not None:
+            return _iter_partitions(futures, chunksize)
+        if as_arrow_table:
+            return _import_pyarrow().concat_tables([future.result() for future in futures])
+        df = pd.concat([future.result() for future in futures], ignore_index=True)
+        return _to_categories(df, columns, category_threshold, dtype)
+
+    if data_format == NATIVE_FORMAT:
+        df = _read_native(
+            table_name,
+            creds,
+            columns,
+            sql_type=sql_type,
+            schema=schema,
+            batch_size=batch_size,
+            debug=debug,
+            bcp_path=bcp_path,
+            print_output=print_output,
+            work_directory=work_directory,
+        )
+        if dtype is not None:
+            df = df.astype(dtype)
+        return _to_categories(df, columns, category_threshold, dtype)
+
+    file_path = get_temp_file(work_directory)
+
+    # set delimiter
+    delim = delimiter if delimiter is not None else read_data_settings["delimiter"]
+    # the actual characters BCP writes, i.e. a tab for '\t'
+    _delim = _unescape(delim)
+
+    csv_kwargs = dict(
+        sep=_delim,
+        header=None,
+        names=cols,
+        index_col=False,
+        quoting=csv.QUOTE_NONE,  # BCP doesn't quote fields
+        dtype=read_dtypes,
+        parse_dates=parse_dates,
+        date_format="ISO8601",
+        # BCP writes NULLs as empty fields, and nothing else is a missing value, i.e. the string 'NA'
+        keep_default_na=False,
+        na_values=[""],
+        # a NULL row of a single column result is an empty line
+        skip_blank_lines=False,
+    )
+    if len(_delim) > 1 and use_arrow:
+        raise BCPandasValueError(
+            "Delimiters longer than 1 character are not supported with pyarrow"
+        )
+    if len(_delim) > 1:
+        # pandas csv C engine only supports 1 character as delim, longer ones are regexes
+        csv_kwargs["engine"] = "python"
+        csv_kwargs["sep"] = escape(_delim)
+
+    export = partial(
+        bcp,
+        table_name,
+        QUERYOUT if sql_type == QUERY else OUT,
+        creds=creds,
+        print_output=print_output,
+        sql_type=sql_type,
+        schema=schema,
+        batch_size=batch_size,
+        col_delimiter=delim,
+        bcp_path=bcp_path,
+    )
+    if stream:
+        chunks = _iter_stream(
+            export,
+            file_path,
+            chunksize=chunksize,
+            delimiter=_delim if check_delim else None,
+            **csv_kwargs,
+        )
+        if chunksize is not None:
+            return chunks
+        return _to_categories(list(chunks)[0], columns, category_threshold, dtype)
+
+    try:
+        rows_exported = export(file_path)
+    except BaseException:
+        _remove_read_file(file_path, debug)
+        raise
+    logger.debug(f"Saved dataframe to temp CSV file at {file_path}")
+
+    if use_arrow:
+        table = _read_arrow(
+            file_path,
+            debug=debug,
+            delimiter=_delim,
+            check_delim=check_delim,
+            num_rows=rows_exported,
+            columns=columns,
+            dtype=dtype,
+        )
+        if as_arrow_table:
+            return table
+        df = table.to_pandas(types_mapper=pd.ArrowDtype)
+        return _to_categories(df, columns, category_threshold, dtype)
+
+    # there should be len(cols)-1 instances of the delimiter per row, checked while parsing
+    chunks = _iter_export(
+        file_path,
+        debug=debug,
+        chunksize=chunksize,
+        delimiter=_delim if check_delim else None,
+        num_rows=rows_exported,
+        **csv_kwargs,
+    )
+    if chunksize is not None:
+        return chunks
+    # exhaust the iterator, so that the data gets validated and the file deleted
+    return _to_categories(list(chunks)[0], columns, category_threshold, dtype)
+
+
+def export_parquet(
+    table_name: str,
+    path: Union[str, Path],
+    creds: SqlCreds,
+    sql_type: str = "table",
+    schema: str = "dbo",
+    row_group_size: int = PARQUET_ROW_GROUP_SIZE,
+    partition_cols: Optional[List[str]] = None,
+    compression: str = "snappy",
+    batch_size: Optional[int] = None,
+    debug: bool = False,
+    delimiter: Optional[str] = None,
+    check_delim: bool = True,
+    bcp_path: Optional[str] = None,
+    print_output: bool = True,
+    work_directory: Optional[Path] = None,
+) -> int:
+    """
+    Exports a SQL table, view, or query to Parquet, without loading all of it into memory.
+
+    The data is exported with BCP and parsed in chunks of `row_group_size` rows, as in `read_sql`, and each
+    chunk is written as a row group. Requires `pyarrow`.
+
+    Parameters
+    ----------
+    table_name : str
+        Name of SQL table or view, without the schema, or a query string
+    path : str or pathlib.Path
+        The Parquet file to write to, or the root directory of the dataset if `partition_cols` is specified
+    creds : bcpandas.SqlCreds
+        The credentials used in the SQL database.
+    sql_type : {'table', 'view', 'query'}, default 'table'
+        The type of SQL object that the parameter `table_name` is.
+    schema : str, default 'dbo'
+        The SQL schema of the table or view. If a query, will be ignored.
+    row_group_size : int, default 500,000
+        The number of rows per row group, which is also the number of rows held in memory at once.
+    partition_cols : list of str, optional
+        If specified, writes a dataset partitioned by these columns (hive-style), see
+        `pyarrow.parquet.write_to_dataset`. Each chunk adds a file to each partition it has rows of.
+    compression : str, default 'snappy'
+        The compression codec to use, see `pyarrow.parquet.ParquetWriter`.
+    batch_size, debug, delimiter, check_delim, bcp_path, print_output, work_directory
+        See `read_sql`.
+
+    Returns
+    -------
+    The number of rows written
+
+    Notes
+    -----
+    The Arrow schema is derived from the SQL types of the columns, see `read_sql`, so it is the same for all
+    row groups. Dates outside of the range supported by pandas, i.e. 9999-12-31, can't be exported.
+    """
+    pa = _import_pyarrow()
+    import pyarrow.parquet as pq
+
+    if row_group_size <= 0:
+        raise BCPandasValueError("Param row_group_size must be a positive number")
+
+    columns = _get_result_columns(table_name, creds, sql_type=sql_type, schema=schema)
+    arrow_schema = get_arrow_schema(columns)
+
+    # a generator of chunks, as chunksize is specified
+    chunks = cast(
+        Generator[pd.DataFrame, None, None],
+        read_sql(
+            table_name,
+            creds,
+            sql_type=sql_type,
+            schema=schema,
+            batch_size=batch_size,
+            debug=debug,
+            delimiter=delimiter,
+            check_delim=check_delim,
+            bcp_path=bcp_path,
+            chunksize=row_group_size,
+            print_output=print_output,
+            work_directory=work_directory,
+        ),
+    )
+    num_rows = 0
+    writer = None
+    try:
+        for chunk_num, chunk in enumerate(chunks):
+            table = pa.Table.from_pandas(chunk, schema=arrow_schema, preserve_index=False)
+            if partition_cols:
+                pq.write_to_dataset(
+                    table,
+                    root_path=path,
+                    partition_cols=partition_cols,
+                    basename_template=f"part-{chunk_num}-{{i}}.parquet",
+                    compression=compression,
+                )
+            else:
+                if writer is None:
+                    writer = pq.ParquetWriter(path, arrow_schema, compression=compression)
+                writer.write_table(table, row_group_size=row_group_size)
+            num_rows += table.num_rows
+            logger.debug(f"Wrote {num_rows} rows to {path}")
+        if writer is None and not partition_cols:
+            # no rows, still write the schema
+            writer = pq.ParquetWriter(path, arrow_schema, compression=compression)
+    finally:
+        chunks.close()
+        if writer is not None:
+            writer.close()
+    return num_rows
+
+
+def _create_table_like(
+    schema: str, table_name: str, creds: SqlCreds, columns: pd.DataFrame
+) -> None:
+    """
+    Creates a table with the columns of a result set, as returned by `_get_result_columns`, with the
+    same SQL types and nullability.
+    """
+    col_defs = ", ".join(
+        f"{_quote_name(row.name)} {row.system_type_name} {'NULL' if row.is_nullable else 'NOT NULL'}"
+        for row in columns.itertuples(index=False)
+    )
+    with creds.engine.begin() as conn:
+        conn.execute(sa.text(f"CREATE TABLE {schema}.{_quote_name(table_name)} ({col_defs})"))
+
+
+def _unblock_fifo(file_path: Path) -> None:
+    """
+    Opens and closes both ends of a named pipe without blocking, so that a BCP process that is still
+    waiting for the other end to be opened gets EOF or a broken pipe and exits, instead of hanging.
+    """
+    for flags in (os.O_RDONLY, os.O_WRONLY):
+        try:
+            os.close(os.open(file_path, flags | os.O_NONBLOCK))
+        except OSError:
+            pass
+
+
+def _copy_through_pipe(
+    export: Callable[[Path], Optional[int]],
+    load: Callable[[Path], Optional[int]],
+    work_directory: Optional[Path],
+) -> Optional[int]:
+    """
+    Runs `export` and `load`, i.e. BCP OUT and BCP IN, at the same time with a named pipe as the data
+    file, so that the data is never written to disk. On Windows, where BCP can't use named pipes, runs
+    them one after the other with a temporary file instead.
+
+    Returns the number of rows copied as reported by BCP, or None if it could not be determined.
+    """
+    file_path = get_temp_file(work_directory)
+    if IS_WIN32:
+        try:
+            rows_out = export(file_path)
+            rows_in = load(file_path)
+        finally:
+            _remove_read_file(file_path, debug=False)
+    else:
+        os.mkfifo(file_path)
+        try:
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                futures = [pool.submit(export, file_path), pool.submit(load, file_path)]
+                done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+                # the first error is the cause, i.e. the other side then gets EOF or a broken pipe
+                errors = [future.exception() for future in done if future.exception() is not None]
+                while not all(future.done() for future in futures):
+                    # the other BCP may be waiting to open the pipe, or about to
+                    _unblock_fifo(file_path)
+                    wait(futures, timeout=0.1)
+                if errors:
+                    raise cast(BaseException, errors[0])
+                rows_out, rows_in = (future.result() for future in futures)
+        finally:
+            os.remove(file_path)
+    if rows_out is not None and rows_in is not None and rows_out != rows_in:
+        raise BCPandasException(
+            f"BCP exported {rows_out} rows but only loaded {rows_in} of them, check the BCP output"
+        )
+    return rows_in
+
+
+def copy_table(
+    src_creds: SqlCreds,
+    src_table_or_query: str,
+    dst_creds: SqlCreds,
+    dst_table: str,
+    sql_type: str = "table",
+    schema: str = "dbo",
+    dst_schema: str = "dbo",
+    if_exists: str = "fail",
+    partition_column: Optional[str] = None,
+    num_partitions: int = 4,
+    batch_size: Optional[int] = None,
+    use_tablock: bool = False,
+    bcp_path: Optional[str] = None,
+    print_output: bool = True,
+    work_directory: Optional[Path] = None,
+) -> Optional[int]:
+    """
+    Copies a SQL table, view, or query to a table in another database or server, with BCP OUT piped
+    into BCP IN. The data is copied in the native format, so it is neither converted to text nor parsed
+    in Python.
+
+    Parameters
+    ----------
+    src_creds : bcpandas.SqlCreds
+        The credentials used in the source SQL database.
+    src_table_or_query : str
+        Name of the source SQL table or view, without the schema, or a query string
+    dst_creds : bcpandas.SqlCreds
+        The credentials used in the destination SQL database.
+    dst_table : str
+        Name of the destination SQL table, without the schema.
+    sql_type : {'table', 'view', 'query'}, default 'table'
+        The type of SQL object that the parameter `src_table_or_query` is.
+    schema : str, default 'dbo'
+        The SQL schema of the source table or view. If a query, will be ignored.
+    dst_schema : str, default 'dbo'
+        The SQL schema of the destination table.
+    if_exists : {'fail', 'replace', 'append'}, default 'fail'
+        The behavior if the destination table exists, as in `to_sql`. The table is created with the names,
+        SQL types and nullability of the source columns, without indexes or constraints. When appending,
+        its columns must be in the same order and of the same types as the source columns.
+    partition_column : str, optional
+        If specified, splits the source into `num_partitions` ranges of this integer column, and copies
+        them concurrently, each with its own pair of BCP processes. See `read_sql`.
+    num_partitions : int, default 4
+        The number of ranges to split the source into, if `partition_column` is specified.
+    batch_size : int, optional
+        Rows will be loaded in batches of this size, see the `-b` switch of BCP.
+    use_tablock : bool, default False
+        Uses a table lock while loading, see `to_sql`. Also allows the partitions to be loaded in
+        parallel with minimal logging.
+    bcp_path : str, optional
+        See `to_sql`.
+    print_output : bool, default True
+        Whether to print the output of the BCP commands.
+    work_directory : pathlib.Path, optional
+        The directory for the named pipes, or the temporary data files on Windows.
+
+    Returns
+    -------
+    The number of rows copied as reported by BCP, or None if it could not be determined.
+
+    Notes
+    -----
+    On POSIX both BCP processes run at the same time, connected by a named pipe. On Windows the data is
+    exported to a temporary file first, and then loaded from it.
+
+    Each partition, or the whole copy, is loaded in one transaction unless `batch_size` is specified.
+    If any BCP command fails, the rows loaded so far by the others are not rolled back.
+    """
+    if sql_type not in SQL_TYPES:
+        raise BCPandasValueError(
+            f"Param sql_type must be one of {SQL_TYPES}, you passed {sql_type}"
+        )
+    if if_exists not in IF_EXISTS_OPTIONS:
+        raise BCPandasValueError(
+            f"Param if_exists must be one of {IF_EXISTS_OPTIONS}, you passed {if_exists}"
+        )
+    if num_partitions <= 0:
+        raise BCPandasValueError("Param num_partitions must be a positive number")
+
+    columns = _get_result_columns(src_table_or_query, src_creds, sql_type=sql_type, schema=schema)
+    if (columns["name"] == "").any() or columns["name"].duplicated().any():
+        raise BCPandasValueError("All the source columns must have unique names to create a table")
+
+    dst_exists = _sql_item_exists(TABLE, schema=dst_schema, table_name=dst_table, creds=dst_creds)
+    if dst_exists and if_exists == "fail":
+        raise BCPandasValueError(
+            f"The table called {dst_schema}.{dst_table} already exists, "
+            f"`if_exists` param was set to `fail`."
+        )
+    if dst_exists and if_exists == "replace":
+        with dst_creds.engine.begin() as conn:
+            conn.execute(sa.text(f"DROP TABLE {dst_schema}.{_quote_name(dst_table)}"))
+    if not dst_exists or if_exists == "replace":
+        _create_table_like(dst_schema, dst_table, dst_creds, columns)
+
+    load = partial(
+        bcp,
+        dst_table,
+        IN,
+        creds=dst_creds,
+        print_output=print_output,
+        schema=dst_schema,
+        batch_size=batch_size,
+        use_tablock=use_tablock,
+        bcp_path=bcp_path,
+        native=True,
+    )
+    if partition_column is None:
+        export = partial(
+            bcp,
+            src_table_or_query,
+            QUERYOUT if sql_type == QUERY else OUT,
+            creds=src_creds,
+            print_output=print_output,
+            sql_type=sql_type,
+            schema=schema,
+            bcp_path=bcp_path,
+            native=True,
+        )
+        return _copy_through_pipe(export, load, work_directory)
+
+    predicates = _get_partition_predicates(
+        src_table_or_query,
+        src_creds,
+        sql_type=sql_type,
+        schema=schema,
+        columns=columns,
+        partition_column=partition_column,
+        num_partitions=num_partitions,
+    )
+    logger.info(f"Copying {len(predicates)} partitions concurrently")
+    _from_clause = (
+        f"{schema}.{src_table_or_query}"
+        if sql_type in (TABLE, VIEW)
+        else f"({src_table_or_query}) AS qry"
+    )
+    with ThreadPoolExecutor(max_workers=len(predicates)) as pool:
+        futures = [
+            pool.submit(
+                _copy_through_pipe,
+                partial(
+                    bcp,
+                    f"SELECT * FROM {_from_clause} WHERE {predicate}",
+                    QUERYOUT,
+                    creds=src_creds,
+                    print_output=print_output,
+                    sql_type=QUERY,
+                    bcp_path=bcp_path,
+                    native=True,
+                ),
+                load,
+                work_directory,
+            )
+            for predicate in predicates
+        ]
+        rows = [future.result() for future in futures]
+    return None if None in rows else sum(cast(List[int], rows))
@@ -4,30 +4,67 @@ Created on Sat Aug  3 23:07:15 2019
 @author: ydima
 """
 
+from collections import deque
+import codecs
+import decimal
+import hashlib
+import io
+import json
 import logging
+import math
+import os
+import struct
 import sys
 from pathlib import Path
 import random
-import shlex
 import string
 from subprocess import PIPE, STDOUT, Popen
 import tempfile
-from typing import Dict, List, Optional, Tuple, Union
-from re import sub
+import time
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional, Tuple, Union
+from re import match, sub
 
+import numpy as np
 import pandas as pd
+from sqlalchemy.dialects import mssql
 
 from bcpandas.constants import (
     DIRECTIONS,
     IN,
-    IS_WIN32,
+    NATIVE_FIELD_TYPES,
+    NVARCHAR_MAX_LENGTH,
     NEWLINE,
     OUT,
+    PACKET_SIZE_DEFAULT,
+    PACKET_SIZE_MAX,
     QUERY,
     QUERYOUT,
+    READ_CACHE_SUFFIX,
+    RETRY_BACKOFF_MAX,
+    SQL_DATETIME_RANGES,
+    SQL_INT_RANGES,
+    SQL_NUMERIC_RANGES,
+    SQL_READ_DATETIME_TYPES,
+    SQL_READ_DTYPES,
+    SQL_STRING_TYPES,
+    SQL_WRITE_BINARY_TYPES,
+    SQL_WRITE_DATETIME_TYPES,
+    SQL_WRITE_DECIMAL_TYPES,
     SQLCHAR,
+    SQLNCHAR,
     TABLE,
+    TRANSIENT_ERROR_CODES,
+    TRANSIENT_ERROR_MESSAGES,
+    VARBINARY_MAX_LENGTH,
+    VARCHAR_MAX_LENGTH,
     VIEW,
+    WIDE_CHAR_TYPE,
+    _OUTPUT_MAX_LINES,
+    _OUTPUT_READ_SIZE,
+    _PACKET_SIZE_TARGET_ROWS,
+    _PROGRESS_LINE_PATTERNS,
+    _PROGRESS_LOG_INTERVAL,
+    _READ_CACHE_STATE_KEY,
     BCPandasException,
     BCPandasValueError,
     read_data_settings,
@@ -52,9 +89,24 @@ def bcp(
     row_terminator: Optional[str] = None,
     bcp_path: Optional[Union[str, Path]] = None,
     identity_insert: bool = False,
-):
+    packet_size: Optional[int] = None,
+    max_errors: Optional[int] = None,
+    error_file_path: Optional[Path] = None,
+    native: bool = False,
+    retries: int = 0,
+    retry_backoff: float = 1.0,
+) -> Optional[int]:
     """
     See https://docs.microsoft.com/en-us/sql/tools/bcp-utility
+
+    If `packet_size` is given but the server refuses it, will retry once with the default packet size.
+
+    If the command fails with a transient error (timeouts, throttling, deadlocks, etc.), will retry it up to
+    `retries` times, waiting `retry_backoff` seconds before the first retry and doubling the wait (with random
+    jitter) before each further one. Imports are only retried if no rows were committed yet, i.e. if
+    `batch_size` is not set or no batch was sent to the server, so that retrying never duplicates rows.
+
+    Returns the number of rows copied as reported by BCP, or None if it could not be determined.
     """
     combos = {TABLE: [IN, OUT], QUERY: [QUERYOUT], VIEW: [IN, OUT]}
     direc = direction.lower()
@@ -67,14 +119,23 @@ def bcp(
         raise BCPandasValueError(
             f"Wrong combo of direction and SQL object, you passed {sql_type} and {direc} ."
         )
+    if packet_size is not None and not PACKET_SIZE_DEFAULT <= packet_size <= PACKET_SIZE_MAX:
+        raise BCPandasValueError(
+            f"Param 'packet_size' must be between {PACKET_SIZE_DEFAULT} and {PACKET_SIZE_MAX}, "
+            f"you passed {packet_size}"
+        )
+    if max_errors is not None and max_errors < 0:
+        raise BCPandasValueError(f"Param 'max_errors' can't be negative, you passed {max_errors}")
+    if retries < 0:
+        raise BCPandasValueError(f"Param 'retries' can't be negative, you passed {retries}")
 
     # auth
     if creds.with_krb_auth:
         auth = ["-T"]
     elif creds.entra_id_token:
-        auth = ["-G", "-P", quote_this(creds.entra_id_token)]
+        auth = ["-G", "-P", creds.entra_id_token]
     else:
-        auth = ["-U", quote_this(creds.username), "-P", quote_this(creds.password)]
+        auth = ["-U", creds.username, "-P", creds.password]
     if creds.odbc_kwargs:
         kwargs = {k.lower(): v for k, v in creds.odbc_kwargs.items()}
         false_values = ("n", "no", "f", "false", "off", "0")
@@ -85,7 +146,7 @@ def bcp(
     # prepare SQL item string
     if sql_type == QUERY:
         # remove newlines for queries, otherwise messes up BCP
-        sql_item_string = quote_this("".join(sql_item.splitlines()))
+        sql_item_string = "".join(sql_item.splitlines())
     else:
         sql_item_string = f"{schema}.{sql_item}"
 
@@ -96,7 +157,7 @@ def bcp(
 
     # construct BCP command
     bcp_command = [
-        "bcp" if bcp_path is None else quote_this(str(bcp_path)),
+        "bcp" if bcp_path is None else str(bcp_path),
         sql_item_string,
         direc,
         str(flat_file),
@@ -116,30 +177,538 @@ def bcp(
     if identity_insert:
         bcp_command += ["-E"]
 
+    if packet_size is not None:
+        # position of the switch, to remove it if the server refuses the packet size
+        packet_size_idx = len(bcp_command)
+        bcp_command += ["-a", str(packet_size)]
+
+    if max_errors is not None:
+        bcp_command += ["-m", str(max_errors)]
+
+    if error_file_path is not None:
+        bcp_command += ["-e", str(error_file_path)]
+
     # formats
-    if direc == IN and format_file_path is not None:
+    if format_file_path is not None:
         bcp_command += ["-f", str(format_file_path)]
+    elif native:
+        bcp_command += ["-n"]  # the native types of the columns, both ways
     elif direc in (OUT, QUERYOUT):
         bcp_command += [
             "-c",  # marking as character data, not Unicode (maybe make as param?)
-            quote_this(
-                f"-t{read_data_settings['delimiter'] if col_delimiter is None else col_delimiter}"
-            ),
-            quote_this(
-                f"-r{read_data_settings['newline'] if row_terminator is None else row_terminator}"
-            ),
+            f"-t{read_data_settings['delimiter'] if col_delimiter is None else col_delimiter}",
+            f"-r{read_data_settings['newline'] if row_terminator is None else row_terminator}",
         ]
 
     # execute
     bcp_command_log = ", ".join(bcp_command)
     bcp_command_log_msg = sub(r"-P,\s.*,", "-P, [REDACTED],", bcp_command_log)
     logger.info(f"Executing BCP command now... \nBCP command is: {bcp_command_log_msg}")
-    ret_code, output = run_cmd(bcp_command, print_output=print_output)
+    for attempt in range(retries + 1):
+        ret_code, output = run_cmd(bcp_command, print_output=print_output)
+        if (
+            ret_code != 0
+            and packet_size is not None
+            and _is_packet_size_error(output)
+            and not _batches_were_committed(direc, batch_size, output)
+        ):
+            logger.warning(
+                f"Server refused network packet size of {packet_size} bytes, "
+                "retrying with the default packet size"
+            )
+            bcp_command = bcp_command[:packet_size_idx] + bcp_command[packet_size_idx + 2 :]
+            packet_size = None
+            ret_code, output = run_cmd(bcp_command, print_output=print_output)
+        if (
+            ret_code == 0
+            or attempt == retries
+            or not _is_transient_error(output)
+            or _batches_were_committed(direc, batch_size, output)
+        ):
+            break
+        delay = min(retry_backoff * 2**attempt, RETRY_BACKOFF_MAX) * random.uniform(0.5, 1.5)
+        logger.warning(
+            f"Bcp command failed with a transient error, retrying in {delay:.1f} seconds "
+            f"(retry {attempt + 1} of {retries})"
+        )
+        time.sleep(delay)
     if ret_code != 0:
         raise BCPandasException(
             f"Bcp command failed with exit code {ret_code}",
             details=[line for line in output if line.startswith("Error =")],
         )
+    return get_rows_copied(output)
+
+
+def get_rows_copied(output: List[str]) -> Optional[int]:
+    """
+    Gets the number of rows copied from the output of BCP, i.e. from the line "1000 rows copied."
+    """
+    for line in reversed(output):
+        rows_copied = match(r"\s*(\d+) rows copied", line)
+        if rows_copied:
+            return int(rows_copied.group(1))
+    return None
+
+
+def read_error_file(error_file_path: Path) -> Dict[int, str]:
+    """
+    Parses a BCP error file (the `-e` switch) to get the rows that BCP rejected.
+
+    Each rejected row is written by BCP as a line like "#@ Row 2, Column 3: <message> @#",
+    followed by the raw row data, which is ignored here.
+
+    Parameters
+    ----------
+    error_file_path : pathlib.Path
+        The path to the BCP error file
+
+    Returns
+    -------
+    Dict of {row number -> error message(s)}. Row numbers are 1-indexed rows of the BCP data file.
+    """
+    errors: Dict[int, List[str]] = {}
+    if not Path(error_file_path).exists():
+        return {}
+    with open(error_file_path, errors="replace") as file:
+        for line in file:
+            error_line = match(r"#@ Row (\d+), Column (\d+): (.*) @#", line)
+            if error_line:
+                row_num, col_num, message = error_line.groups()
+                errors.setdefault(int(row_num), []).append(f"Column {col_num}: {message.strip()}")
+    return {row_num: "; ".join(messages) for row_num, messages in errors.items()}
+
+
+def _is_packet_size_error(output: List[str]) -> bool:
+    # not the "Network packet size (bytes): N" line of the summary BCP prints
+    return any(line.startswith("Error =") and "packet size" in line.lower() for line in output)
+
+
+def _is_transient_error(output: List[str]) -> bool:
+    """
+    Whether the BCP output shows an error that will likely succeed if retried, by looking at the
+    error numbers in the "NativeError = " lines and the messages in the "Error = " lines.
+    """
+    for line in output:
+        native_error = match(r"SQLState = \w+, NativeError = (\d+)", line)
+        if native_error and int(native_error.group(1)) in TRANSIENT_ERROR_CODES:
+            return True
+        if line.startswith("Error =") and any(
+            msg in line.lower() for msg in TRANSIENT_ERROR_MESSAGES
+        ):
+            return True
+    return False
+
+
+def _rows_were_sent(output: List[str]) -> bool:
+    return any("rows sent to SQL Server" in line for line in output)
+
+
+def _batches_were_committed(direc: str, batch_size: Optional[int], output: List[str]) -> bool:
+    # without a batch size BCP loads all rows in one transaction, which is rolled back if it fails
+    return direc == IN and bool(batch_size) and _rows_were_sent(output)
+
+
+def get_packet_size(avg_row_width: float) -> int:
+    """
+    Picks a network packet size large enough to hold a few hundred rows of the given average width,
+    rounded up to a multiple of the default packet size and capped at the maximum allowed by BCP.
+
+    Parameters
+    ----------
+    avg_row_width : float
+        Average width of a row in the data file, in bytes
+
+    Returns
+    -------
+    The packet size in bytes, to pass to the `-a` switch of BCP
+    """
+    target = avg_row_width * _PACKET_SIZE_TARGET_ROWS
+    num_pages = max(1, -(-int(target) // PACKET_SIZE_DEFAULT))  # ceiling division
+    return min(num_pages * PACKET_SIZE_DEFAULT, PACKET_SIZE_MAX)
+
+
+def get_read_dtypes(columns: pd.DataFrame) -> Tuple[Dict[str, str], List[str]]:
+    """
+    Maps the SQL Server types of a result set to the dtypes to parse it with in `pandas.read_csv`.
+
+    Parameters
+    ----------
+    columns : pandas.DataFrame
+        The columns of the result set, as returned by `sp_describe_first_result_set`, must have
+        the columns `name`, `system_type_name` (i.e. `varchar(50)`) and `is_nullable`
+
+    Returns
+    -------
+    A tuple of the `dtype` dict and the `parse_dates` list for `pandas.read_csv`
+    """
+    dtypes: Dict[str, str] = {}
+    parse_dates: List[str] = []
+    for name, type_name, nullable in columns[
+        ["name", "system_type_name", "is_nullable"]
+    ].itertuples(index=False):
+        base_type = type_name.split("(")[0].strip().lower()
+        if base_type in SQL_READ_DTYPES:
+            dtypes[name] = SQL_READ_DTYPES[base_type][bool(nullable)]
+        elif base_type in SQL_READ_DATETIME_TYPES:
+            parse_dates.append(name)
+        else:
+            # so that i.e. zip codes with leading zeros aren't parsed as numbers
+            dtypes[name] = "str"
+    return dtypes, parse_dates
+
+
+def _import_pyarrow():
+    """
+    Imports the optional dependency pyarrow, with a helpful error if it isn't installed.
+    """
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError(
+            "pyarrow is required for this, install it with `pip install bcpandas[arrow]`"
+        ) from e
+    return pyarrow
+
+
+def get_arrow_schema(columns: pd.DataFrame, timestamp_unit: str = "ns"):
+    """
+    Gets the Arrow schema of a result set, matching the dtypes it is parsed with, see `get_read_dtypes`.
+
+    Parameters
+    ----------
+    columns : pandas.DataFrame
+        The columns of the result set, see `get_read_dtypes`
+    timestamp_unit : str, default 'ns'
+        The unit of the timestamps of dates and datetimes
+
+    Returns
+    -------
+    A `pyarrow.Schema`
+    """
+    pa = _import_pyarrow()
+    dtypes, parse_dates = get_read_dtypes(columns)
+    fields = []
+    for name in columns["name"]:
+        if name in parse_dates:
+            typ = pa.timestamp(timestamp_unit)
+        elif dtypes[name] == "str":
+            typ = pa.string()
+        else:
+            # the nullable pandas dtypes have the same names, but capitalized
+            typ = pa.from_numpy_dtype(np.dtype(dtypes[name].lower().replace("boolean", "bool")))
+        fields.append(pa.field(name, typ))
+    return pa.schema(fields)
+
+
+def get_cache_key(**params) -> str:
+    """
+    Gets the key of a cached `read_sql` result, a hash of the params that determine it.
+    """
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _cache_file(cache_dir: Union[str, Path], key: str) -> Path:
+    return Path(cache_dir) / f"{key}{READ_CACHE_SUFFIX}"
+
+
+def read_cached_result(cache_dir: Union[str, Path], key: str, state: str):
+    """
+    Reads a cached `read_sql` result from an Arrow IPC file, if there is one and it was cached when the
+    SQL table was in the given state. Marks it as recently used.
+
+    Returns
+    -------
+    A `pyarrow.Table`, or None if there is no valid cached result
+    """
+    pa = _import_pyarrow()
+    file_path = _cache_file(cache_dir, key)
+    try:
+        with pa.OSFile(str(file_path)) as source:
+            table = pa.ipc.open_file(source).read_all()
+    except FileNotFoundError:
+        return None
+    except (OSError, pa.ArrowInvalid) as e:
+        logger.warning(f"Ignoring the unreadable cache file {file_path}: {e}")
+        return None
+    metadata = dict(table.schema.metadata or {})
+    if metadata.pop(_READ_CACHE_STATE_KEY, None) != state.encode():
+        logger.debug(f"The cache file {file_path} is outdated")
+        return None
+    # the modification time is used as the last access time for evictions
+    os.utime(file_path)
+    return table.replace_schema_metadata(metadata)
+
+
+def write_cached_result(
+    cache_dir: Union[str, Path], key: str, state: str, table, max_bytes: int
+) -> None:
+    """
+    Writes a `read_sql` result, as a `pyarrow.Table`, to an Arrow IPC file in the cache directory, along
+    with the state of the SQL table it was read from. Then evicts the least recently used results until
+    the cache directory holds at most `max_bytes`.
+    """
+    pa = _import_pyarrow()
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    file_path = _cache_file(cache_dir, key)
+    table = table.replace_schema_metadata(
+        {**(table.schema.metadata or {}), _READ_CACHE_STATE_KEY: state}
+    )
+    # write to a temp file first, so that concurrent readers never see a half-written file
+    tmp_path = file_path.with_name(f"{get_temp_file(Path(cache_dir)).name}.tmp")
+    try:
+        with pa.OSFile(str(tmp_path), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, file_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    _evict_cached_results(cache_dir, max_bytes)
+
+
+def _evict_cached_results(cache_dir: Union[str, Path], max_bytes: int) -> None:
+    files = []
+    for file_path in Path(cache_dir).glob(f"*{READ_CACHE_SUFFIX}"):
+        try:
+            stat = file_path.stat()
+        except FileNotFoundError:
+            # evicted by another process
+            continue
+        files.append((stat.st_mtime, stat.st_size, file_path))
+    total_bytes = 0
+    for _, size, file_path in sorted(files, reverse=True):
+        total_bytes += size
+        if total_bytes > max_bytes:
+            logger.debug(f"Evicting the cache file {file_path}")
+            file_path.unlink(missing_ok=True)
+
+
+class NativeField(NamedTuple):
+    """
+    A field of a data file in the native format, see `get_native_fields`.
+    """
+
+    name: str  # name of the column in the result
+    expr: str  # SQL expression that is exported
+    host_type: str  # host file data type in the format file
+    dtype: Optional[str]  # numpy dtype of fixed-width fields, None for variable-length ones
+    kind: str  # one of 'bool', 'int', 'float', 'datetime', 'text', or 'null' for NULL indicators
+
+
+def _quote_name(name: str) -> str:
+    return "[" + name.replace("]", "]]") + "]"
+
+
+def get_native_fields(columns: pd.DataFrame) -> List[NativeField]:
+    """
+    Plans the fields of a native format export of a result set, so that most of it can be decoded directly
+    into numpy arrays.
+
+    Numbers, dates and datetimes are exported as fixed-width fields, NULLs replaced by 0 and flagged in a
+    separate 1-byte field. These all come first, so that they are at the same offsets in every row, followed
+    by the strings, which are variable-length fields with an 8-byte length prefix.
+
+    Parameters
+    ----------
+    columns : pandas.DataFrame
+        The columns of the result set, see `get_read_dtypes`
+
+    Returns
+    -------
+    A list of the fields, in the order they are in the data file
+    """
+    fixed, variable = [], []
+    for name, type_name, nullable in columns[
+        ["name", "system_type_name", "is_nullable"]
+    ].itertuples(index=False):
+        base_type = type_name.split("(")[0].strip().lower()
+        col = _quote_name(name)
+        if base_type in NATIVE_FIELD_TYPES:
+            expr = col
+            host_type, dtype = NATIVE_FIELD_TYPES[base_type]
+            kind = "bool" if base_type == "bit" else "float" if dtype[1] == "f" else "int"
+        elif base_type in SQL_READ_DTYPES:
+            # decimal and money
+            expr = f"CAST({col} AS float)"
+            host_type, dtype = NATIVE_FIELD_TYPES["float"]
+            kind = "float"
+        elif base_type in SQL_READ_DATETIME_TYPES:
+            expr = f"DATEDIFF_BIG(microsecond, '1970-01-01', {col})"
+            host_type, dtype = NATIVE_FIELD_TYPES["bigint"]
+            kind = "datetime"
+        else:
+            variable.append(
+                NativeField(name, f"CAST({col} AS nvarchar(max))", "SQLNCHAR", None, "text")
+            )
+            continue
+        fixed.append(NativeField(name, f"ISNULL({expr}, 0)", host_type, dtype, kind))
+        if nullable:
+            fixed.append(
+                NativeField(
+                    name,
+                    f"CAST(CASE WHEN {col} IS NULL THEN 1 ELSE 0 END AS bit)",
+                    *NATIVE_FIELD_TYPES["bit"],
+                    kind="null",
+                )
+            )
+    return fixed + variable
+
+
+def build_native_format_file(fields: List[NativeField]) -> str:
+    """
+    Creates the non-xml SQL format file for a native format export, see `get_native_fields`.
+    Puts 4 spaces between each section.
+    """
+    _space = " " * 4
+    format_file_str = f"9.0\n{len(fields)}\n"  # Version and Number of columns
+    for col_num, field in enumerate(fields, start=1):
+        _line = _space.join(
+            [
+                str(col_num),  # Host file field order
+                field.host_type,  # Host file data type
+                str(0 if field.dtype else 8),  # Prefix length
+                str(np.dtype(field.dtype).itemsize if field.dtype else 0),  # Host file data length
+                '""',  # Terminator, none as the fields are fixed-width or prefixed with their length
+                str(col_num),  # Server column order
+                f"col{col_num}",  # Server column name, optional as long as not blank
+                '""',  # Column collation
+                "\n",
+            ]
+        )
+        format_file_str += _line
+    return format_file_str
+
+
+def read_native_file(file_path: Path, fields: List[NativeField]) -> pd.DataFrame:
+    """
+    Decodes a data file exported in the native format with the fields planned by `get_native_fields`.
+
+    The fixed-width fields are decoded with a numpy structured dtype, and only the variable-length ones
+    (strings) are parsed in Python, row by row.
+
+    Returns
+    -------
+    A DataFrame with a column per field, except the NULL indicators, in the order of `fields`
+    """
+    buf = file_path.read_bytes()
+    fixed = [field for field in fields if field.dtype is not None]
+    variable = [field for field in fields if field.dtype is None]
+    row_dtype = np.dtype([(f"f{i}", field.dtype) for i, field in enumerate(fixed)])
+
+    strings: List[List[Any]] = [[] for _ in variable]
+    if not variable:
+        if len(buf) % row_dtype.itemsize:
+            raise BCPandasException("The native format data file is truncated")
+        rows: np.ndarray = np.frombuffer(buf, dtype=row_dtype)
+    else:
+        # copy the fixed-width part of the rows next to each other, reading the strings along the way
+        fixed_data, view = bytearray(), memoryview(buf)
+        pos, size, unpack = 0, len(buf), struct.Struct("<q").unpack_from
+        try:
+            while pos < size:
+                fixed_data += view[pos : pos + row_dtype.itemsize]
+                pos += row_dtype.itemsize
+                for column in strings:
+                    (length,) = unpack(buf, pos)
+                    pos += 8
+                    if length == -1:
+                        column.append(np.nan)
+                    else:
+                        column.append(buf[pos : pos + length].decode("utf-16-le"))
+                        pos += length
+        except struct.error:
+            pos = size + 1
+        if pos != size:
+            raise BCPandasException("The native format data file is truncated")
+        # and decode it in one go
+        if fixed:
+            rows = np.frombuffer(fixed_data, dtype=row_dtype)
+
+    data: Dict[str, Any] = {}
+    for i, field in enumerate(fixed):
+        values = rows[f"f{i}"]
+        if field.kind == "null":
+            # the NULL indicator of the previous field
+            mask = values.astype(bool)
+            prev = fixed[i - 1]
+            if prev.kind == "bool":
+                data[prev.name] = pd.arrays.BooleanArray(data[prev.name], mask)
+            elif prev.kind == "int":
+                data[prev.name] = pd.arrays.IntegerArray(data[prev.name], mask)
+            elif prev.kind == "float":
+                data[prev.name] = np.where(mask, np.nan, data[prev.name])
+            else:
+                data[prev.name] = np.where(mask, np.datetime64("NaT"), data[prev.name])
+        elif field.kind == "bool":
+            data[field.name] = values.astype(bool)
+        elif field.kind == "datetime":
+            data[field.name] = values.astype(np.int64).view("datetime64[us]")
+        else:
+            data[field.name] = values.copy()
+    for field, column in zip(variable, strings):
+        data[field.name] = np.array(column, dtype=object)
+    return pd.DataFrame(data, columns=[field.name for field in fields if field.kind != "null"])
+
+
+class DelimiterCounter(io.RawIOBase):
+    """
+    Wraps a binary file of data exported by BCP, and counts the column delimiters and newlines as
+    they are read, so that the data can be validated while it is being parsed instead of reading it twice.
+
+    Every row should have exactly `num_cols - 1` delimiters. If more are found than could fit in the rows
+    read so far, raises a `BCPandasValueError` right away. Once all the data was read, call
+    `check(num_rows)` to validate the exact counts.
+
+    Parameters
+    ----------
+    raw : binary file object
+    delimiter : str
+        The column delimiter, as the actual characters in the file (i.e. a tab, not '\\t')
+    num_cols : int
+        The number of columns in the data
+    """
+
+    def __init__(self, raw, delimiter: str, num_cols: int):
+        super().__init__()
+        self.raw = raw
+        self.delimiter = delimiter
+        self._delimiter = delimiter.encode()
+        self.max_delims = num_cols - 1
+        self.num_delims = 0
+        self.num_newlines = 0
+        # end of the previous block, to catch multi-character delimiters split across blocks
+        self._tail = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self.raw.read(len(buffer))
+        num_bytes = len(data)
+        buffer[:num_bytes] = data
+        self.num_delims += (self._tail + data).count(self._delimiter)
+        self.num_newlines += data.count(b"\n")
+        if len(self._delimiter) > 1:
+            self._tail = data[-(len(self._delimiter) - 1) :]
+        if self.num_delims > self.max_delims * (self.num_newlines + 1):
+            self._raise()
+        return num_bytes
+
+    def check(self, num_rows: Optional[int] = None) -> None:
+        """
+        Validates the counts once all the data was read, against the number of rows BCP reported if known.
+        """
+        if num_rows is None:
+            num_rows = self.num_newlines
+        if self.num_newlines != num_rows or self.num_delims != self.max_delims * num_rows:
+            self._raise()
+
+    def _raise(self):
+        raise BCPandasValueError(
+            f"The delimiter ({self.delimiter!r}) or a newline was found in the source data, cannot"
+            " import with the delimiter specified. Try specifiying a delimiter"
+            " that does not appear in the data."
+        )
 
 
 def get_temp_file(directory: Optional[Path] = None) -> Path:
@@ -165,20 +734,31 @@ def _escape(input_string: str) -> str:
     )
 
 
+def _unescape(input_string: str) -> str:
+    """
+    Reverses the escape sequences BCP accepts for terminators (i.e. '\\t'), so that pandas can use them.
+    """
+    return (
+        input_string.replace("\\t", "\t")
+        .replace("\\n", "\n")
+        .replace("\\r", "\r")
+        .replace("\\0", "\0")
+    )
+
+
 def build_format_file(
     df: pd.DataFrame,
     delimiter: str,
     db_cols_order: Optional[Dict[str, int]] = None,
     collation: str = sql_collation,
+    char_type: str = "char",
+    row_terminator: str = NEWLINE,
 ) -> str:
     """
     Creates the non-xml SQL format file. Puts 4 spaces between each section.
     See https://docs.microsoft.com/en-us/sql/relational-databases/import-export/non-xml-format-files-sql-server
     for the specification of the file.
 
-    # TODO add params/options to control:
-    #   - the char type (not just SQLCHAR),
-
     Parameters
     ----------
     df : pandas DataFrame
@@ -190,6 +770,11 @@ def build_format_file(
         Only needed if the order of the columns in the dataframe doesn't match the database.
     collation: str, optional
         Collation to be used in the format file. The default value is 'SQL_Latin1_General_CP1_CI_AS'
+    char_type: {'char', 'wide'}, default 'char'
+        The type of the character data in the data file. 'wide' is for UTF-16LE data files, its fields are
+        SQLNCHAR and the terminators are UTF-16LE as well, i.e. '|\\0' for '|'.
+    row_terminator: str, default os.linesep
+        The terminator of the last field of each row.
 
     Returns
     -------
@@ -198,15 +783,20 @@ def build_format_file(
     _space = " " * 4
     format_file_str = f"9.0\n{len(df.columns)}\n"  # Version and Number of columns
     for col_num, col_name in enumerate(df.columns, start=1):
-        # last col gets a newline sep
-        _delim = delimiter if col_num != len(df.columns) else NEWLINE
+        # last col gets the row terminator
+        _delim = delimiter if col_num != len(df.columns) else row_terminator
+        if char_type == WIDE_CHAR_TYPE:
+            # each character of the terminator is 2 bytes in UTF-16LE, the second one NUL for ASCII
+            _terminator = "".join(f"{_escape(char)}\\0" for char in _delim)
+        else:
+            _terminator = _escape(_delim)
         _line = _space.join(
             [
                 str(col_num),  # Host file field order
-                SQLCHAR,  # Host file data type
+                SQLNCHAR if char_type == WIDE_CHAR_TYPE else SQLCHAR,  # Host file data type
                 str(0),  # Prefix length
                 str(0),  # Host file data length
-                f'"{_escape(_delim)}"',  # Terminator (see note below)
+                f'"{_terminator}"',  # Terminator (see note below)
                 str(
                     col_num if not db_cols_order else db_cols_order[str(col_name)]
                 ),  # Server column order
@@ -223,29 +813,561 @@ def build_format_file(
     return format_file_str
 
 
-def quote_this(this: str, skip: bool = False) -> str:
+_SQL_INT_TYPES = {
+    "tinyint": mssql.TINYINT,
+    "smallint": mssql.SMALLINT,
+    "int": mssql.INTEGER,
+    "bigint": mssql.BIGINT,
+}
+
+
+def _get_tight_string_type(values: pd.Series):
+    lengths = values.str.len()
+    if all(map(str.isascii, values)):
+        return mssql.VARCHAR(
+            None if lengths.max() > VARCHAR_MAX_LENGTH else max(int(lengths.max()), 1)
+        )
+    # NVARCHAR lengths are in UTF-16 code units, characters outside the BMP take 2
+    lengths = values.str.encode("utf-16-le").str.len() // 2
+    return mssql.NVARCHAR(None if lengths.max() > NVARCHAR_MAX_LENGTH else int(lengths.max()))
+
+
+def get_tight_sql_types(df: pd.DataFrame) -> Dict[Any, Any]:
     """
-    OS-safe way to quote a string.
+    Infers the narrowest SQL Server types that fit the values of the columns, see the `infer_types` param
+    of `to_sql`:
+      - Integers as the narrowest of TINYINT, SMALLINT, INT and BIGINT that fits their range.
+      - Booleans as BIT, and float32 as REAL.
+      - Strings as VARCHAR(n), or NVARCHAR(n) if any of them isn't ASCII, with n the longest string,
+        or (max) if it's too long.
+      - Datetimes as DATETIME2(p), with p the fewest fractional digits of a second that fit them.
+      - Bytes as VARBINARY(n), with n the longest value, or (max) if it's too long.
+
+    Columns of other types, or without any values, are left out so that pandas picks their type.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
 
-    Returns the string with quotes around it.
-    On Windows ~~it's double quotes~~ we skip quoting,
-    on Linux it's single quotes.
+    Returns
+    -------
+    A dict of {column name -> SQLAlchemy type}
     """
-    if isinstance(this, str):
-        if IS_WIN32:
-            return this  # TODO maybe change?
-        else:
-            return shlex.quote(this)
+    sql_types: Dict[Any, Any] = {}
+    for col_name, col in df.items():
+        values = col.dropna()
+        if values.empty:
+            continue
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            values = pd.Series(col.cat.categories)
+        if pd.api.types.is_bool_dtype(values.dtype):
+            sql_types[col_name] = mssql.BIT()
+        elif pd.api.types.is_integer_dtype(values.dtype):
+            lo, hi = int(values.min()), int(values.max())
+            for type_name, type_min, type_max in SQL_INT_RANGES:
+                if type_min <= lo and hi <= type_max:
+                    sql_types[col_name] = _SQL_INT_TYPES[type_name]()
+                    break
+        elif pd.api.types.is_float_dtype(values.dtype) and values.dtype.itemsize == 4:
+            sql_types[col_name] = mssql.REAL()
+        elif pd.api.types.is_datetime64_dtype(values.dtype):
+            ns = values.to_numpy(dtype="datetime64[ns]").view("int64")
+            # fractional digits actually used, at most 7 as DATETIME2 has a precision of 100ns
+            precision = next(
+                (p for p in range(7) if not (ns % 10 ** (9 - p)).any()),
+                7,
+            )
+            sql_types[col_name] = mssql.DATETIME2(precision=precision)
+        elif pd.api.types.infer_dtype(values, skipna=True) == "string":
+            sql_types[col_name] = _get_tight_string_type(values.astype(object))
+        elif pd.api.types.infer_dtype(values, skipna=True) == "bytes":
+            length = int(values.str.len().max())
+            sql_types[col_name] = mssql.VARBINARY(
+                "max" if length > VARBINARY_MAX_LENGTH else max(length, 1)
+            )
+    return sql_types
+
+
+def _utf16_lengths(values: pd.Series) -> pd.Series:
+    lengths = values.str.len()
+    if all(map(str.isascii, values)):
+        return lengths
+    return values.str.encode("utf-16-le").str.len() // 2
+
+
+def get_type_violations(df: pd.DataFrame, columns: pd.DataFrame) -> pd.DataFrame:
+    """
+    Checks the values of a DataFrame against the types of the columns of the SQL table it will be loaded
+    into, with vectorized operations, see the `validate` param of `to_sql`:
+      - NULLs in NOT NULL columns, and NOT NULL columns without a default that are missing from the data.
+      - Numbers: values that aren't numbers, out of the range of the type, fractions in integer columns,
+        and more integer digits or decimal places than a `decimal(p, s)` allows.
+      - Strings: values longer than the column, in characters (UTF-16 code units for nchar/nvarchar).
+      - Dates and datetimes: values that aren't dates, out of the range of the type, with a time in a
+        `date` column, or more fractional digits of a second than a `datetime2(p)` allows.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+    columns : pandas.DataFrame
+        The columns of the SQL table, with the INFORMATION_SCHEMA.COLUMNS fields `name`, `data_type`,
+        `max_length`, `precision`, `scale`, `datetime_precision`, `is_nullable` and `has_default`.
+        `has_default` is true for columns that get a value when missing, i.e. identity or computed ones.
+
+    Returns
+    -------
+    A DataFrame with a row per violation, with the `column`, the `violation`, the `count` of values that
+    violate it and an `example` value. Empty if all the values fit.
+    """
+    violations: List[Tuple[str, str, int, Any]] = []
+
+    def _add(name: str, violation: str, mask: pd.Series, values: pd.Series) -> None:
+        count = int(mask.sum())
+        if count:
+            violations.append((name, violation, count, values[mask].iloc[0]))
+
+    df_cols = {str(c): c for c in df.columns}
+    for col in columns.itertuples(index=False):
+        typ = col.data_type.lower()
+        if col.name not in df_cols:
+            if col.is_nullable == "NO" and not col.has_default:
+                violations.append((col.name, "NOT NULL column is missing", df.shape[0], None))
+            continue
+        data = df[df_cols[col.name]]
+        nulls = data.isna()
+        if col.is_nullable == "NO":
+            _add(col.name, "NULL in a NOT NULL column", nulls, data)
+        values = data[~nulls]
+        if values.empty:
+            continue
+
+        if typ in _SQL_INT_TYPES or typ in SQL_NUMERIC_RANGES or typ in ("decimal", "numeric"):
+            nums = pd.to_numeric(values, errors="coerce")
+            _add(col.name, "not a number", nums.isna(), values)
+            nums = nums.dropna()
+            if not pd.api.types.is_integer_dtype(nums.dtype):
+                nums = nums.astype("float64")
+                _add(col.name, "infinite", np.isinf(nums), nums)
+                nums = nums[~np.isinf(nums)]
+            if typ in ("decimal", "numeric"):
+                precision, scale = int(col.precision), int(col.scale)
+                _add(
+                    col.name,
+                    f"more than {precision - scale} integer digits",
+                    nums.abs() >= 10 ** (precision - scale),
+                    nums,
+                )
+                scaled = nums.astype("float64") * 10**scale
+                _add(
+                    col.name,
+                    f"more than {scale} decimal places, would be rounded",
+                    ~np.isclose(scaled, np.round(scaled), rtol=1e-9, atol=1e-6),
+                    nums,
+                )
+                continue
+            lo, hi = SQL_NUMERIC_RANGES.get(typ) or next(
+                (lo, hi) for name, lo, hi in SQL_INT_RANGES if name == typ
+            )
+            _add(col.name, f"out of the range of {typ}", (nums < lo) | (nums > hi), nums)
+            if (typ in _SQL_INT_TYPES or typ == "bit") and not pd.api.types.is_integer_dtype(
+                nums.dtype
+            ):
+                _add(col.name, "not an integer", nums % 1 != 0, nums)
+
+        elif typ in SQL_STRING_TYPES and col.max_length != -1:
+            strings = values.astype(str)
+            lengths = _utf16_lengths(strings) if typ.startswith("n") else strings.str.len()
+            _add(
+                col.name,
+                f"longer than {int(col.max_length)} characters",
+                lengths > col.max_length,
+                strings,
+            )
+
+        elif typ in SQL_READ_DATETIME_TYPES:
+            if pd.api.types.is_datetime64_any_dtype(values.dtype):
+                dts = values
+            else:
+                dts = pd.to_datetime(values, errors="coerce", format="mixed")
+                _add(col.name, "not a date or datetime", dts.isna(), values)
+                dts = dts.dropna()
+            if isinstance(dts.dtype, pd.DatetimeTZDtype):
+                dts = dts.dt.tz_localize(None)
+            if typ in SQL_DATETIME_RANGES:
+                lo, hi = (pd.Timestamp(ts) for ts in SQL_DATETIME_RANGES[typ])
+                _add(col.name, f"out of the range of {typ}", (dts < lo) | (dts > hi), dts)
+            if typ == "date":
+                _add(col.name, "has a time, would be truncated", dts != dts.dt.normalize(), dts)
+            elif typ == "datetime2":
+                ns = dts.to_numpy(dtype="datetime64[ns]").view("int64")
+                precision = int(col.datetime_precision)
+                _add(
+                    col.name,
+                    f"more than {precision} fractional digits of a second, would be rounded",
+                    pd.Series(ns % 10 ** (9 - precision) != 0, index=dts.index),
+                    dts,
+                )
+
+    return pd.DataFrame(violations, columns=["column", "violation", "count", "example"])
+
+
+# numpy units to format datetimes in, by the number of fractional digits of a second they give
+_DATETIME_UNITS = ((0, "s"), (3, "ms"), (6, "us"), (9, "ns"))
+
+
+def _format_datetime_column(values: pd.Series, data_type: str, scale: int) -> pd.Series:
+    tz = getattr(values.dtype, "tz", None)
+    local = values.dt.tz_localize(None) if tz is not None else values
+    if data_type == "date":
+        strings = np.datetime_as_string(local.to_numpy(), unit="D")
+    else:
+        digits, unit = next((d, u) for d, u in _DATETIME_UNITS if d >= scale)
+        strings = np.datetime_as_string(local.to_numpy().astype(f"datetime64[{unit}]"))
+        if len(strings):
+            # ISO 8601 has a 'T' between the date and the time, the ODBC canonical format a space
+            strings.view("U1").reshape(len(strings), -1)[:, 10] = " "
+        # casting to a shorter string type truncates, i.e. 7 digits of nanoseconds for datetime2(7)
+        strings = strings.astype(f"U{19 + (scale + 1 if scale else 0)}")
+    if tz is not None and data_type == "datetimeoffset":
+        utc = values.dt.tz_convert("UTC").dt.tz_localize(None)
+        minutes = ((local - utc) // pd.Timedelta(minutes=1)).fillna(0).astype("int64").to_numpy()
+        # only a handful of distinct offsets, so format those and look them up
+        offsets, inverse = np.unique(minutes, return_inverse=True)
+        labels = np.array(
+            [f" {'-' if m < 0 else '+'}{abs(m) // 60:02d}:{abs(m) % 60:02d}" for m in offsets]
+        )
+        strings = np.char.add(strings, labels[inverse])
+    return pd.Series(strings, index=values.index, dtype="object").where(values.notna())
+
+
+def format_datetimes(df: pd.DataFrame, columns: pd.DataFrame) -> pd.DataFrame:
+    """
+    Formats the datetime columns of a DataFrame as strings for the BCP data file with vectorized numpy
+    operations, which is a lot faster than letting `DataFrame.to_csv` format them, especially for
+    timezone-aware ones.
+
+    Uses the ODBC canonical format `yyyy-mm-dd hh:mm:ss[.fffffff]`, which SQL Server parses regardless of
+    the language and date format settings, with the fractional digits of a second truncated to the scale
+    of the SQL column, `yyyy-mm-dd` for `date` columns, and the UTC offset ` +hh:mm` appended for
+    `datetimeoffset` columns. Timezone-aware datetimes are written in their local time, which is what
+    SQL Server keeps when a `datetimeoffset` is converted to a type without an offset. Columns that don't
+    go into a date or datetime SQL column are left as they are.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+    columns : pandas.DataFrame
+        The columns of the SQL table, with the INFORMATION_SCHEMA.COLUMNS fields `name`, `data_type` and
+        `datetime_precision`.
+
+    Returns
+    -------
+    The DataFrame, with the datetime columns replaced by strings, and NaT by NaN.
+    """
+    scales = {
+        col.name: (col.data_type.lower(), int(col.datetime_precision))
+        for col in columns.itertuples(index=False)
+        if col.data_type.lower() in SQL_WRITE_DATETIME_TYPES
+    }
+    formatted = {
+        c: _format_datetime_column(df[c], *scales[str(c)])
+        for c in df.columns
+        if str(c) in scales and pd.api.types.is_datetime64_any_dtype(df[c].dtype)
+    }
+    if not formatted:
+        return df
+    df = df.copy(deep=False)
+    for c, values in formatted.items():
+        df[c] = values
+    return df
+
+
+def _format_binary_column(values: pd.Series) -> pd.Series:
+    nulls = values.isna()
+    formatted = pd.Series(np.nan, index=values.index, dtype="object")
+    formatted[~nulls] = np.frompyfunc(bytes.hex, 1, 1)(values[~nulls].to_numpy())
+    return formatted
+
+
+def _non_finite_to_none(value: Any) -> Any:
+    # JSON has no NaN or infinity, the json module would write them as the invalid bare NaN token
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {k: _non_finite_to_none(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_non_finite_to_none(v) for v in value]
+    return value
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (np.generic, np.ndarray)):
+        return _non_finite_to_none(value.tolist())
+    return str(value)
+
+
+def _get_json_encoder() -> Callable[[Any], str]:
+    """
+    Returns a function that encodes a value as compact JSON, with orjson if it is installed, which is a
+    lot faster than the json module. Numpy scalars and arrays are encoded as numbers, NaN and infinity as
+    null, and values that JSON has no type for by their `str`, the same with either one.
+    """
+    try:
+        import orjson
+    except ImportError:
+        encoder = json.JSONEncoder(
+            ensure_ascii=False, separators=(",", ":"), allow_nan=False, default=_json_default
+        )
+        return lambda value: encoder.encode(_non_finite_to_none(value))
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    return lambda value: orjson.dumps(value, default=str, option=options).decode()
+
+
+def format_json(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Encodes the object columns of dicts and lists as JSON, in one pass over each column, instead of the
+    Python repr that `DataFrame.to_csv` writes by `str`, i.e. for `NVARCHAR(MAX)` columns that hold JSON.
+    Uses orjson if it is installed, install it with `pip install bcpandas[json]`, otherwise the json module.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+
+    Returns
+    -------
+    The DataFrame, with the columns of dicts and lists replaced by JSON strings.
+    """
+    json_cols = [
+        c
+        for c, col in df.items()
+        if pd.api.types.is_object_dtype(col.dtype)
+        and pd.api.types.infer_dtype(col, skipna=True) == "mixed"
+        and all(isinstance(v, (dict, list)) for v in col.dropna())
+    ]
+    if not json_cols:
+        return df
+    encode = np.frompyfunc(_get_json_encoder(), 1, 1)
+    df = df.copy(deep=False)
+    for c in json_cols:
+        nulls = df[c].isna()
+        formatted = pd.Series(np.nan, index=df.index, dtype="object")
+        formatted[~nulls] = encode(df[c][~nulls].to_numpy())
+        df[c] = formatted
+    return df
+
+
+def format_binary(df: pd.DataFrame, columns: pd.DataFrame) -> pd.DataFrame:
+    """
+    Formats the columns of `bytes` that go into `binary`, `varbinary` or `image` SQL columns as hex,
+    which is how BCP reads binary data from a character data file, instead of the `b'...'` repr that
+    `DataFrame.to_csv` writes. `bytes.hex` runs in C, looped over by numpy.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+    columns : pandas.DataFrame
+        The columns of the SQL table, with the INFORMATION_SCHEMA.COLUMNS fields `name` and `data_type`.
+
+    Returns
+    -------
+    The DataFrame, with the binary columns replaced by hex strings.
+    """
+    binary_cols = {
+        col.name
+        for col in columns.itertuples(index=False)
+        if col.data_type.lower() in SQL_WRITE_BINARY_TYPES
+    }
+    formatted = {
+        c: _format_binary_column(df[c])
+        for c in df.columns
+        if str(c) in binary_cols and pd.api.types.infer_dtype(df[c], skipna=True) == "bytes"
+    }
+    if not formatted:
+        return df
+    df = df.copy(deep=False)
+    for c, values in formatted.items():
+        df[c] = values
+    return df
+
+
+# digits per int64 limb of the scaled integers that decimals are formatted from
+_LIMB_DIGITS = 18
+_LIMB_BASE = 10**_LIMB_DIGITS
+
+
+def _scale_floats(values: np.ndarray, precision: int, scale: int) -> Tuple[np.ndarray, np.ndarray]:
+    scaled = values * 10.0**scale
+    # beyond 2**53 floats aren't exact integers, so the digits would be noise
+    exact = np.abs(scaled) < min(2.0**53, 10.0**precision)
+    # SQL Server rounds half away from zero
+    rounded = np.trunc(scaled + np.copysign(0.5, scaled))
+    return np.where(exact, rounded, 0).astype("int64")[:, None], exact
+
+
+def _scale_decimals(
+    values: np.ndarray, precision: int, scale: int, num_limbs: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    with decimal.localcontext() as ctx:
+        # SQL Server rounds half away from zero
+        ctx.prec, ctx.rounding = _LIMB_DIGITS * num_limbs + 2, decimal.ROUND_HALF_UP
+        # numpy loops over the objects in C, with the operators of the C implementation of decimal
+        scaled = np.frompyfunc(decimal.Decimal.to_integral_value, 1, 1)(
+            values * decimal.Decimal(10) ** scale
+        )
+        exact = np.frompyfunc(decimal.Decimal.is_finite, 1, 1)(scaled).astype(bool)
+        scaled = np.where(exact, scaled, 0)
+        exact &= np.abs(scaled) < decimal.Decimal(10) ** precision
+        limbs = np.empty((len(values), num_limbs), dtype="int64")
+        rest = np.where(exact, scaled, 0)
+        for i in range(num_limbs - 1, -1, -1):
+            limbs[:, i] = (rest % _LIMB_BASE).astype("int64")
+            rest = rest // _LIMB_BASE
+    return limbs, exact
+
+
+def _format_scaled(limbs: np.ndarray, precision: int, scale: int) -> np.ndarray:
+    """
+    Formats scaled integers, given as int64 limbs of 18 digits with the most significant first, as
+    decimals with `scale` decimal places, using a matrix of ASCII digits.
+    """
+    num_rows, num_limbs = limbs.shape
+    negative = (limbs < 0).any(axis=1)
+    # at least one digit before the decimal point
+    width = max(precision, scale + 1)
+    int_width = width - scale
+    # a column per digit, the decimal point if any, and a column of NUL to pad with
+    digits = np.zeros((num_rows, width + bool(scale) + 1), dtype="uint8")
+    if scale:
+        digits[:, int_width] = ord(".")
+    position = width - 1
+    for limb in np.abs(limbs).T[::-1]:
+        for _ in range(min(_LIMB_DIGITS, position + 1)):
+            limb, digit = np.divmod(limb, 10)
+            digits[:, position + (scale > 0 and position >= int_width)] = digit + ord("0")
+            position -= 1
+    # the characters are shifted left past the leading zeros, and padded with NUL, which the bytes
+    # dtype strips
+    nonzero = digits[:, :int_width] != ord("0")
+    nonzero[:, -1] = True
+    start = nonzero.argmax(axis=1)
+    source = np.arange(digits.shape[1])[None, :] + (start - negative)[:, None]
+    chars = np.take_along_axis(digits, np.clip(source, 0, digits.shape[1] - 1), axis=1)
+    chars[:, 0] = np.where(negative, ord("-"), chars[:, 0])
+    return chars.view(f"S{chars.shape[1]}").ravel().astype(f"U{chars.shape[1]}")
+
+
+def _has_exponent(data: np.ndarray) -> np.ndarray:
+    # floats are written like repr does, in scientific notation below 1e-4 and from 1e16
+    magnitude = np.abs(data)
+    return ((magnitude < 1e-4) & (magnitude > 0)) | ((magnitude >= 1e16) & np.isfinite(data))
+
+
+def _format_decimal_column(values: pd.Series, precision: int, scale: int) -> pd.Series:
+    nulls = values.isna()
+    num_limbs = -(-max(precision, scale + 1) // _LIMB_DIGITS)
+    if pd.api.types.is_float_dtype(values.dtype):
+        # nullable Float64 columns would otherwise give an object array
+        data = values[~nulls].to_numpy(dtype="float64")
+        fix = _has_exponent(data)
+        if not fix.any():
+            return values
+        strings = data.astype(str).astype("object")
+        limbs, exact = _scale_floats(data[fix].astype("float64"), precision, scale)
+        limbs = np.pad(limbs, ((0, 0), (num_limbs - 1, 0)))
     else:
-        return this
+        data = values[~nulls].to_numpy()
+        # str of a Decimal is a lot faster than any other conversion, and only needs fixing for
+        # exponents, i.e. 1E+3 or 1E-7
+        strings = np.frompyfunc(str, 1, 1)(data)
+        # joining them is a single pass in C, and usually there are no exponents at all
+        if "E" in "".join(strings):
+            fix = np.frompyfunc(str.__contains__, 2, 1)(strings, "E").astype(bool)
+        else:
+            fix = np.zeros(len(strings), dtype=bool)
+        limbs, exact = _scale_decimals(data[fix], precision, scale, num_limbs)
+    # values that don't fit the column are written as they are, so the load fails on them just like
+    # it would have
+    fixed = _format_scaled(limbs, precision, scale).astype("object")
+    strings[fix] = np.where(exact, fixed, strings[fix])
+    formatted = pd.Series(np.nan, index=values.index, dtype="object")
+    formatted[~nulls] = strings
+    return formatted
+
+
+def format_decimals(df: pd.DataFrame, columns: pd.DataFrame) -> pd.DataFrame:
+    """
+    Formats the float columns, and the object columns of `decimal.Decimal` values, that go into `decimal`,
+    `numeric` or `money` SQL columns, so that they are written without an exponent, which SQL Server can't
+    convert to a decimal, i.e. `1e-05` for floats below 1e-4 or `1E+3` for Decimals.
+
+    Only the values that would have an exponent are formatted differently, with the scale of their column:
+    they are scaled to integers, rounded half away from zero like SQL Server does, as int64 for floats and
+    as int64 limbs of 18 digits for Decimals, which covers the 38 digits of `decimal(38, s)`, and are then
+    formatted with vectorized numpy operations. The others are written like `DataFrame.to_csv` does, by
+    `repr` for floats or `str` for Decimals, which is as fast as it gets in C. Floats are only exact up to
+    2**53 after scaling, larger ones are written as they are, like values that don't fit the precision of
+    the column, or are not finite.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+    columns : pandas.DataFrame
+        The columns of the SQL table, with the INFORMATION_SCHEMA.COLUMNS fields `name`, `data_type`,
+        `precision` and `scale`.
+
+    Returns
+    -------
+    The DataFrame, with the decimal columns replaced by strings where needed.
+    """
+    scales = {
+        col.name: (int(col.precision), int(col.scale))
+        for col in columns.itertuples(index=False)
+        if col.data_type.lower() in SQL_WRITE_DECIMAL_TYPES
+    }
+    formatted = {
+        c: _format_decimal_column(df[c], *scales[str(c)])
+        for c in df.columns
+        if str(c) in scales
+        and (
+            pd.api.types.is_float_dtype(df[c].dtype)
+            or pd.api.types.infer_dtype(df[c], skipna=True) == "decimal"
+        )
+    }
+    if not formatted:
+        return df
+    df = df.copy(deep=False)
+    for c, values in formatted.items():
+        df[c] = values
+    return df
+
+
+def needs_formatting(df: pd.DataFrame) -> bool:
+    """
+    Whether any column of the DataFrame may need formatting for the type of its SQL column, by
+    `format_datetimes`, `format_decimals` or `format_binary`, so that the columns of the table only need
+    to be queried then: datetime columns, floats that would be written with an exponent, and columns
+    of `decimal.Decimal` or `bytes` values.
+    """
+    for _, col in df.items():
+        if pd.api.types.is_datetime64_any_dtype(col.dtype):
+            return True
+        if pd.api.types.is_float_dtype(col.dtype):
+            if _has_exponent(col.dropna().to_numpy(dtype="float64")).any():
+                return True
+        elif pd.api.types.is_object_dtype(col.dtype) and pd.api.types.infer_dtype(
+            col, skipna=True
+        ) in ("decimal", "bytes"):
+            return True
+    return False
 
 
 def run_cmd(cmd: List[str], *, print_output: bool) -> Tuple[int, List[str]]:
     """
-    Runs the given command.
+    Runs the given command directly, without going through a shell.
 
-    Prints STDOUT in real time,  prints STDERR when command is complete,
-    and logs both STDOUT and STDERR.
+    Reads STDOUT and STDERR together in large chunks as they become available, and prints and logs
+    every line in real time. BCP progress lines (i.e. "1000 rows sent to SQL Server") are only printed
+    and logged once every few seconds, the latest one is always reported before any other line.
 
     Paramters
     ---------
@@ -257,30 +1379,41 @@ def run_cmd(cmd: List[str], *, print_output: bool) -> Tuple[int, List[str]]:
 
     Returns
     -------
-    The exit code of the command and all of its output.
+    The exit code of the command and the last lines of its output (at most `_OUTPUT_MAX_LINES`).
     """
-    if IS_WIN32:
-        with_shell = False
-    else:
-        with_shell = True
-        cmd = " ".join(cmd).replace("\\", "\\\\")  # type: ignore
-    proc = Popen(
-        cmd,
-        stdout=PIPE,
-        stderr=STDOUT,
-        encoding="utf-8",
-        errors="utf-8",
-        shell=with_shell,
-    )
-    stdout = []
+    proc = Popen(cmd, stdout=PIPE, stderr=STDOUT)
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    output: Deque[str] = deque(maxlen=_OUTPUT_MAX_LINES)
+    partial_line = ""
+    unreported_progress: Optional[str] = None
+    last_progress_time = float("-inf")
+
+    def _report(line: str) -> None:
+        if print_output:
+            print(line, end="")
+        logger.info(line)
+
     # live stream STDOUT and STDERR
     while True:
-        outs = proc.stdout.readline()  # type: ignore[union-attr]
-        if outs:
-            if print_output:
-                print(outs, end="")
-            logger.info(outs)
-            stdout.append(outs)
-        if proc.poll() is not None and outs == "":
+        chunk = proc.stdout.read1(_OUTPUT_READ_SIZE)  # type: ignore[union-attr]
+        *lines, partial_line = (partial_line + decoder.decode(chunk, final=not chunk)).split("\n")
+        if not chunk and partial_line:
+            lines.append(partial_line)
+        for line in lines:
+            line = line.rstrip("\r") + "\n"
+            output.append(line)
+            if any(pattern in line for pattern in _PROGRESS_LINE_PATTERNS):
+                now = time.monotonic()
+                if now - last_progress_time < _PROGRESS_LOG_INTERVAL:
+                    unreported_progress = line
+                    continue
+                last_progress_time = now
+            elif unreported_progress is not None:
+                _report(unreported_progress)
+            unreported_progress = None
+            _report(line)
+        if not chunk:
             break
-    return proc.returncode, stdout
+    if unreported_progress is not None:
+        _report(unreported_progress)
+    return proc.wait(), list(output)
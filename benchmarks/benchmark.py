@@ -1,4 +1,6 @@
 from contextlib import contextmanager
+from decimal import Decimal
+import io
 import json
 from math import floor
 import platform
@@ -11,9 +13,9 @@ import click
 from codetiming import Timer
 import numpy as np
 import pandas as pd
-from read_sql.read_sql import read_sql
 
-from bcpandas import SqlCreds, to_sql
+from bcpandas import SqlCreds, read_sql, to_sql
+from bcpandas.utils import format_datetimes, format_decimals
 from bcpandas.tests.utils import DockerDB
 
 mssql_image = "mcr.microsoft.com/mssql/server:2017-latest"
@@ -154,6 +156,26 @@ def run_benchmark_tosql(df: pd.DataFrame, creds: SqlCreds) -> Dict[str, float]:
             if_exists="replace",
             batch_size=10000,
         ),
+        dict(
+            title="bcpandas_batchsize_10000_packetsize_65535",
+            func=to_sql,
+            df=df,
+            table_name="tbl_bcpandas_3",
+            creds=creds,
+            if_exists="replace",
+            batch_size=10000,
+            packet_size=65535,
+        ),
+        dict(
+            title="bcpandas_batchsize_10000_packetsize_auto",
+            func=to_sql,
+            df=df,
+            table_name="tbl_bcpandas_4",
+            creds=creds,
+            if_exists="replace",
+            batch_size=10000,
+            packet_size="auto",
+        ),
     ]
 
     return {i["title"]: _run_single_func(**i) for i in funcs}
@@ -204,6 +226,37 @@ def run_benchmark_readsql(df: pd.DataFrame, creds: SqlCreds) -> Dict[str, float]
             batch_size=chunk_size,
             check_delim=False,
         ),
+        dict(
+            title=f"bcpandas_batchsize_{chunk_size}_native",
+            func=read_sql,
+            table_name=tbl_name,
+            creds=creds,
+            sql_type="table",
+            schema="dbo",
+            batch_size=chunk_size,
+            data_format="native",
+        ),
+        dict(
+            title=f"bcpandas_batchsize_{chunk_size}_4_partitions",
+            func=read_sql,
+            table_name=tbl_name,
+            creds=creds,
+            sql_type="table",
+            schema="dbo",
+            batch_size=chunk_size,
+            partition_column="col-0",
+            num_partitions=4,
+        ),
+        dict(
+            title=f"bcpandas_batchsize_{chunk_size}_pyarrow",
+            func=read_sql,
+            table_name=tbl_name,
+            creds=creds,
+            sql_type="table",
+            schema="dbo",
+            batch_size=chunk_size,
+            dtype_backend="pyarrow",
+        ),
     ]
 
     return {i["title"]: _run_single_func(**i) for i in funcs}
@@ -302,5 +355,66 @@ def main(func, num_cols, min_rows, max_rows, num_examples):
     save_and_plot(func=func, results=results, num_cols=num_cols)
 
 
+@cli.command()
+@click.option(
+    "--num-rows", type=int, default=1_000_000, show_default=True, help="Rows in the DataFrame"
+)
+@click.option(
+    "--scale",
+    type=click.IntRange(0, 7),
+    default=7,
+    show_default=True,
+    help="Fractional digits of a second of the SQL columns",
+)
+def datetimes(num_rows, scale):
+    """
+    Compares writing datetime columns to the BCP data file by letting pandas format them, to formatting
+    them up front with `bcpandas.utils.format_datetimes`. Doesn't need a database.
+    """
+    naive = pd.Series(pd.date_range("2020-01-01", periods=num_rows, freq="1234567us"))
+    frames = {
+        "naive": naive.to_frame("col"),
+        "tz_aware": naive.dt.tz_localize("UTC").dt.tz_convert("Europe/Amsterdam").to_frame("col"),
+    }
+    for name, df in frames.items():
+        sql_type = "datetimeoffset" if name == "tz_aware" else "datetime2"
+        columns = pd.DataFrame(
+            [("col", sql_type, scale)], columns=["name", "data_type", "datetime_precision"]
+        )
+        with Timer(name=f"{name}_to_csv", text="{name}: {:.2f} seconds"):
+            df.to_csv(path_or_buf=io.StringIO(), header=False, index=False)
+        with Timer(name=f"{name}_format_datetimes", text="{name}: {:.2f} seconds"):
+            format_datetimes(df, columns).to_csv(
+                path_or_buf=io.StringIO(), header=False, index=False
+            )
+
+
+@cli.command()
+@click.option(
+    "--num-rows", type=int, default=1_000_000, show_default=True, help="Rows in the DataFrame"
+)
+def decimals(num_rows):
+    """
+    Compares writing Decimal and float columns that go into a `decimal(18, 2)` column to the BCP data
+    file by letting pandas format them, to formatting them up front with
+    `bcpandas.utils.format_decimals`. Doesn't need a database.
+    """
+    cents = np.random.default_rng(0).integers(-(10**9), 10**9, num_rows)
+    frames = {
+        "decimal": pd.DataFrame({"col": [Decimal(int(c)).scaleb(-2) for c in cents]}),
+        "float": pd.DataFrame({"col": cents / 100}),
+    }
+    columns = pd.DataFrame(
+        [("col", "decimal", 18, 2)], columns=["name", "data_type", "precision", "scale"]
+    )
+    for name, df in frames.items():
+        with Timer(name=f"{name}_to_csv", text="{name}: {:.2f} seconds"):
+            df.to_csv(path_or_buf=io.StringIO(), header=False, index=False)
+        with Timer(name=f"{name}_format_decimals", text="{name}: {:.2f} seconds"):
+            format_decimals(df, columns).to_csv(
+                path_or_buf=io.StringIO(), header=False, index=False
+            )
+
+
 if __name__ == "__main__":
     cli()
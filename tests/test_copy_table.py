@@ -0,0 +1,104 @@
+import os
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+import pytest
+
+from bcpandas import copy_table
+from bcpandas.constants import IS_WIN32, BCPandasException, BCPandasValueError
+from bcpandas.main import _copy_through_pipe
+
+src_table = "lotr_copy_src"
+dst_table = "lotr_copy_dst"
+
+
+@pytest.fixture(name="df")
+def fixture_df(pyodbc_creds):
+    df = pd.DataFrame(
+        {
+            "col1": range(10),
+            "col2": [f"Frodo {i}" if i % 3 else None for i in range(10)],
+            "col3": [i / 3 for i in range(10)],
+        }
+    )
+    df.to_sql(name=src_table, con=pyodbc_creds, if_exists="replace", index=False, schema="dbo")
+    return df
+
+
+@pytest.mark.usefixtures("database")
+def test_copy_table(df, sql_creds, pyodbc_creds):
+    assert copy_table(sql_creds, src_table, sql_creds, dst_table, if_exists="replace") == 10
+    actual = pd.read_sql_query(f"SELECT * FROM dbo.{dst_table} ORDER BY col1", pyodbc_creds)
+    assert_frame_equal(df, actual, check_dtype=False)
+
+    with pytest.raises(BCPandasValueError):
+        copy_table(sql_creds, src_table, sql_creds, dst_table, if_exists="fail")
+
+
+@pytest.mark.usefixtures("database")
+def test_copy_table_partitioned(df, sql_creds, pyodbc_creds):
+    query = f"SELECT col1, col2 FROM dbo.{src_table} WHERE col1 > 1"
+    rows = copy_table(
+        sql_creds,
+        query,
+        sql_creds,
+        dst_table,
+        sql_type="query",
+        if_exists="replace",
+        partition_column="col1",
+        num_partitions=3,
+    )
+    assert rows == 8
+    actual = pd.read_sql_query(f"SELECT * FROM dbo.{dst_table} ORDER BY col1", pyodbc_creds)
+    expected = df.loc[df["col1"] > 1, ["col1", "col2"]].reset_index(drop=True)
+    assert_frame_equal(expected, actual, check_dtype=False)
+
+
+def _fake_export(data, error=None):
+    def export(file_path):
+        if error is not None:
+            raise error
+        with open(file_path, "wb") as file:
+            file.write(data)
+        return 1
+
+    return export
+
+
+def _fake_load(received, error=None):
+    def load(file_path):
+        if error is not None:
+            raise error
+        with open(file_path, "rb") as file:
+            received.append(file.read())
+        return 1
+
+    return load
+
+
+def test_copy_through_pipe(tmp_path):
+    received = []
+    data = os.urandom(1_000_000)
+    assert _copy_through_pipe(_fake_export(data), _fake_load(received), tmp_path) == 1
+    assert received == [data]
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.skipif(IS_WIN32, reason="named pipes are not supported on Windows")
+def test_copy_through_pipe_export_fails(tmp_path):
+    # the load is waiting for the export to open the pipe, and must not hang
+    received = []
+    export = _fake_export(b"", error=BCPandasException("Bcp command failed"))
+    with pytest.raises(BCPandasException, match="Bcp command failed"):
+        _copy_through_pipe(export, _fake_load(received), tmp_path)
+    assert received == [b""]
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.skipif(IS_WIN32, reason="named pipes are not supported on Windows")
+def test_copy_through_pipe_load_fails(tmp_path):
+    # the export is waiting for the load to open the pipe, and must not hang
+    load = _fake_load([], error=BCPandasException("Bcp command failed"))
+    with pytest.raises(BCPandasException, match="Bcp command failed"):
+        _copy_through_pipe(_fake_export(os.urandom(1_000_000)), load, tmp_path)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,49 @@
+import pandas as pd
+from pandas.testing import assert_frame_equal
+import pytest
+
+from bcpandas import export_parquet
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+table_name = "lotr_export_parquet"
+
+
+@pytest.fixture(name="df")
+def fixture_df(pyodbc_creds):
+    df = pd.DataFrame(
+        {
+            "col1": pd.array([1, None, 3, 4, 5], dtype="Int64"),
+            "col2": ["Frodo", "Sam", None, "Merry", "Pippin"],
+            "col3": ["a", "b", "a", "b", "a"],
+        }
+    )
+    df.to_sql(name=table_name, con=pyodbc_creds, if_exists="replace", index=False, schema="dbo")
+    return df
+
+
+@pytest.mark.usefixtures("database")
+def test_export_parquet(df, sql_creds, tmp_path):
+    path = tmp_path / "data.parquet"
+    assert export_parquet(table_name, path, creds=sql_creds, row_group_size=2) == 5
+    parquet_file = pq.ParquetFile(path)
+    assert parquet_file.metadata.num_row_groups == 3
+    actual = parquet_file.read().to_pandas()
+    assert_frame_equal(df, actual, check_dtype=False)
+
+
+@pytest.mark.usefixtures("database")
+def test_export_parquet_empty(df, sql_creds, tmp_path):
+    path = tmp_path / "data.parquet"
+    query = f"SELECT * FROM dbo.{table_name} WHERE 1 = 0"
+    assert export_parquet(query, path, creds=sql_creds, sql_type="query") == 0
+    assert pq.read_schema(path).names == list(df.columns)
+
+
+@pytest.mark.usefixtures("database")
+def test_export_parquet_partitioned(df, sql_creds, tmp_path):
+    path = tmp_path / "dataset"
+    export_parquet(table_name, path, creds=sql_creds, row_group_size=2, partition_cols=["col3"])
+    assert sorted(p.name for p in path.iterdir()) == ["col3=a", "col3=b"]
+    actual = pq.read_table(path).to_pandas()
+    assert sorted(actual["col2"].dropna()) == sorted(df["col2"].dropna())
@@ -1,5 +1,8 @@
+import sys
+
 import pytest
 
+from bcpandas import utils
 from bcpandas.utils import run_cmd
 
 
@@ -7,21 +10,15 @@ from bcpandas.utils import run_cmd
     "cmd,use_print,expected_stdout,expected_stderr",
     [
         (["echo", "hello world from 1"], True, "hello world from 1\n", ""),
-        pytest.param(
-            ["python", "-c", "\"import sys; print('world2', file=sys.stderr)\""],
+        # STDERR is merged into STDOUT
+        (
+            [sys.executable, "-c", "import sys; print('world2', file=sys.stderr)"],
             True,
-            "",
             "world2\n",
-            marks=pytest.mark.skip(reason="Can't get it to write to STDERR for some reason"),
-        ),
-        (["echo", "hello world from 3"], False, "", ""),
-        pytest.param(
-            ["python", "-c", "\"import sys; print('world2', file=sys.stderr)\""],
-            False,
-            "",
             "",
-            marks=pytest.mark.skip(reason="Can't get it to write to STDERR for some reason"),
         ),
+        (["echo", "hello world from 3"], False, "", ""),
+        ([sys.executable, "-c", "import sys; print('world2', file=sys.stderr)"], False, "", ""),
     ],
 )
 # https://docs.pytest.org/en/6.2.x/capture.html
@@ -30,3 +27,35 @@ def test_run_cmd_print_output(capsys, cmd, use_print, expected_stdout, expected_
     captured = capsys.readouterr()
     assert captured.out == expected_stdout
     assert captured.err == expected_stderr
+
+
+def test_run_cmd_no_shell():
+    ret_code, output = run_cmd(["echo", "$HOME; exit 3"], print_output=False)
+    assert ret_code == 0
+    assert output == ["$HOME; exit 3\n"]
+
+
+def test_run_cmd_rate_limits_progress(capsys):
+    script = (
+        "for i in range(1, 6): print(f'{i * 1000} rows sent to SQL Server. Total sent: {i * 1000}')\n"
+        "print()\n"
+        "print('5000 rows copied.')"
+    )
+    ret_code, output = run_cmd([sys.executable, "-c", script], print_output=True)
+    assert ret_code == 0
+    assert len(output) == 7
+    assert capsys.readouterr().out == (
+        "1000 rows sent to SQL Server. Total sent: 1000\n"
+        "5000 rows sent to SQL Server. Total sent: 5000\n"
+        "\n"
+        "5000 rows copied.\n"
+    )
+
+
+def test_run_cmd_keeps_last_lines(monkeypatch):
+    monkeypatch.setattr(utils, "_OUTPUT_MAX_LINES", 10)
+    ret_code, output = run_cmd(
+        [sys.executable, "-c", "for i in range(100_000): print(i)"], print_output=False
+    )
+    assert ret_code == 0
+    assert output == [f"{i}\n" for i in range(99_990, 100_000)]
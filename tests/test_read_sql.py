@@ -0,0 +1,439 @@
+from unittest import mock
+
+from hypothesis import assume, given, settings
+from hypothesis.extra import pandas as hpd
+import pandas as pd
+from pandas.errors import ParserWarning
+from pandas.testing import assert_frame_equal, assert_series_equal
+import pyodbc
+import pytest
+
+from bcpandas import read_sql
+from bcpandas.constants import (
+    IS_WIN32,
+    BCPandasException,
+    BCPandasValueError,
+    read_data_settings,
+)
+from bcpandas.main import _iter_stream
+from bcpandas.utils import _unescape
+
+from .utils import (
+    not_has_all_delims,
+    not_has_all_quotechars,
+    strat_dates,
+    strat_floats,
+    strat_ints,
+    strat_text,
+)
+
+hypo_df = hpd.data_frames(
+    columns=[
+        hpd.column(name="col1_text", elements=strat_text),
+        hpd.column(name="col2_ints", elements=strat_ints),
+        hpd.column(name="col3_floats", elements=strat_floats),
+        hpd.column(name="col4_dates", elements=strat_dates),
+    ],
+    index=hpd.range_indexes(min_size=1),
+)
+
+
+class TestReadSqlBasic:
+    """
+    For all tests, the 'actual' is retrieved using the built-in pandas methods, to compare to the
+    'expected' which used bcpandas.
+
+    Because dtypes change when reading from text files, ignoring dtypes checks. TODO how to really fix this
+    """
+
+    table_name = "lotr_readsql"
+    view_name = f"v_{table_name}"
+
+    @given(df=hypo_df)
+    @settings(deadline=None)
+    def test_readsql_table(self, df, sql_creds, database, pyodbc_creds):
+        assume(not_has_all_delims(df))
+        assume(not_has_all_quotechars(df))
+        # create table and insert rows
+        df.to_sql(
+            name=self.table_name, con=pyodbc_creds, if_exists="replace", index=False, schema="dbo"
+        )
+        # get expected
+        expected = read_sql(self.table_name, creds=sql_creds, sql_type="table", schema="dbo")
+        # check
+        assert_frame_equal(df, expected, check_dtype=False)
+
+    @given(df=hypo_df)
+    @settings(deadline=None)
+    def test_readsql_view(self, df, sql_creds, database, pyodbc_creds):
+        assume(not_has_all_delims(df))
+        assume(not_has_all_quotechars(df))
+        # create table and insert rows
+        df.to_sql(
+            name=self.table_name, con=pyodbc_creds, if_exists="replace", index=False, schema="dbo"
+        )
+        # create corresponding view
+        conn = pyodbc.connect(pyodbc_creds.engine.url.query["odbc_connect"], autocommit=True)
+        conn.execute(f"DROP VIEW IF EXISTS dbo.{self.view_name}")
+        conn.execute(f"CREATE VIEW dbo.{self.view_name} AS SELECT * FROM dbo.{self.table_name}")
+        conn.close()
+
+        # get expected
+        expected = read_sql(self.view_name, creds=sql_creds, sql_type="view", schema="dbo")
+        # check
+        assert_frame_equal(df, expected, check_dtype=False)
+
+    @given(df=hypo_df)
+    @settings(deadline=None)
+    def test_readsql_query(self, df, sql_creds, database, pyodbc_creds):
+        assume(not_has_all_delims(df))
+        assume(not_has_all_quotechars(df))
+        # create table and insert rows
+        df.to_sql(
+            name=self.table_name, con=pyodbc_creds, if_exists="replace", index=False, schema="dbo"
+        )
+        # get expected
+        expected = read_sql(
+            f"SELECT * FROM {self.table_name}", creds=sql_creds, sql_type="query", schema="dbo"
+        )
+        # check
+        assert_frame_equal(df, expected, check_dtype=False)
+
+    def test_readsql_custom_delimiter(self, sql_creds, database, pyodbc_creds):
+        df = pd.DataFrame(
+            {
+                "col1": ["Sam and <", "Frodo", "Merry"],
+                "col4": [2107, 2108, 2109],  # integers
+                "col5": [1.5, 2.5, 3],  # floats
+            }
+        )
+        # create table and insert rows
+        df.to_sql(
+            name=self.table_name, con=pyodbc_creds, if_exists="replace", index=False, schema="dbo"
+        )
+        # get expected
+        expected = read_sql(
+            self.table_name, creds=sql_creds, sql_type="table", schema="dbo", delimiter="|"
+        )
+        # check, the columns created by pandas are nullable so the integers are read as Int64
+        assert_frame_equal(df, expected, check_dtype=False)
+
+        # check that correctly finds the error if bad cust delim is passed
+        with pytest.raises(BCPandasValueError):
+            read_sql(
+                self.table_name, creds=sql_creds, sql_type="table", schema="dbo", delimiter="<"
+            )
+
+    def test_readsql_bad_delimiter(self, sql_creds, database, pyodbc_creds):
+        # get default delimiter, as the actual character BCP writes (it is set as an escape sequence)
+        delim_default = _unescape(read_data_settings["delimiter"])
+        # has the default delimiter in a data field
+        df = pd.DataFrame(
+            {
+                "col1": [f"Sam and {delim_default}", "Frodo", "Merry"],
+                "col4": [2107, 2108, 2109],  # integers
+            }
+        )
+        # create table and insert rows
+        df.to_sql(
+            name=self.table_name, con=pyodbc_creds, if_exists="replace", index=False, schema="dbo"
+        )
+        # check that correctly finds the error
+        with pytest.raises(BCPandasValueError):
+            read_sql(self.table_name, creds=sql_creds, sql_type="table", schema="dbo")
+
+        # without the check the data is silently read wrong
+        with pytest.warns(ParserWarning):
+            expected = read_sql(
+                self.table_name, creds=sql_creds, sql_type="table", schema="dbo", check_delim=False
+            )
+        assert not df.equals(expected)
+
+    def test_readsql_chunksize(self, sql_creds, database, pyodbc_creds):
+        df = pd.DataFrame({"col1": range(10), "col2": [f"Frodo {i}" for i in range(10)]})
+        df.to_sql(
+            name=self.table_name, con=pyodbc_creds, if_exists="replace", index=False, schema="dbo"
+        )
+        chunks = list(
+            read_sql(self.table_name, creds=sql_creds, sql_type="table", schema="dbo", chunksize=4)
+        )
+        assert [chunk.shape[0] for chunk in chunks] == [4, 4, 2]
+        assert_frame_equal(df, pd.concat(chunks), check_dtype=False)
+
+    def test_readsql_single_column_nulls(self, sql_creds, database, pyodbc_creds):
+        # BCP exports a NULL row of a single column as an empty line
+        df = pd.DataFrame({"col1": ["Frodo", None, "Sam", None]})
+        df.to_sql(
+            name=self.table_name, con=pyodbc_creds, if_exists="replace", index=False, schema="dbo"
+        )
+        actual = read_sql(self.table_name, creds=sql_creds, sql_type="table", schema="dbo")
+        assert actual["col1"].isna().tolist() == [False, True, False, True]
+        assert actual["col1"].dropna().tolist() == ["Frodo", "Sam"]
+
+    def test_readsql_dtypes(self, sql_creds, database, pyodbc_creds):
+        conn = pyodbc.connect(pyodbc_creds.engine.url.query["odbc_connect"], autocommit=True)
+        conn.execute(f"DROP TABLE IF EXISTS dbo.{self.table_name}")
+        conn.execute(
+            f"CREATE TABLE dbo.{self.table_name} (col_tiny TINYINT NOT NULL, col_int INT NULL, "
+            "col_bit BIT NULL, col_real REAL NULL, col_dt DATETIME2 NULL, col_zip VARCHAR(5) NULL)"
+        )
+        conn.execute(
+            f"INSERT INTO dbo.{self.table_name} VALUES (1, NULL, 1, 1.5, '2020-01-01 12:00:00', '01234'),"
+            " (2, 5, NULL, NULL, NULL, 'NA')"
+        )
+        conn.close()
+        expected = pd.DataFrame(
+            {
+                "col_tiny": pd.Series([1, 2], dtype="uint8"),
+                "col_int": pd.Series([None, 5], dtype="Int32"),
+                "col_bit": pd.Series([True, None], dtype="boolean"),
+                "col_real": pd.Series([1.5, None], dtype="float32"),
+                "col_dt": pd.to_datetime(["2020-01-01 12:00:00", None]),
+                "col_zip": ["01234", "NA"],
+            }
+        )
+        actual = read_sql(self.table_name, creds=sql_creds, sql_type="table", schema="dbo")
+        assert_frame_equal(expected, actual)
+
+        # the dtype param overrides the SQL types
+        actual = read_sql(
+            self.table_name, creds=sql_creds, sql_type="table", dtype={"col_int": "float64"}
+        )
+        assert actual["col_int"].dtype == "float64"
+
+        # an empty result still has the dtypes
+        actual = read_sql(
+            f"SELECT * FROM dbo.{self.table_name} WHERE 1 = 0", creds=sql_creds, sql_type="query"
+        )
+        assert actual.shape == (0, 6)
+        assert actual["col_int"].dtype == "Int32"
+
+    def test_readsql_native(self, sql_creds, database, pyodbc_creds):
+        df = pd.DataFrame(
+            {
+                "col1": [1, None, 3],
+                "col2": ["Frodo", None, "Sam\tand\nMerry"],  # delimiters don't matter
+                "col3": [1.5, 2.5, None],
+                "col4": pd.to_datetime(
+                    ["2020-01-01 12:00:00.123456", None, "1999-12-31 00:00:00.000000"]
+                ),
+            }
+        )
+        df["col1"] = df["col1"].astype("Int64")
+        df.to_sql(
+            name=self.table_name, con=pyodbc_creds, if_exists="replace", index=False, schema="dbo"
+        )
+        for sql_type, item in (
+            ("table", self.table_name),
+            ("query", f"SELECT * FROM {self.table_name}"),
+        ):
+            actual = read_sql(item, creds=sql_creds, sql_type=sql_type, data_format="native")
+            assert_frame_equal(df, actual, check_dtype=False)
+            assert actual["col1"].dtype == "Int64"
+            assert actual["col4"].dtype == "datetime64[us]"
+
+        with pytest.raises(BCPandasValueError):
+            read_sql(self.table_name, creds=sql_creds, data_format="native", chunksize=2)
+
+    def test_readsql_partitioned(self, sql_creds, database, pyodbc_creds):
+        df = pd.DataFrame(
+            {"col1": [*range(1, 11), None], "col2": [f"Frodo {i}" for i in range(11)]}
+        )
+        df["col1"] = df["col1"].astype("Int64")
+        df.to_sql(
+            name=self.table_name, con=pyodbc_creds, if_exists="replace", index=False, schema="dbo"
+        )
+        actual = read_sql(
+            self.table_name, creds=sql_creds, partition_column="col1", num_partitions=3
+        )
+        sort = ["col2"]
+        assert_frame_equal(
+            df.sort_values(sort, ignore_index=True),
+            actual.sort_values(sort, ignore_index=True),
+            check_dtype=False,
+        )
+
+        chunks = list(
+            read_sql(
+                f"SELECT * FROM dbo.{self.table_name} WHERE col1 > 5",
+                creds=sql_creds,
+                sql_type="query",
+                partition_column="col1",
+                num_partitions=20,  # more than the values in the range
+                chunksize=2,
+            )
+        )
+        assert sorted(pd.concat(chunks)["col1"].tolist()) == [6, 7, 8, 9, 10]
+
+        with pytest.raises(BCPandasValueError):
+            read_sql(self.table_name, creds=sql_creds, partition_column="col2")
+
+    def test_readsql_arrow(self, sql_creds, database, pyodbc_creds):
+        pa = pytest.importorskip("pyarrow")
+        df = pd.DataFrame(
+            {
+                "col1": pd.array([1, None, 3], dtype="Int64"),
+                "col2": ["Frodo", None, "NA"],
+                "col3": pd.to_datetime(
+                    ["2020-01-01 12:00:00.500000", None, "1999-12-31 00:00:00.000000"]
+                ),
+            }
+        )
+        df.to_sql(
+            name=self.table_name, con=pyodbc_creds, if_exists="replace", index=False, schema="dbo"
+        )
+        actual = read_sql(self.table_name, creds=sql_creds, dtype_backend="pyarrow")
+        assert all(isinstance(typ, pd.ArrowDtype) for typ in actual.dtypes)
+        assert_series_equal(actual["col1"].astype("Int64"), df["col1"])
+        assert actual["col2"].isna().tolist() == [False, True, False]
+        assert_series_equal(actual["col3"].astype("datetime64[ns]"), df["col3"])
+
+        table = read_sql(self.table_name, creds=sql_creds, as_arrow_table=True)
+        assert table.schema.field("col2").type == pa.string()
+        assert table.column("col2").to_pylist() == ["Frodo", None, "NA"]
+
+        # a NULL row of a single column is an empty line in the export
+        table = read_sql(
+            f"SELECT col2 FROM dbo.{self.table_name}",
+            creds=sql_creds,
+            sql_type="query",
+            as_arrow_table=True,
+        )
+        assert sorted(table.column("col2").to_pylist(), key=str) == ["Frodo", "NA", None]
+
+        with pytest.raises(BCPandasValueError):
+            read_sql(self.table_name, creds=sql_creds, dtype_backend="pyarrow", chunksize=2)
+
+    def test_readsql_category_threshold(self, sql_creds, database, pyodbc_creds):
+        df = pd.DataFrame(
+            {"col1": ["Frodo", "Sam"] * 5, "col2": [f"Merry {i}" for i in range(10)]}
+        )
+        df.to_sql(
+            name=self.table_name, con=pyodbc_creds, if_exists="replace", index=False, schema="dbo"
+        )
+        actual = read_sql(self.table_name, creds=sql_creds, category_threshold=0.5)
+        assert actual["col1"].dtype == "category"
+        assert actual["col2"].dtype == object
+
+    @pytest.mark.skipif(IS_WIN32, reason="named pipes are not supported on Windows")
+    def test_readsql_stream(self, sql_creds, database, pyodbc_creds):
+        df = pd.DataFrame({"col1": range(10), "col2": [f"Frodo {i}" for i in range(10)]})
+        df.to_sql(
+            name=self.table_name, con=pyodbc_creds, if_exists="replace", index=False, schema="dbo"
+        )
+        actual = read_sql(self.table_name, creds=sql_creds, stream=True)
+        assert_frame_equal(df, actual, check_dtype=False)
+
+        chunks = list(read_sql(self.table_name, creds=sql_creds, stream=True, chunksize=4))
+        assert [chunk.shape[0] for chunk in chunks] == [4, 4, 2]
+        assert_frame_equal(df, pd.concat(chunks, ignore_index=True), check_dtype=False)
+
+    def test_readsql_cache(self, sql_creds, database, pyodbc_creds, tmp_path):
+        pytest.importorskip("pyarrow")
+        df = pd.DataFrame({"col1": range(10), "col2": [f"Frodo {i}" for i in range(10)]})
+        df.to_sql(
+            name=self.table_name, con=pyodbc_creds, if_exists="replace", index=False, schema="dbo"
+        )
+        first = read_sql(self.table_name, creds=sql_creds, cache_dir=tmp_path)
+        assert len(list(tmp_path.iterdir())) == 1
+        with mock.patch("bcpandas.main.bcp") as bcp:
+            cached = read_sql(self.table_name, creds=sql_creds, cache_dir=tmp_path)
+        bcp.assert_not_called()
+        assert_frame_equal(first, cached)
+
+        # inserting rows invalidates the cached result
+        df.iloc[:2].to_sql(
+            name=self.table_name, con=pyodbc_creds, if_exists="append", index=False, schema="dbo"
+        )
+        actual = read_sql(self.table_name, creds=sql_creds, cache_dir=tmp_path)
+        assert actual.shape[0] == 12
+
+
+def _fake_export(lines, error=None):
+    def export(file_path):
+        with open(file_path, "wb") as file:
+            for line in lines:
+                file.write(line)
+        if error is not None:
+            raise error
+        return len(lines)
+
+    return export
+
+
+@pytest.mark.skipif(IS_WIN32, reason="named pipes are not supported on Windows")
+def test_iter_stream(tmp_path):
+    file_path = tmp_path / "stream"
+    lines = [f"{i}\tFrodo {i}\n".encode() for i in range(10)]
+    chunks = list(
+        _iter_stream(
+            _fake_export(lines),
+            file_path,
+            chunksize=4,
+            delimiter="\t",
+            sep="\t",
+            header=None,
+            names=["col1", "col2"],
+        )
+    )
+    assert [chunk.shape[0] for chunk in chunks] == [4, 4, 2]
+    assert pd.concat(chunks)["col2"].tolist() == [f"Frodo {i}" for i in range(10)]
+    assert not file_path.exists()
+
+
+@pytest.mark.skipif(IS_WIN32, reason="named pipes are not supported on Windows")
+@pytest.mark.parametrize("delimiter", ["\t", None])
+def test_iter_stream_lost_rows(tmp_path, delimiter):
+    file_path = tmp_path / "stream"
+    # the delimiters and newlines add up, but pandas skips the empty line of the NULL row
+    chunks = _iter_stream(
+        _fake_export([b"Frodo\n", b"\n", b"Sam\n"]),
+        file_path,
+        chunksize=None,
+        delimiter=delimiter,
+        sep="\t",
+        header=None,
+        names=["col1"],
+    )
+    with pytest.raises(BCPandasValueError, match="Parsed 2 rows"):
+        list(chunks)
+    assert not file_path.exists()
+
+
+@pytest.mark.skipif(IS_WIN32, reason="named pipes are not supported on Windows")
+def test_iter_stream_export_fails(tmp_path):
+    file_path = tmp_path / "stream"
+    # BCP fails midway, leaving a partial row
+    export = _fake_export([b"1\tFrodo\n", b"2"], error=BCPandasException("Bcp command failed"))
+    with pytest.raises(BCPandasException, match="Bcp command failed"):
+        list(
+            _iter_stream(
+                export,
+                file_path,
+                chunksize=None,
+                delimiter="\t",
+                sep="\t",
+                header=None,
+                names=["col1", "col2"],
+            )
+        )
+    assert not file_path.exists()
+
+
+@pytest.mark.skipif(IS_WIN32, reason="named pipes are not supported on Windows")
+def test_iter_stream_closed_early(tmp_path):
+    file_path = tmp_path / "stream"
+    lines = [f"{i}\tFrodo {i}\n".encode() for i in range(100_000)]
+    chunks = _iter_stream(
+        _fake_export(lines),
+        file_path,
+        chunksize=10,
+        delimiter=None,
+        sep="\t",
+        header=None,
+        names=["col1", "col2"],
+    )
+    assert next(chunks).shape[0] == 10
+    # the export gets a broken pipe, which is not raised as the iterator was closed on purpose
+    chunks.close()
+    assert not file_path.exists()
@@ -20,6 +20,7 @@ Not included (yet):
 """
 
 from functools import lru_cache
+from unittest import mock
 from urllib.parse import quote_plus
 
 from packaging.version import Version, parse
@@ -478,3 +479,34 @@ def test_sql_creds_connection_for_odbc_kwargs_encrypt(sql_creds):
     df = pd.read_sql(con=creds.engine, sql="SELECT TOP 1 * FROM sys.objects")
 
     assert df.shape[0] == 1
+
+
+def test_sql_creds_share_engines():
+    """
+    Tests that SqlCreds of the same connection share their engine, which is only created when used
+    """
+    kwargs = dict(server="test_server", database="test_database", driver_version=99)
+    creds = SqlCreds(**kwargs, odbc_kwargs={"Encrypt": "yes", "TrustServerCertificate": "no"})
+    assert creds._engine is None
+    same_creds = SqlCreds(**kwargs, odbc_kwargs={"trustservercertificate": "no", "encrypt": "yes"})
+    assert creds.engine is same_creds.engine
+
+    other_pool = SqlCreds(**kwargs, pool_pre_ping=True, pool_recycle=3600)
+    other_db = SqlCreds(server="test_server", database="other_database", driver_version=99)
+    assert len({id(c.engine) for c in (creds, other_pool, other_db)}) == 3
+    assert other_pool.engine.pool._pre_ping is True
+    assert other_pool.engine.pool._recycle == 3600
+
+
+def test_sql_creds_from_sqlalchemy_no_new_engine():
+    """
+    Tests that creating the SqlCreds object from a SqlAlchemy engine doesn't create another engine
+    """
+    params = quote_plus(
+        "Driver={ODBC Driver 99 for SQL Server};Server=tcp:new_server,1433;Database=test_database;"
+    )
+    mssql_engine = create_engine("mssql+pyodbc:///?odbc_connect=%s" % params)
+    with mock.patch("sqlalchemy.engine.create_engine") as create:
+        creds = SqlCreds.from_engine(mssql_engine)
+    create.assert_not_called()
+    assert creds.engine is mssql_engine
@@ -11,6 +11,8 @@ There are 2 categories of tests we want to do:
 
 import sys
 from datetime import date
+from decimal import Decimal
+import hashlib
 from os.path import expandvars
 from pathlib import Path
 from typing import Optional, no_type_check
@@ -23,8 +25,14 @@ import sqlalchemy
 from hypothesis import HealthCheck, given, settings
 from pandas.testing import assert_frame_equal
 
-from bcpandas import to_sql
-from bcpandas.constants import _DELIMITER_OPTIONS, _QUOTECHAR_OPTIONS, BCPandasValueError
+from bcpandas import TableOptions, main, to_sql
+from bcpandas.constants import (
+    _DELIMITER_OPTIONS,
+    _QUOTECHAR_OPTIONS,
+    BCPandasException,
+    BCPandasValueError,
+    data_contains,
+)
 from .utils import (
     assume_not_all_delims_and_quotechars,
     df_hypo_dates,
@@ -55,6 +63,22 @@ def test_tosql_all_quotechars(sql_creds):
         to_sql(df=df, table_name="tbl_all_delims", creds=sql_creds, if_exists="replace")
 
 
+@pytest.mark.parametrize(
+    "df,expected",
+    [
+        (pd.DataFrame({"col1": ["Frodo", None, "Sam|wise"]}), True),
+        (pd.DataFrame({"col1": ["Frodo", None, "Samwise"], "col2": [1, 2, 3]}), False),
+        (pd.DataFrame({"col1": ["Frodo", 1, b"|", "Sam~"]}), True),  # only strings are searched
+        (pd.DataFrame({"col1": ["Frodo", 1, b"|"]}), False),
+        (pd.DataFrame({"col1": pd.Categorical(["Frodo", "Sam~"])}), True),
+        (pd.DataFrame({"col1": pd.array(["Frodo", None, "Sam|wise"], dtype="string")}), True),
+        (pd.DataFrame({"col1": [1.5, np.nan]}), False),
+    ],
+)
+def test_data_contains(df, expected):
+    assert data_contains(df, "|~") is expected
+
+
 def _get_bcp_path() -> Optional[str]:
     """
     On Windows, is typically in C:/Program Files/Microsoft SQL Server/Client SDK/ODBC/170/Tools/Binn
@@ -255,6 +279,303 @@ def test_duplicate_columns(sql_creds):
         )
 
 
+@pytest.mark.usefixtures("database")
+def test_table_options(sql_creds):
+    table_name = "tosql_table_options"
+    df = pd.DataFrame({"col1": [1, 2, 3, 4], "col2": ["Frodo", "Sam", "Merry", "Pippin"]})
+    to_sql(
+        df=df,
+        table_name=table_name,
+        creds=sql_creds,
+        if_exists="replace",
+        index=False,
+        table_options=TableOptions(index_columns=["col1"], data_compression="PAGE"),
+    )
+    actual = pd.read_sql_query(
+        sql=f"""
+        SELECT i.type_desc, p.data_compression_desc
+        FROM sys.indexes AS i
+        JOIN sys.partitions AS p ON p.object_id = i.object_id AND p.index_id = i.index_id
+        WHERE i.object_id = OBJECT_ID('dbo.{table_name}')""",
+        con=sql_creds.engine,
+    )
+    assert actual.values.tolist() == [["CLUSTERED", "PAGE"]]
+    num_rows = pd.read_sql_query(f"SELECT COUNT(*) FROM dbo.{table_name}", sql_creds.engine)
+    assert num_rows.iloc[0, 0] == len(df)
+
+
+@pytest.mark.usefixtures("database")
+def test_table_options_memory_optimized(sql_creds):
+    table_name = "tosql_memory_optimized"
+    # memory-optimized tables need a MEMORY_OPTIMIZED_DATA filegroup in the database
+    execute_sql_statement(
+        sql_creds.engine,
+        """
+        IF NOT EXISTS (SELECT * FROM sys.filegroups WHERE type = 'FX')
+        BEGIN
+            ALTER DATABASE CURRENT ADD FILEGROUP fg_bcpandas_mod CONTAINS MEMORY_OPTIMIZED_DATA;
+            ALTER DATABASE CURRENT ADD FILE (
+                NAME = 'bcpandas_mod', FILENAME = '/var/opt/mssql/data/bcpandas_mod'
+            ) TO FILEGROUP fg_bcpandas_mod;
+        END
+        """,
+    )
+    df = pd.DataFrame({"col1": [1, 2, 3], "col2": ["Frodo", "Sam", "Merry"]})
+    # the second time drops the memory-optimized table, also outside a transaction
+    for _ in range(2):
+        to_sql(
+            df=df,
+            table_name=table_name,
+            creds=sql_creds,
+            if_exists="replace",
+            index=False,
+            dtype={"col2": sqlalchemy.types.NVARCHAR(length=50)},
+            table_options=TableOptions(memory_optimized="SCHEMA_AND_DATA", index_columns=["col1"]),
+        )
+    is_memory_optimized = pd.read_sql_query(
+        f"SELECT is_memory_optimized FROM sys.tables WHERE object_id = OBJECT_ID('dbo.{table_name}')",
+        sql_creds.engine,
+    )
+    assert is_memory_optimized.iloc[0, 0]
+    num_rows = pd.read_sql_query(f"SELECT COUNT(*) FROM dbo.{table_name}", sql_creds.engine)
+    assert num_rows.iloc[0, 0] == len(df)
+
+
+@pytest.mark.usefixtures("database")
+def test_validate_param(sql_creds):
+    table_name = "tosql_validate"
+    execute_sql_statement(sql_creds.engine, f"DROP TABLE IF EXISTS dbo.{table_name}")
+    execute_sql_statement(
+        sql_creds.engine,
+        f"CREATE TABLE dbo.{table_name} (col1 TINYINT NOT NULL, col2 VARCHAR(5) NULL)",
+    )
+    df = pd.DataFrame({"col1": [1, 300, None], "col2": ["Frodo", "Samwise", None]})
+    with pytest.raises(BCPandasValueError) as excinfo:
+        to_sql(
+            df=df,
+            table_name=table_name,
+            creds=sql_creds,
+            if_exists="append",
+            index=False,
+            validate=True,
+        )
+    assert excinfo.value.details == [
+        "col1: 1 value(s) NULL in a NOT NULL column, i.e. nan",
+        "col1: 1 value(s) out of the range of tinyint, i.e. 300.0",
+        "col2: 1 value(s) longer than 5 characters, i.e. 'Samwise'",
+    ]
+    num_rows = pd.read_sql_query(f"SELECT COUNT(*) FROM dbo.{table_name}", sql_creds.engine)
+    assert num_rows.iloc[0, 0] == 0
+
+
+@pytest.mark.usefixtures("database")
+def test_get_columns_quoted_name(sql_creds):
+    # a name that needs quoting, for OBJECT_ID to find the identity column
+    table_name = "tosql validate.quoted"
+    execute_sql_statement(sql_creds.engine, f"DROP TABLE IF EXISTS dbo.[{table_name}]")
+    execute_sql_statement(
+        sql_creds.engine,
+        f"CREATE TABLE dbo.[{table_name}] (id INT IDENTITY NOT NULL, col1 INT NOT NULL)",
+    )
+    columns = main._get_columns(table_name, sql_creds, "dbo")
+    assert columns["has_default"].tolist() == [1, 0]
+
+
+@pytest.mark.usefixtures("database")
+def test_datetime_columns(sql_creds):
+    table_name = "tosql_datetimes"
+    execute_sql_statement(sql_creds.engine, f"DROP TABLE IF EXISTS dbo.{table_name}")
+    execute_sql_statement(
+        sql_creds.engine,
+        f"CREATE TABLE dbo.{table_name} "
+        "(col1 DATETIME, col2 DATETIME2(2), col3 DATE, col4 DATETIMEOFFSET(3))",
+    )
+    dts = pd.Series(pd.to_datetime(["2020-01-31 13:45:10.123456789", None]))
+    df = pd.DataFrame(
+        {"col1": dts, "col2": dts, "col3": dts, "col4": dts.dt.tz_localize("Asia/Kolkata")}
+    )
+    to_sql(df=df, table_name=table_name, creds=sql_creds, if_exists="append", index=False)
+    actual = pd.read_sql_query(
+        f"SELECT CONVERT(VARCHAR(40), col1, 121) AS col1, CONVERT(VARCHAR(40), col2, 121) AS col2, "
+        f"CONVERT(VARCHAR(40), col3, 121) AS col3, CONVERT(VARCHAR(40), col4, 121) AS col4 "
+        f"FROM dbo.{table_name} ORDER BY col1 DESC",
+        sql_creds.engine,
+    )
+    assert actual.iloc[0].tolist() == [
+        "2020-01-31 13:45:10.123",
+        "2020-01-31 13:45:10.12",
+        "2020-01-31",
+        "2020-01-31 13:45:10.123 +05:30",
+    ]
+    assert actual.iloc[1].isna().all()
+
+
+@pytest.mark.usefixtures("database")
+def test_decimal_columns(sql_creds):
+    table_name = "tosql_decimals"
+    execute_sql_statement(sql_creds.engine, f"DROP TABLE IF EXISTS dbo.{table_name}")
+    execute_sql_statement(
+        sql_creds.engine, f"CREATE TABLE dbo.{table_name} (col1 DECIMAL(10, 5), col2 MONEY)"
+    )
+    df = pd.DataFrame(
+        {"col1": [1e-05, 2.5, None], "col2": [Decimal("1E+3"), Decimal("-0.25"), None]}
+    )
+    to_sql(df=df, table_name=table_name, creds=sql_creds, if_exists="append", index=False)
+    actual = pd.read_sql_query(
+        f"SELECT CAST(col1 AS VARCHAR(20)) AS col1, CAST(col2 AS VARCHAR(20)) AS col2 "
+        f"FROM dbo.{table_name} ORDER BY col1",
+        sql_creds.engine,
+    )
+    assert actual.values.tolist() == [[None, None], ["0.00001", "1000.00"], ["2.50000", "-0.25"]]
+
+
+@pytest.mark.usefixtures("database")
+def test_bytes_columns(sql_creds):
+    table_name = "tosql_bytes"
+    df = pd.DataFrame(
+        {"col1": [1, 2, 3], "col2": [hashlib.sha256(b"Frodo").digest(), b"\x00\r\n", None]}
+    )
+    to_sql(df=df, table_name=table_name, creds=sql_creds, if_exists="replace", index=False)
+    actual = pd.read_sql_query(
+        f"SELECT col1, col2 FROM dbo.{table_name} ORDER BY col1", sql_creds.engine
+    )
+    assert actual["col2"].tolist() == df["col2"].tolist()
+    data_type = pd.read_sql_query(
+        "SELECT DATA_TYPE, CHARACTER_MAXIMUM_LENGTH FROM INFORMATION_SCHEMA.COLUMNS "
+        f"WHERE TABLE_NAME = '{table_name}' AND COLUMN_NAME = 'col2'",
+        sql_creds.engine,
+    )
+    assert data_type.values.tolist() == [["varbinary", -1]]
+
+
+@pytest.mark.usefixtures("database")
+def test_json_columns(sql_creds):
+    table_name = "tosql_json"
+    execute_sql_statement(sql_creds.engine, f"DROP TABLE IF EXISTS dbo.{table_name}")
+    execute_sql_statement(
+        sql_creds.engine, f"CREATE TABLE dbo.{table_name} (col1 INT, col2 NVARCHAR(MAX))"
+    )
+    df = pd.DataFrame(
+        {"col1": [1, 2, 3], "col2": [{"name": "Frodo, Baggins", "rings": [1]}, ["|", "\t"], None]}
+    )
+    to_sql(df=df, table_name=table_name, creds=sql_creds, if_exists="append", index=False)
+    actual = pd.read_sql_query(
+        f"SELECT JSON_VALUE(col2, '$.name') AS name, ISJSON(col2) AS is_json "
+        f"FROM dbo.{table_name} ORDER BY col1",
+        sql_creds.engine,
+    )
+    assert actual["name"].tolist() == ["Frodo, Baggins", None, None]
+    assert actual["is_json"].tolist()[:2] == [1, 1]
+
+
+@pytest.mark.usefixtures("database")
+def test_char_type_wide(sql_creds):
+    table_name = "tosql_wide"
+    execute_sql_statement(sql_creds.engine, f"DROP TABLE IF EXISTS dbo.{table_name}")
+    execute_sql_statement(
+        sql_creds.engine, f"CREATE TABLE dbo.{table_name} (col1 INT, col2 NVARCHAR(50))"
+    )
+    df = pd.DataFrame({"col1": [1, 2, 3], "col2": ["Frodo", "Фродо 🧝", None]})
+    to_sql(
+        df=df,
+        table_name=table_name,
+        creds=sql_creds,
+        if_exists="append",
+        index=False,
+        char_type="wide",
+    )
+    actual = pd.read_sql_query(f"SELECT * FROM dbo.{table_name} ORDER BY col1", sql_creds.engine)
+    assert actual["col2"].tolist() == ["Frodo", "Фродо 🧝", None]
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"char_type": "unicode"},
+        {"char_type": "wide", "encoding": "utf-8"},
+        {"char_type": "wide", "delimiter": "§"},
+    ],
+)
+def test_char_type_invalid(kwargs):
+    df = pd.DataFrame({"col1": [1]})
+    with pytest.raises(BCPandasValueError):
+        main._validate_args(df=df, sql_type="table", if_exists="fail", batch_size=None, **kwargs)
+
+
+@pytest.mark.usefixtures("database")
+def test_control_terminators(sql_creds):
+    table_name = "tosql_control_terminators"
+    df = pd.DataFrame(
+        {
+            "col1": [1, 2, 3, 4],
+            "col2": ['Frodo "Ring-bearer", Baggins', "line\nbreak", None, "a|b\tc'd`e~f"],
+        }
+    )
+    to_sql(
+        df=df,
+        table_name=table_name,
+        creds=sql_creds,
+        if_exists="replace",
+        index=False,
+        control_terminators=True,
+    )
+    actual = pd.read_sql_query(f"SELECT * FROM dbo.{table_name} ORDER BY col1", sql_creds.engine)
+    assert actual["col2"].tolist() == df["col2"].tolist()
+
+
+@pytest.mark.parametrize(
+    "df,kwargs",
+    [
+        (pd.DataFrame({"col1": [1]}), {"delimiter": "|"}),
+        (pd.DataFrame({"col1": [1]}), {"quotechar": "'"}),
+        (pd.DataFrame({"col1": ["Frodo", "Sam\x1fwise"]}), {}),
+        (pd.DataFrame({"col1": pd.Categorical(["Frodo\x1e"])}), {}),
+    ],
+)
+def test_control_terminators_invalid(df, kwargs):
+    # raises before connecting to the database
+    with pytest.raises(BCPandasValueError):
+        to_sql(
+            df=df, table_name="tbl", creds=None, index=False, control_terminators=True, **kwargs
+        )
+
+
+def test_create_table_ddl():
+    create_table = "\nCREATE TABLE dbo.lotr (\n\tcol1 BIGINT NULL\n)\n\n"
+    options = TableOptions(columnstore=True, partition_scheme="ps_lotr", partition_column="col1")
+    assert main._get_create_table_ddl(create_table, "dbo", "lotr", options) == [
+        "\nCREATE TABLE dbo.lotr (\n\tcol1 BIGINT NULL\n) ON [ps_lotr]([col1])",
+        "CREATE CLUSTERED COLUMNSTORE INDEX [cci_lotr] ON [dbo].[lotr] ON [ps_lotr]([col1])",
+    ]
+    options = TableOptions(memory_optimized="SCHEMA_ONLY", index_columns=["col1"])
+    assert main._get_create_table_ddl(create_table, "dbo", "lotr", options) == [
+        "\nCREATE TABLE dbo.lotr (\n\tcol1 BIGINT NULL,\n\tINDEX [ix_lotr] NONCLUSTERED ([col1])\n) "
+        "WITH (MEMORY_OPTIMIZED = ON, DURABILITY = SCHEMA_ONLY)"
+    ]
+    options = TableOptions(data_compression="ROW", filegroup="fg_lotr")
+    assert main._get_create_table_ddl(create_table, "dbo", "lotr", options) == [
+        "\nCREATE TABLE dbo.lotr (\n\tcol1 BIGINT NULL\n) ON [fg_lotr] WITH (DATA_COMPRESSION = ROW)"
+    ]
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        TableOptions(columnstore=True, index_columns=["col1"]),
+        TableOptions(columnstore=True, data_compression="PAGE"),
+        TableOptions(data_compression="COLUMNSTORE"),
+        TableOptions(filegroup="fg_lotr", partition_scheme="ps_lotr", partition_column="col1"),
+        TableOptions(partition_scheme="ps_lotr"),
+        TableOptions(memory_optimized="SCHEMA_ONLY"),
+        TableOptions(memory_optimized="NONE", index_columns=["col1"]),
+        TableOptions(memory_optimized="SCHEMA_ONLY", index_columns=["col1"], filegroup="fg_lotr"),
+    ],
+)
+def test_table_options_invalid(options):
+    with pytest.raises(BCPandasValueError):
+        main._validate_table_options(options)
+
+
 @pytest.mark.skip(reason="Didn't test yet")
 def test_non_string_columns():
     # TODO
@@ -322,6 +643,172 @@ def test_custom_work_directory(sql_creds):
         assert conn.exec_driver_sql("SELECT * FROM some_table").first()[0] == 1.5
 
 
+@pytest.mark.usefixtures("database")
+def test_max_errors_returns_rejected_rows(sql_creds):
+    """
+    Test that rows BCP rejects are returned instead of failing the whole load.
+    """
+    tbl_name = "tbl_max_errors"
+    schema_name = "dbo"
+    execute_sql_statement(sql_creds.engine, f"DROP TABLE IF EXISTS {schema_name}.{tbl_name}")
+    execute_sql_statement(sql_creds.engine, f"CREATE TABLE {schema_name}.{tbl_name} (col1 INT)")
+    df = pd.DataFrame({"col1": ["1", "two", "3", "four"]}, index=[10, 11, 12, 13])
+    result = to_sql(
+        df=df,
+        table_name=tbl_name,
+        creds=sql_creds,
+        schema=schema_name,
+        if_exists="append",
+        index=False,
+        max_errors=5,
+    )
+    assert result.rows_copied == 2
+    assert_frame_equal(result.rejected_rows, df.loc[[11, 13]])
+    assert result.errors.index.to_list() == [11, 13]
+    actual = pd.read_sql_query(sql=f"SELECT * FROM {schema_name}.{tbl_name}", con=sql_creds.engine)
+    assert sorted(actual["col1"].to_list()) == [1, 3]
+
+
+@pytest.mark.usefixtures("database")
+def test_resume_from_checkpoint(sql_creds, tmp_path, monkeypatch):
+    """
+    Test that a failed resumable load only loads the missing chunks when re-run.
+    """
+    tbl_name = "tbl_resume_checkpoint"
+    schema_name = "dbo"
+    checkpoint_file = tmp_path / "checkpoint.json"
+    df = pd.DataFrame({"col1": range(10), "col2": [1.5] * 10})
+
+    real_bcp = main.bcp
+    num_calls = 0
+
+    def flaky_bcp(**kwargs):
+        nonlocal num_calls
+        num_calls += 1
+        if num_calls == 3:
+            raise BCPandasException("Bcp command failed with exit code 1")
+        return real_bcp(**kwargs)
+
+    monkeypatch.setattr(main, "bcp", flaky_bcp)
+    with pytest.raises(BCPandasException):
+        to_sql(
+            df=df,
+            table_name=tbl_name,
+            creds=sql_creds,
+            schema=schema_name,
+            if_exists="replace",
+            index=False,
+            checkpoint_file=checkpoint_file,
+            chunk_size=3,
+        )
+    assert checkpoint_file.exists()
+
+    result = to_sql(
+        df=df,
+        table_name=tbl_name,
+        creds=sql_creds,
+        schema=schema_name,
+        if_exists="replace",
+        index=False,
+        checkpoint_file=checkpoint_file,
+        chunk_size=3,
+    )
+    assert num_calls == 5
+    assert result.rows_copied == 10
+    assert not checkpoint_file.exists()
+    actual = pd.read_sql_query(
+        sql=f"SELECT * FROM {schema_name}.{tbl_name} ORDER BY col1", con=sql_creds.engine
+    )
+    assert_frame_equal(df, actual)
+
+
+def test_checkpoint_json_columns(tmp_path, monkeypatch):
+    chunks = []
+
+    def fake_to_sql(df, **kwargs):
+        chunks.append(df)
+        return main.ToSqlResult(
+            rows_copied=df.shape[0], rejected_rows=df.iloc[:0], errors=pd.Series(dtype="object")
+        )
+
+    monkeypatch.setattr(main, "_prepare_table", lambda **kwargs: None)
+    monkeypatch.setattr(main, "_sql_item_exists", lambda **kwargs: False)
+    monkeypatch.setattr(main, "to_sql", fake_to_sql)
+    df = pd.DataFrame({"col1": [1, 2, 3], "col2": [{"name": "Frodo"}, None, [1, 2]]})
+    result = main._to_sql_resumable(
+        df=df,
+        table_name="tbl",
+        creds=None,
+        sql_type="table",
+        schema="dbo",
+        index=False,
+        if_exists="replace",
+        dtype=None,
+        infer_types=None,
+        table_options=None,
+        process_dest_table=True,
+        checkpoint_file=tmp_path / "checkpoint.json",
+        chunk_size=2,
+        error_file=None,
+    )
+    assert result.rows_copied == 3
+    assert pd.concat(chunks)["col2"].fillna("NULL").tolist() == [
+        '{"name":"Frodo"}',
+        "NULL",
+        "[1,2]",
+    ]
+
+
+@pytest.mark.parametrize(
+    "col2,num_queries",
+    [(pd.to_datetime(["2020-01-01", "2020-01-02", None]), 1), ([1.5, 2.5, None], 0)],
+)
+def test_checkpoint_columns_queried_once(tmp_path, monkeypatch, col2, num_queries):
+    columns = pd.DataFrame({"name": ["col1", "col2"], "data_type": ["bigint", "datetime2"]})
+    queries, chunk_columns = [], []
+
+    def fake_to_sql(df, _columns, **kwargs):
+        chunk_columns.append(_columns)
+        return main.ToSqlResult(
+            rows_copied=df.shape[0], rejected_rows=df.iloc[:0], errors=pd.Series(dtype="object")
+        )
+
+    monkeypatch.setattr(main, "_prepare_table", lambda **kwargs: None)
+    monkeypatch.setattr(main, "_sql_item_exists", lambda **kwargs: False)
+    monkeypatch.setattr(main, "_get_columns", lambda *args: queries.append(args) or columns)
+    monkeypatch.setattr(main, "to_sql", fake_to_sql)
+    main._to_sql_resumable(
+        df=pd.DataFrame({"col1": [1, 2, 3], "col2": col2}),
+        table_name="tbl",
+        creds=None,
+        sql_type="table",
+        schema="dbo",
+        index=False,
+        if_exists="replace",
+        dtype=None,
+        infer_types=None,
+        table_options=None,
+        process_dest_table=True,
+        checkpoint_file=tmp_path / "checkpoint.json",
+        chunk_size=1,
+        error_file=None,
+    )
+    assert len(queries) == num_queries
+    assert chunk_columns == [columns if num_queries else None] * 3
+
+
+def test_checkpoint_with_batch_size(sql_creds, tmp_path):
+    with pytest.raises(BCPandasValueError):
+        to_sql(
+            df=pd.DataFrame({"col1": [1.5, 2.5]}),
+            table_name="some_table",
+            creds=sql_creds,
+            if_exists="replace",
+            batch_size=1,
+            checkpoint_file=tmp_path / "checkpoint.json",
+        )
+
+
 @pytest.mark.usefixtures("database")
 class _BaseToSql:
     sql_type = "table"
@@ -783,6 +1270,41 @@ class TestToSqlDtypeScenarios(_BaseToSql):
         )
         assert_frame_equal(expected, actual)
 
+    def test_infer_types_tight(self):
+        to_sql(
+            df=self.df.assign(col6=pd.to_datetime(["2021-01-01 12:00:00.5"] * 4)),
+            table_name=self.table_name,
+            creds=self.sql_creds,
+            index=False,
+            sql_type=self.sql_type,
+            if_exists="replace",
+            dtype={"col3": sqlalchemy.types.NVARCHAR(length=10)},
+            infer_types="tight",
+        )
+
+        actual = pd.read_sql_query(
+            sql=f"""
+            SELECT
+              COLUMN_NAME,
+              DATA_TYPE,
+              CHARACTER_MAXIMUM_LENGTH,
+              DATETIME_PRECISION
+            FROM
+              INFORMATION_SCHEMA.COLUMNS
+            WHERE
+              TABLE_NAME = '{self.table_name}'""",
+            con=self.pyodbc_creds,
+        )
+        expected = pd.DataFrame(
+            {
+                "COLUMN_NAME": ["col1", "col2", "col3", "col4", "col5", "col6"],
+                "DATA_TYPE": ["tinyint", "float", "nvarchar", "date", "bit", "datetime2"],
+                "CHARACTER_MAXIMUM_LENGTH": [np.nan, np.nan, 10.0, np.nan, np.nan, np.nan],
+                "DATETIME_PRECISION": [np.nan, np.nan, np.nan, 0.0, np.nan, 1.0],
+            }
+        )
+        assert_frame_equal(expected, actual, check_dtype=False)
+
 
 class TestToSqlOther(_BaseToSql):
     """ """
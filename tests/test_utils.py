@@ -1,14 +1,20 @@
+import io
+import os
+import struct
 import sys
 from collections import namedtuple
+from decimal import Decimal
 from pathlib import Path
 import tempfile
 from unittest import mock
 
+import numpy as np
 import pandas as pd
 import pytest
+from sqlalchemy.dialects import mssql
 
 from bcpandas import SqlCreds, utils
-from bcpandas.constants import IN, BCPandasException
+from bcpandas.constants import IN, BCPandasException, BCPandasValueError
 
 
 @pytest.fixture(name="run_cmd")
@@ -18,6 +24,23 @@ def fixture_run_cmd_capture(monkeypatch):
     return run_cmd
 
 
+@pytest.fixture(name="creds")
+def fixture_creds():
+    Creds = namedtuple(
+        "Creds", "server port database with_krb_auth username password odbc_kwargs entra_id_token"
+    )
+    return Creds(
+        server="localhost",
+        port=1433,
+        database="DB",
+        with_krb_auth=False,
+        username="me",
+        password="secret",
+        odbc_kwargs=None,
+        entra_id_token=None,
+    )
+
+
 def test_bcpandas_creates_command_without_port_if_default(run_cmd):
     Creds = namedtuple(
         "Creds", "server port database with_krb_auth username password odbc_kwargs entra_id_token"
@@ -195,6 +218,329 @@ def test_bcpandas_creates_command_with_entra_id_token(run_cmd):
     )
 
 
+def test_bcpandas_creates_command_with_packet_size(run_cmd, creds):
+    utils.bcp("table", "in", "", creds, True, packet_size=32768)
+    assert run_cmd.call_args == mock.call(
+        [
+            "bcp",
+            "dbo.table",
+            "in",
+            "",
+            "-S",
+            "localhost",
+            "-d",
+            "DB",
+            "-q",
+            "-U",
+            "me",
+            "-P",
+            "secret",
+            "-a",
+            "32768",
+        ],
+        print_output=True,
+    )
+
+
+@pytest.mark.parametrize("packet_size", [512, 65536])
+def test_bcpandas_packet_size_out_of_range(run_cmd, creds, packet_size):
+    with pytest.raises(BCPandasValueError):
+        utils.bcp("table", "in", "", creds, True, packet_size=packet_size)
+    run_cmd.assert_not_called()
+
+
+def test_bcpandas_packet_size_falls_back_to_default(run_cmd, creds):
+    run_cmd.side_effect = [
+        (1, ["Error = [Microsoft][ODBC Driver 18 for SQL Server]Invalid packet size"]),
+        (0, []),
+    ]
+    utils.bcp("table", "in", "", creds, True, packet_size=65535)
+    assert run_cmd.call_count == 2
+    assert "-a" in run_cmd.call_args_list[0].args[0]
+    assert "-a" not in run_cmd.call_args_list[1].args[0]
+
+
+def test_bcpandas_packet_size_fallback_keeps_other_args(run_cmd, creds):
+    run_cmd.side_effect = [(1, ["Error = Invalid packet size"]), (0, [])]
+    utils.bcp("table", "in", "", creds._replace(password="-a"), True, packet_size=65535)
+    first, second = (call.args[0] for call in run_cmd.call_args_list)
+    assert first[-4:] == ["-P", "-a", "-a", "65535"]
+    assert second[-2:] == ["-P", "-a"]
+
+
+def test_bcpandas_packet_size_other_errors(run_cmd, creds):
+    # the summary line isn't an error about the packet size
+    run_cmd.return_value = (1, ["Error = Login failed\n", "Network packet size (bytes): 65535\n"])
+    with pytest.raises(BCPandasException):
+        utils.bcp("table", "in", "", creds, True, packet_size=65535)
+    assert run_cmd.call_count == 1
+
+
+def test_bcpandas_packet_size_no_fallback_after_batches_committed(run_cmd, creds):
+    run_cmd.return_value = (
+        1,
+        ["1000 rows sent to SQL Server. Total sent: 1000\n", "Error = Invalid packet size\n"],
+    )
+    with pytest.raises(BCPandasException):
+        utils.bcp("table", "in", "", creds, True, batch_size=1000, packet_size=65535)
+    assert run_cmd.call_count == 1
+
+
+@pytest.mark.parametrize(
+    "avg_row_width,expected",
+    [(1, 4096), (16, 4096), (50, 16384), (100, 28672), (10_000, 65535)],
+)
+def test_get_packet_size(avg_row_width, expected):
+    assert utils.get_packet_size(avg_row_width) == expected
+
+
+def test_get_read_dtypes():
+    columns = pd.DataFrame(
+        [
+            ("col_tiny", "tinyint", False),
+            ("col_int", "int", True),
+            ("col_bit", "bit", True),
+            ("col_dec", "decimal(18,2)", False),
+            ("col_dt", "datetime2(7)", True),
+            ("col_text", "nvarchar(max)", True),
+            ("col_guid", "uniqueidentifier", False),
+        ],
+        columns=["name", "system_type_name", "is_nullable"],
+    )
+    dtypes, parse_dates = utils.get_read_dtypes(columns)
+    assert dtypes == {
+        "col_tiny": "uint8",
+        "col_int": "Int32",
+        "col_bit": "boolean",
+        "col_dec": "float64",
+        "col_text": "str",
+        "col_guid": "str",
+    }
+    assert parse_dates == ["col_dt"]
+
+
+native_columns = pd.DataFrame(
+    [
+        ("col_int", "int", True),
+        ("col_text", "nvarchar(10)", True),
+        ("col_bit", "bit", False),
+        ("col_dt", "datetime2(7)", True),
+        ("col_float", "decimal(18,2)", True),
+    ],
+    columns=["name", "system_type_name", "is_nullable"],
+)
+
+
+def _native_text(value):
+    if value is None:
+        return struct.pack("<q", -1)
+    data = value.encode("utf-16-le")
+    return struct.pack("<q", len(data)) + data
+
+
+def test_get_native_fields():
+    fields = utils.get_native_fields(native_columns)
+    # fixed-width fields first, each nullable one followed by its NULL indicator
+    assert [(field.name, field.kind) for field in fields] == [
+        ("col_int", "int"),
+        ("col_int", "null"),
+        ("col_bit", "bool"),
+        ("col_dt", "datetime"),
+        ("col_dt", "null"),
+        ("col_float", "float"),
+        ("col_float", "null"),
+        ("col_text", "text"),
+    ]
+    assert fields[0].expr == "ISNULL([col_int], 0)"
+    assert fields[1].expr == "CAST(CASE WHEN [col_int] IS NULL THEN 1 ELSE 0 END AS bit)"
+    assert fields[-1].expr == "CAST([col_text] AS nvarchar(max))"
+
+    format_file = utils.build_native_format_file(fields).splitlines()
+    assert format_file[:2] == ["9.0", "8"]
+    assert format_file[2].split() == ["1", "SQLINT", "0", "4", '""', "1", "col1", '""']
+    assert format_file[-1].split() == ["8", "SQLNCHAR", "8", "0", '""', "8", "col8", '""']
+
+
+def test_read_native_file(tmp_path):
+    fields = utils.get_native_fields(native_columns)
+    row_fmt = "<iBBqBdB"
+    micros = int(pd.Timestamp("2020-01-01 12:00:00.5").value // 1000)
+    data = (
+        struct.pack(row_fmt, 5, 0, 1, micros, 0, 1.5, 0)
+        + _native_text("Frodo")
+        + struct.pack(row_fmt, 0, 1, 0, 0, 1, 0, 1)
+        + _native_text(None)
+        + struct.pack(row_fmt, -7, 0, 1, 0, 0, 2.25, 0)
+        + _native_text("")
+    )
+    file_path = tmp_path / "data.bin"
+    file_path.write_bytes(data)
+    expected = pd.DataFrame(
+        {
+            "col_int": pd.array([5, None, -7], dtype="Int32"),
+            "col_bit": [True, False, True],
+            "col_dt": pd.Series(
+                ["2020-01-01 12:00:00.5", None, "1970-01-01"], dtype="datetime64[us]"
+            ),
+            "col_float": [1.5, None, 2.25],
+            "col_text": ["Frodo", np.nan, ""],
+        }
+    )
+    pd.testing.assert_frame_equal(utils.read_native_file(file_path, fields), expected)
+
+    # truncated in the middle of a row
+    file_path.write_bytes(data[:-3])
+    with pytest.raises(BCPandasException):
+        utils.read_native_file(file_path, fields)
+
+
+def test_read_native_file_fixed_width_only(tmp_path):
+    fields = utils.get_native_fields(native_columns.iloc[[2]])
+    file_path = tmp_path / "data.bin"
+    file_path.write_bytes(bytes([1, 0, 1]))
+    actual = utils.read_native_file(file_path, fields)
+    assert actual["col_bit"].tolist() == [True, False, True]
+
+
+def test_bcpandas_creates_command_with_max_errors_and_error_file(run_cmd, creds):
+    utils.bcp("table", "in", "", creds, True, max_errors=5, error_file_path=Path("err.txt"))
+    assert run_cmd.call_args.args[0][-4:] == ["-m", "5", "-e", "err.txt"]
+
+
+def test_bcpandas_creates_command_with_native_format(run_cmd, creds):
+    utils.bcp("table", "out", "", creds, True, native=True)
+    assert run_cmd.call_args.args[0][-1] == "-n"
+    assert "-c" not in run_cmd.call_args.args[0]
+
+
+def test_get_rows_copied():
+    output = [
+        "Starting copy...\n",
+        "1000 rows sent to SQL Server. Total sent: 1000\n",
+        "\n",
+        "1998 rows copied.\n",
+        "Network packet size (bytes): 4096\n",
+    ]
+    assert utils.get_rows_copied(output) == 1998
+    assert utils.get_rows_copied(["Starting copy...\n"]) is None
+
+
+def test_read_error_file(tmp_path):
+    error_file = tmp_path / "errors.txt"
+    error_file.write_text(
+        "#@ Row 2, Column 2: Invalid character value for cast specification @#\n"
+        "Frodo\tnot a number\n"
+        "#@ Row 5, Column 1: String data, right truncation @#\n"
+        "Sam and a very long name\t3\n"
+        "#@ Row 5, Column 2: Invalid character value for cast specification @#\n"
+        "Sam and a very long name\t3\n"
+    )
+    assert utils.read_error_file(error_file) == {
+        2: "Column 2: Invalid character value for cast specification",
+        5: "Column 1: String data, right truncation; "
+        "Column 2: Invalid character value for cast specification",
+    }
+    assert utils.read_error_file(tmp_path / "missing.txt") == {}
+
+
+@pytest.mark.parametrize(
+    "output,expected",
+    [
+        (
+            ["SQLState = 37000, NativeError = 40501\n", "Error = [SQL Server]Service is busy.\n"],
+            True,
+        ),
+        (["SQLState = 40001, NativeError = 1205\n", "Error = [SQL Server]Transaction...\n"], True),
+        (["SQLState = S1T00, NativeError = 0\n", "Error = [ODBC]Login timeout expired\n"], True),
+        (["SQLState = 28000, NativeError = 18456\n", "Error = [SQL Server]Login failed\n"], False),
+        (["Error = [ODBC]Unable to open BCP host data-file\n"], False),
+    ],
+)
+def test_is_transient_error(output, expected):
+    assert utils._is_transient_error(output) is expected
+
+
+@pytest.fixture(name="sleep")
+def fixture_sleep(monkeypatch):
+    sleep = mock.MagicMock()
+    monkeypatch.setattr(utils.time, "sleep", sleep)
+    return sleep
+
+
+_throttled = (1, ["SQLState = 37000, NativeError = 40501\n", "Error = Service is busy.\n"])
+
+
+def test_bcp_retries_transient_errors(run_cmd, creds, sleep):
+    run_cmd.side_effect = [_throttled, _throttled, (0, ["3 rows copied.\n"])]
+    assert utils.bcp("table", "in", "", creds, True, retries=3, retry_backoff=2) == 3
+    assert run_cmd.call_count == 3
+    assert sleep.call_count == 2
+    # exponential backoff with jitter
+    assert 1 <= sleep.call_args_list[0].args[0] <= 3
+    assert 2 <= sleep.call_args_list[1].args[0] <= 6
+
+
+def test_bcp_gives_up_after_retries(run_cmd, creds, sleep):
+    run_cmd.return_value = _throttled
+    with pytest.raises(BCPandasException):
+        utils.bcp("table", "in", "", creds, True, retries=2)
+    assert run_cmd.call_count == 3
+
+
+def test_bcp_does_not_retry_permanent_errors(run_cmd, creds, sleep):
+    run_cmd.return_value = (
+        1,
+        ["SQLState = 28000, NativeError = 18456\n", "Error = Login failed\n"],
+    )
+    with pytest.raises(BCPandasException):
+        utils.bcp("table", "in", "", creds, True, retries=2)
+    assert run_cmd.call_count == 1
+
+
+def test_bcp_does_not_retry_after_batches_committed(run_cmd, creds, sleep):
+    run_cmd.return_value = (
+        _throttled[0],
+        ["1000 rows sent to SQL Server. Total sent: 1000\n"] + _throttled[1],
+    )
+    with pytest.raises(BCPandasException):
+        utils.bcp("table", "in", "", creds, True, batch_size=1000, retries=2)
+    assert run_cmd.call_count == 1
+
+
+@pytest.mark.parametrize(
+    "data,delimiter,num_rows,valid",
+    [
+        (b"1\tFrodo\n2\tSam\n", "\t", 2, True),
+        (b"1\tFrodo\n2\tSam\n", "\t", None, True),
+        (b"1\tFro\tdo\n2\tSam\n", "\t", 2, False),
+        (b"1\tFrodo\t\n2\t\n", "\t", 2, False),
+        (b"1\tFro\ndo\n2\tSam\n", "\t", 2, False),
+        (b"1||Frodo\n2||Sam\n", "||", 2, True),
+        (b"1||Fro||do\n2||Sam\n", "||", 2, False),
+    ],
+)
+def test_delimiter_counter(data, delimiter, num_rows, valid):
+    counter = utils.DelimiterCounter(io.BytesIO(data), delimiter=delimiter, num_cols=2)
+    # tiny reads, so that delimiters get split across blocks
+    reader = io.BufferedReader(counter, buffer_size=1)
+    try:
+        while reader.read(1):
+            pass
+        counter.check(num_rows)
+    except BCPandasValueError:
+        assert not valid
+    else:
+        assert valid
+
+
+def test_delimiter_counter_fails_early():
+    data = b"1\tFro\t\tdo\n" + b"2\tSam\n" * 100_000
+    counter = utils.DelimiterCounter(io.BytesIO(data), delimiter="\t", num_cols=2)
+    with pytest.raises(BCPandasValueError):
+        counter.read(1024)
+    assert counter.raw.tell() == 1024
+
+
 @pytest.mark.usefixtures("database")
 def test_bcp_login_failure(sql_creds: SqlCreds):
     wrong_sql_creds = SqlCreds(
@@ -219,3 +565,397 @@ def test_bcp_login_failure(sql_creds: SqlCreds):
         except BCPandasException as e:
             assert any("Login failed" in message for message in e.details)
             assert not any("not a real error" in message for message in e.details)
+
+
+def test_get_arrow_schema():
+    pa = pytest.importorskip("pyarrow")
+    columns = pd.DataFrame(
+        [
+            ("col_int", "int", True),
+            ("col_bit", "bit", False),
+            ("col_real", "real", True),
+            ("col_dt", "datetime", True),
+            ("col_text", "varchar(10)", True),
+        ],
+        columns=["name", "system_type_name", "is_nullable"],
+    )
+    assert utils.get_arrow_schema(columns) == pa.schema(
+        [
+            ("col_int", pa.int32()),
+            ("col_bit", pa.bool_()),
+            ("col_real", pa.float32()),
+            ("col_dt", pa.timestamp("ns")),
+            ("col_text", pa.string()),
+        ]
+    )
+
+
+def test_cached_result(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    table = pa.table({"col1": [1, 2, None], "col2": ["Frodo", None, "Sam"]})
+    key = utils.get_cache_key(table="dbo.lotr", dtype=None)
+    assert key == utils.get_cache_key(dtype=None, table="dbo.lotr")
+    assert utils.read_cached_result(tmp_path, key, state="1") is None
+
+    utils.write_cached_result(tmp_path, key, "1", table, max_bytes=2**20)
+    assert utils.read_cached_result(tmp_path, key, state="1").equals(table)
+    # the table changed since
+    assert utils.read_cached_result(tmp_path, key, state="2") is None
+
+
+def test_cached_result_eviction(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    table = pa.table({"col1": list(range(1000))})
+    for key in ["a", "b"]:
+        utils.write_cached_result(tmp_path, key, "1", table, max_bytes=2**20)
+    # mark "a" as the most recently used
+    os.utime(tmp_path / "a.arrow", (0, 0))
+    os.utime(tmp_path / "b.arrow", (0, 0))
+    assert utils.read_cached_result(tmp_path, "a", state="1") is not None
+
+    max_bytes = 2 * (tmp_path / "a.arrow").stat().st_size
+    utils.write_cached_result(tmp_path, "c", "1", table, max_bytes=max_bytes)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.arrow", "c.arrow"]
+
+
+def test_get_tight_sql_types():
+    df = pd.DataFrame(
+        {
+            "col_tiny": [1, 200, 3],
+            "col_small": [-5, 3, 4],
+            "col_int": pd.array([1, None, 70000], dtype="Int64"),
+            "col_float": [1.0, None, 3.0],
+            "col_real": np.array([1.5, 2, 3], dtype="float32"),
+            "col_bit": [True, False, True],
+            "col_ascii": ["Frodo", "Sam", None],
+            "col_unicode": ["Frodo", "Éowyn", None],
+            "col_long": ["x" * 9000, "", None],
+            "col_category": pd.Categorical(["Merry", "Pippin", "Merry"]),
+            "col_dt": pd.to_datetime(["2021-01-01 12:00:00.120", "2021-01-02 00:00:00.000", None]),
+            "col_date": pd.to_datetime(["2021-01-01", "2021-01-02", None]),
+            "col_nulls": [None, None, None],
+            "col_mixed": [1, "a", None],
+            "col_bytes": [b"\x00\xff", b"abc", None],
+            "col_blob": [b"x" * 9000, b"", None],
+        }
+    )
+    actual = {
+        k: v.compile(dialect=mssql.dialect()) for k, v in utils.get_tight_sql_types(df).items()
+    }
+    assert actual == {
+        "col_tiny": "TINYINT",
+        "col_small": "SMALLINT",
+        "col_int": "INTEGER",
+        "col_real": "REAL",
+        "col_bit": "BIT",
+        "col_ascii": "VARCHAR(5)",
+        "col_unicode": "NVARCHAR(5)",
+        "col_long": "VARCHAR(max)",
+        "col_category": "VARCHAR(6)",
+        "col_dt": "DATETIME2(2)",
+        "col_date": "DATETIME2(0)",
+        "col_bytes": "VARBINARY(3)",
+        "col_blob": "VARBINARY(max)",
+    }
+
+
+def test_get_type_violations():
+    columns = pd.DataFrame(
+        [
+            ("col_tiny", "tinyint", None, 3, 0, None, "YES", 0),
+            ("col_int", "int", None, 10, 0, None, "NO", 0),
+            ("col_dec", "decimal", None, 5, 2, None, "YES", 0),
+            ("col_text", "varchar", 3, None, None, None, "YES", 0),
+            ("col_max", "nvarchar", -1, None, None, None, "YES", 0),
+            ("col_date", "date", None, None, None, 0, "YES", 0),
+            ("col_dt", "datetime2", None, None, None, 2, "YES", 0),
+            ("col_missing", "int", None, 10, 0, None, "NO", 0),
+            ("col_identity", "int", None, 10, 0, None, "NO", 1),
+        ],
+        columns=[
+            "name",
+            "data_type",
+            "max_length",
+            "precision",
+            "scale",
+            "datetime_precision",
+            "is_nullable",
+            "has_default",
+        ],
+    )
+    df = pd.DataFrame(
+        {
+            "col_tiny": [1, 300, -1],
+            "col_int": [1.0, None, 2.5],
+            "col_dec": [123.45, 1234.5, 1.234],
+            "col_text": ["Sam", "Frodo", None],
+            "col_max": ["x" * 10_000, "", None],
+            "col_date": ["2021-01-01", "2021-01-01 12:00", "Shire Reckoning"],
+            "col_dt": pd.to_datetime(["2021-01-01 12:00:00.120", "2021-01-01 12:00:00.123", None]),
+        }
+    )
+    actual = utils.get_type_violations(df, columns)
+    assert actual[["column", "violation", "count"]].values.tolist() == [
+        ["col_tiny", "out of the range of tinyint", 2],
+        ["col_int", "NULL in a NOT NULL column", 1],
+        ["col_int", "not an integer", 1],
+        ["col_dec", "more than 3 integer digits", 1],
+        ["col_dec", "more than 2 decimal places, would be rounded", 1],
+        ["col_text", "longer than 3 characters", 1],
+        ["col_date", "not a date or datetime", 1],
+        ["col_date", "has a time, would be truncated", 1],
+        ["col_dt", "more than 2 fractional digits of a second, would be rounded", 1],
+        ["col_missing", "NOT NULL column is missing", 3],
+    ]
+    assert actual["example"].iloc[0] == 300
+    assert utils.get_type_violations(df.iloc[:1].drop(columns="col_dec"), columns.iloc[:2]).empty
+
+
+def test_format_datetimes():
+    columns = pd.DataFrame(
+        [
+            ("col_dt2", "datetime2", 7),
+            ("col_dt", "datetime", 3),
+            ("col_small", "smalldatetime", 0),
+            ("col_date", "date", 0),
+            ("col_offset", "datetimeoffset", 2),
+            ("col_local", "datetime2", 0),
+            ("col_text", "varchar", None),
+        ],
+        columns=["name", "data_type", "datetime_precision"],
+    )
+    dts = pd.Series(pd.to_datetime(["2020-01-31 13:45:10.123456789", None]))
+    df = pd.DataFrame(
+        {
+            "col_dt2": dts,
+            "col_dt": dts,
+            "col_small": dts,
+            "col_date": dts,
+            "col_offset": dts.dt.tz_localize("America/New_York"),
+            "col_local": dts.dt.tz_localize("Asia/Kolkata"),
+            "col_text": dts,
+            "col_other": dts,
+            "col_int": [1, 2],
+        }
+    )
+    actual = utils.format_datetimes(df, columns)
+    expected = pd.DataFrame(
+        {
+            "col_dt2": ["2020-01-31 13:45:10.1234567", np.nan],
+            "col_dt": ["2020-01-31 13:45:10.123", np.nan],
+            "col_small": ["2020-01-31 13:45:10", np.nan],
+            "col_date": ["2020-01-31", np.nan],
+            "col_offset": ["2020-01-31 13:45:10.12 -05:00", np.nan],
+            "col_local": ["2020-01-31 13:45:10", np.nan],
+        },
+        dtype="object",
+    )
+    pd.testing.assert_frame_equal(actual[expected.columns], expected)
+    # columns that don't go into a datetime column are left alone
+    pd.testing.assert_frame_equal(
+        actual[["col_text", "col_other", "col_int"]], df[["col_text", "col_other", "col_int"]]
+    )
+    assert df["col_dt2"].dtype == "datetime64[ns]"
+
+
+def test_format_datetimes_offsets():
+    # the offset changes with daylight saving time, and isn't always whole hours
+    columns = pd.DataFrame(
+        [("col1", "datetimeoffset", 0)], columns=["name", "data_type", "datetime_precision"]
+    )
+    dts = pd.to_datetime(
+        ["2021-01-01 12:00", "2021-07-01 12:00", "2021-03-14 01:59:59.9"], format="ISO8601"
+    )
+    df = pd.DataFrame({"col1": dts.tz_localize("America/St_Johns")})
+    assert utils.format_datetimes(df, columns)["col1"].tolist() == [
+        "2021-01-01 12:00:00 -03:30",
+        "2021-07-01 12:00:00 -02:30",
+        "2021-03-14 01:59:59 -03:30",
+    ]
+
+
+def test_format_decimals():
+    columns = pd.DataFrame(
+        [
+            ("col_float", "decimal", 10, 2),
+            ("col_tiny", "numeric", 5, 5),
+            ("col_dec", "decimal", 38, 4),
+            ("col_money", "money", 19, 4),
+            ("col_plain", "decimal", 10, 2),
+            ("col_text", "varchar", None, None),
+        ],
+        columns=["name", "data_type", "precision", "scale"],
+    )
+    df = pd.DataFrame(
+        {
+            "col_float": [1e-05, -0.29, None, 12345678.0, 1e20, np.inf],
+            "col_tiny": [5e-05, -0.000015, 0.5, None, 1.0, 0.0],
+            "col_dec": [
+                Decimal("1E+3"),
+                Decimal("12345678901234567890123456789E+5"),
+                None,
+                Decimal("-15E+1"),
+                Decimal("1E+40"),
+                Decimal("7.25"),
+            ],
+            "col_money": [Decimal("1.5")] * 6,
+            "col_plain": [0.1, 0.2, 0.3, None, 1.5, 2.0],
+            "col_text": [Decimal("1E+3")] * 6,
+        }
+    )
+    actual = utils.format_decimals(df, columns)
+    expected = pd.DataFrame(
+        {
+            "col_float": ["0.00", "-0.29", np.nan, "12345678.0", "1e+20", "inf"],
+            "col_tiny": ["0.00005", "-0.00002", "0.5", np.nan, "1.0", "0.0"],
+            "col_dec": [
+                "1000.0000",
+                "1234567890123456789012345678900000.0000",
+                np.nan,
+                "-150.0000",
+                "1E+40",
+                "7.25",
+            ],
+            "col_money": ["1.5"] * 6,
+        },
+        dtype="object",
+    )
+    pd.testing.assert_frame_equal(actual[expected.columns], expected)
+    # columns without exponents, or that don't go into a decimal column, are left alone
+    pd.testing.assert_frame_equal(actual[["col_plain", "col_text"]], df[["col_plain", "col_text"]])
+
+
+@pytest.mark.parametrize(
+    "values,expected",
+    [
+        ([1e-05, 0.5], ["0.00001", "0.5"]),
+        ([1e-05, pd.NA, 0.5], ["0.00001", np.nan, "0.5"]),
+    ],
+)
+def test_format_decimals_nullable_floats(values, expected):
+    columns = pd.DataFrame(
+        [("col1", "decimal", 10, 5)], columns=["name", "data_type", "precision", "scale"]
+    )
+    df = pd.DataFrame({"col1": pd.array(values, dtype="Float64")})
+    actual = utils.format_decimals(df, columns)
+    assert actual["col1"].tolist() == expected
+
+
+@pytest.mark.parametrize(
+    "values,expected",
+    [
+        (pd.to_datetime(["2020-01-01"]), True),
+        ([1.5, None], False),
+        ([1.5, 1e-05], True),
+        (pd.array([1e20, None], dtype="Float64"), True),
+        ([Decimal("1.5"), None], True),
+        ([b"abc", None], True),
+        (["Frodo", None], False),
+        ([1, 2], False),
+    ],
+)
+def test_needs_formatting(values, expected):
+    assert utils.needs_formatting(pd.DataFrame({"col1": values})) is expected
+
+
+def test_format_binary():
+    columns = pd.DataFrame(
+        [("col_bin", "varbinary"), ("col_text", "varchar"), ("col_fixed", "binary")],
+        columns=["name", "data_type"],
+    )
+    df = pd.DataFrame(
+        {
+            "col_bin": [b"\x00\x1f\xff", None, b""],
+            "col_text": [b"abc", b"def", None],
+            "col_fixed": [b"ab", b"cd", b"ef"],
+            "col_int": [1, 2, 3],
+        }
+    )
+    actual = utils.format_binary(df, columns)
+    assert actual["col_bin"].tolist() == ["001fff", np.nan, ""]
+    assert actual["col_fixed"].tolist() == ["6162", "6364", "6566"]
+    # columns that don't go into a binary column are left alone
+    pd.testing.assert_frame_equal(actual[["col_text", "col_int"]], df[["col_text", "col_int"]])
+
+
+@pytest.mark.parametrize("has_orjson", [True, False])
+def test_format_json(has_orjson, monkeypatch):
+    if not has_orjson:
+        monkeypatch.setitem(sys.modules, "orjson", None)
+    df = pd.DataFrame(
+        {
+            "col_dict": [{"name": "Éowyn", "rings": [1, 2]}, None, {1: np.int64(3)}],
+            "col_list": [[], [{"a": None}], ["x", 1.5]],
+            "col_mixed": [{"a": 1}, "text", None],
+            "col_text": ["a", "b", None],
+        }
+    )
+    actual = utils.format_json(df)
+    assert actual["col_dict"].fillna("NULL").tolist() == [
+        '{"name":"Éowyn","rings":[1,2]}',
+        "NULL",
+        '{"1":3}',
+    ]
+    assert actual["col_list"].tolist() == ["[]", '[{"a":null}]', '["x",1.5]']
+    pd.testing.assert_frame_equal(actual[["col_mixed", "col_text"]], df[["col_mixed", "col_text"]])
+
+
+@pytest.mark.parametrize("has_orjson", [True, False])
+def test_format_json_non_finite(has_orjson, monkeypatch):
+    if not has_orjson:
+        monkeypatch.setitem(sys.modules, "orjson", None)
+    df = pd.DataFrame(
+        {
+            "col1": [
+                {"a": np.nan, "b": [float("inf"), 1.5]},
+                [np.float64("-inf"), np.float32("nan"), np.array([1.0, np.nan])],
+            ]
+        }
+    )
+    actual = utils.format_json(df)
+    assert actual["col1"].tolist() == ['{"a":null,"b":[null,1.5]}', "[null,null,[1.0,null]]"]
+
+
+@pytest.mark.parametrize(
+    "char_type,host_type,delim,newline",
+    [
+        ("char", "SQLCHAR", '"|"', utils._escape(utils.NEWLINE)),
+        ("wide", "SQLNCHAR", '"|\\0"', "".join(f"{utils._escape(c)}\\0" for c in utils.NEWLINE)),
+    ],
+)
+def test_build_format_file(char_type, host_type, delim, newline):
+    df = pd.DataFrame({"col1": [1], "col 2": ["Frodo"]})
+    format_file = utils.build_format_file(
+        df, delimiter="|", db_cols_order={"col1": 2, "col 2": 1}, char_type=char_type
+    ).splitlines()
+    assert format_file[:2] == ["9.0", "2"]
+    assert format_file[2].split() == [
+        "1",
+        host_type,
+        "0",
+        "0",
+        delim,
+        "2",
+        "col1",
+        "SQL_Latin1_General_CP1_CI_AS",
+    ]
+    assert format_file[3].split() == [
+        "2",
+        host_type,
+        "0",
+        "0",
+        f'"{newline}"',
+        "1",
+        "col\\s2",
+        "SQL_Latin1_General_CP1_CI_AS",
+    ]
+
+
+@pytest.mark.parametrize("char_type,suffix", [("char", ""), ("wide", "\\0")])
+def test_build_format_file_row_terminator(char_type, suffix):
+    df = pd.DataFrame({"col1": [1], "col2": ["Frodo"]})
+    format_file = utils.build_format_file(
+        df, delimiter="\x1f", char_type=char_type, row_terminator="\x1e"
+    ).split("\n")  # not splitlines, which also splits on the record separator
+    assert format_file[2].split(" " * 4)[4] == f'"\x1f{suffix}"'
+    assert format_file[3].split(" " * 4)[4] == f'"\x1e{suffix}"'